@@ -60,19 +60,203 @@ class DictWithUniqueKeys(dict):
         return
 
 
+class _ShardedRegistry:
+
+    """Dict, aufgeteilt auf \c stripes Shards mit je einem eigenen Lock.
+
+    Der Shard eines Keys ist hash( key) % stripes. Schreibende Zugriffe
+    verschiedener Threads blockieren sich also nur, wenn sie denselben Shard
+    betreffen. Lesende Zugriffe (get(), in) erfolgen ohne Lock: Unter CPython
+    ist das Lesen eines dicts, dessen Keys Strings oder Integers sind, atomar.
+
+    Jeder Shard zählt, wie oft ein Thread auf seinen Lock warten musste und wie
+    lange (siehe stats()). Das kostet nur etwas, wenn tatsächlich gewartet wird.
+    """
+
+    def __init__( self, stripes=16):
+        self.__stripes = stripes
+        self.__shards = tuple( {} for _ in range( stripes))
+        self.__locks = tuple( threading.RLock() for _ in range( stripes))
+        self.__waits = [0]*stripes
+        self.__waits_ns = [0]*stripes
+        return
+
+    def __contains__( self, key):
+        return key in self.__shards[ hash( key) % self.__stripes]
+
+    def __len__( self):
+        return sum( len( shard) for shard in self.__shards)
+
+    def _acquire_( self, i):
+        lock = self.__locks[ i]
+        if not lock.acquire( blocking=False):
+            t = time.perf_counter_ns()
+            lock.acquire()
+            self.__waits[ i] += 1
+            self.__waits_ns[ i] += time.perf_counter_ns() - t
+
+        return
+
+    @staticmethod
+    def _keys_unique_( keys):
+        """\throws KeyError, wenn ein Key mehrfach vorkommt.
+        """
+        seen = set()
+        for key in keys:
+            if key in seen:
+                raise KeyError( key)
+
+            seen.add( key)
+
+        return
+
+    def _release_( self, i):
+        self.__locks[ i].release()
+        return
+
+    def _stripes_( self, keys):
+        """Keys nach Shards gruppiert, Shards aufsteigend sortiert.
+        """
+        stripes = {}
+        for key in keys:
+            stripes.setdefault( hash( key) % self.__stripes, []).append( key)
+
+        return sorted( stripes.items())
+
+    def get( self, key):
+        """\throws KeyError, wenn \c key nicht vorhanden ist.
+        """
+        return self.__shards[ hash( key) % self.__stripes][ key]
+
+    def insert( self, key, value):
+        """\c value unter \c key aufnehmen, wenn \c key noch nicht vorhanden ist.
+
+        \returns    False, wenn \c key bereits vorhanden ist.
+        """
+        i = hash( key) % self.__stripes
+        self._acquire_( i)
+        try:
+            shard = self.__shards[ i]
+            if key in shard:
+                return False
+
+            shard[ key] = value
+            return True
+
+        finally:
+            self._release_( i)
+
+    def insert_many( self, items):
+        """Alle (key, value)-Paare aufnehmen oder keines.
+
+        Jeder betroffene Shard wird nur einmal gelockt.
+
+        \returns    Liste der Keys, die bereits vorhanden sind. Ist sie nicht
+                    leer, ist nichts aufgenommen worden.
+
+        \throws KeyError, wenn ein Key in \c items mehrfach vorkommt. Dann ist
+                nichts aufgenommen worden.
+        """
+        items = list( items)
+        self._keys_unique_( key for key, _ in items)
+        items = dict( items)
+        stripes = self._stripes_( items)
+        for i, _ in stripes:
+            self._acquire_( i)
+
+        try:
+            taken = [key for i, keys in stripes for key in keys if key in self.__shards[ i]]
+            if not taken:
+                for i, keys in stripes:
+                    shard = self.__shards[ i]
+                    for key in keys:
+                        shard[ key] = items[ key]
+
+            return taken
+
+        finally:
+            for i, _ in stripes:
+                self._release_( i)
+
+    def lock( self):
+        """Alle Shards locken.
+        """
+        for i in range( len( self.__locks)):
+            self._acquire_( i)
+
+        return
+
+    def remove( self, key):
+        """\throws KeyError, wenn \c key nicht vorhanden ist.
+        """
+        i = hash( key) % self.__stripes
+        self._acquire_( i)
+        try:
+            del self.__shards[ i][ key]
+
+        finally:
+            self._release_( i)
+
+        return
+
+    def remove_many( self, keys):
+        """Alle \c keys entfernen, jeder betroffene Shard wird nur einmal gelockt.
+
+        \throws KeyError, wenn ein Key nicht vorhanden ist oder mehrfach
+                vorkommt. Dann ist nichts entfernt worden.
+        """
+        keys = list( keys)
+        self._keys_unique_( keys)
+        stripes = self._stripes_( keys)
+        for i, _ in stripes:
+            self._acquire_( i)
+
+        try:
+            for i, keys in stripes:
+                for key in keys:
+                    if key not in self.__shards[ i]:
+                        raise KeyError( key)
+
+            for i, keys in stripes:
+                shard = self.__shards[ i]
+                for key in keys:
+                    del shard[ key]
+
+        finally:
+            for i, _ in stripes:
+                self._release_( i)
+
+        return
+
+    def stats( self):
+        """Pro Shard: Anzahl Einträge, Anzahl Wartevorgänge, Wartezeit in us.
+        """
+        return [{"len": len( shard), "waits": waits, "wait_us": waits_ns/1000} for shard, waits, waits_ns in zip( self.__shards, self.__waits, self.__waits_ns)]
+
+    def stats_reset( self):
+        self.__waits[ :] = [0]*len( self.__waits)
+        self.__waits_ns[ :] = [0]*len( self.__waits_ns)
+        return self
+
+    def unlock( self):
+        for i in reversed( range( len( self.__locks))):
+            self._release_( i)
+
+        return
+
+
 class Id:
 
-    _PublishedIDs = set()
+    _PublishedIDs = _ShardedRegistry()
 
     def __init__( self, id=None):
         if id in (None, ""):
             id = uuid.uuid4()
 
         self.__id = str( id)
-        if self.__id in Id._PublishedIDs:
+        if not Id._PublishedIDs.insert( self.__id, None):
             raise KeyError( "Id '%s' is already taken! " % self.__id)
 
-        Id._PublishedIDs.add( self.__id)
         return
 
     def __eq__( self, other):
@@ -226,19 +410,22 @@ class _ObjectSetup(Object):
 class _Objects:
 
     """Stores all Object instances.
+
+    Die Objekte liegen in einer _ShardedRegistry: Lesen erfolgt ohne Lock,
+    Schreiben lockt nur den Shard des betroffenen idents.
     """
 
-    def __init__( self):
-        self.__instances = {}
-        self.__lock = threading.RLock()
+    def __init__( self, stripes=16):
+        self.__instances = _ShardedRegistry( stripes)
+        self._insert = self.__instances.insert
+        self._get = self.__instances.get
         return
 
     def __call__( self, ident=None):
-        with self.__lock:
-            if ident is None:
-                return self
+        if ident is None:
+            return self
 
-            return self.__instances[ ident]
+        return self._get( ident)
 
     def __contains__( self, ident):
         return ident in self.__instances
@@ -246,6 +433,12 @@ class _Objects:
     def __len__( self):
         return len( self.__instances)
 
+    def _ident_check_( self, ident):
+        if not isinstance( ident, (str, bytes, int)):
+            raise ValueError( "instance.ident() must be a string, but is a " + str( type( ident)))
+
+        return
+
     def add( self, ident, instance):
         """Neues Objekt in den Speicher _Objects aufnehmen.
 
@@ -257,27 +450,54 @@ class _Objects:
             wenn folgende Bedingungen **nicht** erfüllt sind:
             -   **ident** ist kein String und kein Integer.
         """
-        with self.__lock:
-            if not isinstance( ident, (str, bytes, int)):
-                raise ValueError( "instance.ident() must be a string, but is a " + str( type( ident)))
+        self._ident_check_( ident)
+        if not self._insert( ident, instance):
+            raise KeyError( "instance.ident() = '%s' isn't unique!" % ident)
 
-            if ident in self.__instances:
-                raise KeyError( "instance.ident() = '%s' isn't unique!" % ident)
+        return self
 
-            self.__instances[ ident] = instance
-            return self
+    def add_many( self, items):
+        """Viele Objekte auf einmal aufnehmen, z.B. beim Hochfahren.
+
+        \param  items   Iterable von (ident, instance).
+
+        \throws KeyError, ValueError wie add(). Dann ist kein Objekt
+                aufgenommen worden.
+        """
+        items = list( items)
+        for ident, _ in items:
+            self._ident_check_( ident)
+
+        taken = self.__instances.insert_many( items)
+        if taken:
+            raise KeyError( "instance.ident() = '%s' isn't unique!" % taken[ 0])
+
+        return self
 
     def remove( self, ident):
         """Objekt aus dem Speicher _Objects entfernen.
         """
-        with self.__lock:
-            del self.__instances[ ident]
+        self.__instances.remove( ident)
+
+    def remove_many( self, idents):
+        """Viele Objekte auf einmal entfernen.
+
+        \throws KeyError, wenn ein ident nicht vorhanden ist oder mehrfach
+                vorkommt. Dann ist kein Objekt entfernt worden.
+        """
+        self.__instances.remove_many( idents)
+        return self
 
     def lock( self):
-        return self.__lock.acquire()
+        return self.__instances.lock()
+
+    def stats( self):
+        """Lock-Statistik pro Shard, siehe _ShardedRegistry.stats().
+        """
+        return self.__instances.stats()
 
     def unlock( self):
-        return self.__lock.release()
+        return self.__instances.unlock()
 
 
 Objects = _Objects()
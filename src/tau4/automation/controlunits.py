@@ -25,8 +25,13 @@ import ctypes
 import logging; _Logger = logging.getLogger()
 import multiprocessing as mp
 from multiprocessing import queues as mpqueue
+from multiprocessing import shared_memory
+import os
 import _pickle as pickle
 import queue
+import struct
+import time
+import weakref
 
 from tau4 import DictWithUniqueKeys
 from tau4.data import pandora
@@ -655,6 +660,165 @@ class SwIoImagewriter(IoImageTransferrer):
         return
 
 
+class IoImageCodec:
+
+    """Binärer Codec für IoImage -s, Ersatz für pickle beim Transfer über Mailboxes.
+
+    Der Codec wird einmal aus dem Layout eines IoImage erzeugt (Reihenfolge und
+    Typ der Imagelines: float -> 'd', int -> 'q'). encode() packt die Werte per
+    struct.Struct.pack_into() in einen vorab allozierten bytearray, decode()
+    schreibt sie direkt in ein vorhandenes Image zurück. Pro Zyklus wird also
+    kein Image und kein Buffer erzeugt.
+
+    Format::
+
+        mode (B), count (I), values
+
+    Im Full Mode (mode 0) folgen die Werte aller Imagelines, im Delta Mode
+    (mode 1) folgen count Paare (Index der Imageline, Wert) nur der Imagelines,
+    deren Wert sich seit dem letzten encode() geändert hat.
+
+    \param  ioimage     Image, aus dessen Imagelines das Layout abgeleitet wird.
+
+    \param  is_delta    Delta Mode?
+
+    \warning    Der Delta Mode setzt voraus, dass der Empfänger jede Nachricht
+                erhält. Er taugt also nicht für Mailboxes, die ungelesene Daten
+                überschreiben (MailboxBasedOnMpValue).
+
+    Usage:
+        \code{.py}
+            codecs = IoImageCodec.FromIoImageBuilder( IoImageBuilder( iodefs))
+            data = codecs[ "plc -> rc"].encode( sndimage)
+            ...
+            codecs[ "plc -> rc"].decode( data, rcvimage)
+        \endcode
+    """
+
+    _FORMATS = { float: "d", int: "q"}
+
+    _HEADER = struct.Struct( "=BI")
+
+    _INDEX = struct.Struct( "=I")
+
+    @staticmethod
+    def FromIoImageBuilder( ioimagebuilder, is_delta=False):
+        """Codecs aller Images des Builders, Keys sind die Channel Ids.
+        """
+        return { channelid: IoImageCodec( ioimage, is_delta) for channelid, ioimage in ioimagebuilder.ioimages().items()}
+
+    def __init__( self, ioimage: IoImage2, is_delta=False):
+        self.__is_delta = is_delta
+
+        self.__usrids = tuple( ioimage._iodefs_by_usrid.keys())
+        self.__formats = tuple( self._FORMATS[ il._typecaster] for il in ioimage._iodefs_by_usrid.values())
+        self._structs_build_()
+
+        size_full = self.__struct.size
+        size_delta = sum( self._INDEX.size + s.size for s in self.__structs)
+        self.__buffer = bytearray( self._HEADER.size + max( size_full, size_delta))
+        self.__values_remembered = [None] * len( self.__usrids)
+
+        self.__ioimage = ioimage.clone()
+                                        # Default Image für decode().
+        self.__ioimage_encoded = None
+        self.__ilines_encoded = None
+        return
+
+    def __getstate__( self):
+        state = self.__dict__.copy()
+        for name in ("_IoImageCodec__struct", "_IoImageCodec__structs"):
+            del state[ name]
+                                        # struct.Struct kann nicht gepickelt werden.
+        return state
+
+    def __setstate__( self, state):
+        self.__dict__.update( state)
+        self._structs_build_()
+        return
+
+    def _structs_build_( self):
+        self.__struct = struct.Struct( "=" + "".join( self.__formats))
+        self.__structs = tuple( struct.Struct( "=" + f) for f in self.__formats)
+        return self
+
+    def buffer( self):
+        """Buffer, in den encode() schreibt.
+        """
+        return self.__buffer
+
+    def decode( self, data, ioimage: IoImage2=None) -> IoImage2:
+        """Werte aus data ins ioimage schreiben.
+
+        \param  ioimage Image, in das geschrieben wird. Ist es None, wird das
+                        Image des Codecs verwendet.
+
+        \returns        ioimage.
+        """
+        if ioimage is None:
+            ioimage = self.__ioimage
+
+        ilines = ioimage._iodefs_by_usrid
+        usrids = self.__usrids
+        mode, count = self._HEADER.unpack_from( data)
+        if mode == 0:
+            for usrid, value in zip( usrids, self.__struct.unpack_from( data, self._HEADER.size)):
+                ilines[ usrid]._value = value
+
+        else:
+            structs = self.__structs
+            offset = self._HEADER.size
+            for _ in range( count):
+                i = self._INDEX.unpack_from( data, offset)[ 0]
+                offset += self._INDEX.size
+                ilines[ usrids[ i]]._value = structs[ i].unpack_from( data, offset)[ 0]
+                offset += structs[ i].size
+
+        return ioimage
+
+    def encode( self, ioimage: IoImage2):
+        """Werte des ioimage in den Buffer des Codecs schreiben.
+
+        \returns        memoryview auf den beschriebenen Teil des Buffers, der
+                        beim nächsten encode() überschrieben wird.
+        """
+        if ioimage is not self.__ioimage_encoded:
+            self.__ilines_encoded = tuple( ioimage._iodefs_by_usrid[ usrid] for usrid in self.__usrids)
+            self.__ioimage_encoded = ioimage
+
+        buffer = self.__buffer
+        if not self.__is_delta:
+            self.__struct.pack_into( buffer, self._HEADER.size, *[il._value for il in self.__ilines_encoded])
+            self._HEADER.pack_into( buffer, 0, 0, len( self.__usrids))
+            return memoryview( buffer)[ :self._HEADER.size + self.__struct.size]
+
+        structs = self.__structs
+        values_remembered = self.__values_remembered
+        offset = self._HEADER.size
+        count = 0
+        for i, il in enumerate( self.__ilines_encoded):
+            value = il._value
+            if value != values_remembered[ i]:
+                self._INDEX.pack_into( buffer, offset, i)
+                offset += self._INDEX.size
+                structs[ i].pack_into( buffer, offset, value)
+                offset += structs[ i].size
+
+                values_remembered[ i] = value
+                count += 1
+
+        self._HEADER.pack_into( buffer, 0, 1, count)
+        return memoryview( buffer)[ :offset]
+
+    def ioimage( self) -> IoImage2:
+        """Image, in das decode() schreibt, wenn kein anderes angegeben wird.
+        """
+        return self.__ioimage
+
+    def is_delta( self):
+        return self.__is_delta
+
+
 class _Mailbox:
 
     """Mailbox des IoChannel und damit der eigentliche Kanal.
@@ -666,10 +830,13 @@ class _Mailbox:
 
     \_2DO   Derzeit ist die Mailbox realisiert per mp.Queue. Eine mp.Connection oder
             mp.Pipe wäre zu überlegen.
+
+    \param  codec   IoImageCodec, der statt pickle verwendet wird, optional.
     """
 
-    def __init__( self, iochannelid):
+    def __init__( self, iochannelid, codec: IoImageCodec=None):
         self._iochannelid = iochannelid
+        self._codec = codec
 
         self.__flag_ioimage_has_changed = mp.Value( "i", 1)
         self._lock = mp.Lock()
@@ -678,6 +845,12 @@ class _Mailbox:
     def __repr__( self):
         return "%s( '%s')" % (self.__class__.__name__, self._iochannelid)
 
+    @classmethod
+    def FromIoImage( klass, iochannelid, ioimage, codec=None):
+        """Used by IoChannelBuilder, Mailboxes, that need to know the IoImage's layout, override this.
+        """
+        return klass( iochannelid, codec=codec)
+
     def _ioimage_unpickled_( self, ioimage_pickled):
         try:
             return pickle.loads( ioimage_pickled)
@@ -692,6 +865,20 @@ class _Mailbox:
                                         #   müssen wir "human readable" arbeiten.
         return ioimage_picked
 
+    def close( self):
+        """Resourcen des aufrufenden Prozesses freigeben.
+
+        Die Mailbox hat keine, Mailboxes mit eigenen Resourcen überschreiben das.
+        """
+        return self
+
+    def unlink( self):
+        """Resourcen systemweit freigeben, auszuführen vom Owner der Mailbox.
+
+        Die Mailbox hat keine, Mailboxes mit eigenen Resourcen überschreiben das.
+        """
+        return self
+
     def ioimage_is_marked_as_dirty( self):
         """_IoImage is (virtually) marked as changed.
         """
@@ -722,8 +909,8 @@ class MailboxBasedOnMpQueue(_Mailbox):
     \warning    Nicht zuverlässig!
     """
 
-    def __init__( self, iochannelid):
-        super().__init__( iochannelid)
+    def __init__( self, iochannelid, codec: IoImageCodec=None):
+        super().__init__( iochannelid, codec)
 
         self.__q = mp.Queue()
         self.__lock = mp.Lock()
@@ -732,6 +919,9 @@ class MailboxBasedOnMpQueue(_Mailbox):
     def put_nowait( self, ioimage):
         """Senden, Ausführung durch Sender.
         """
+        if self._codec:
+            ioimage = bytes( self._codec.encode( ioimage))
+
         try:
             self.__q.put( ioimage, block=False)
 
@@ -765,6 +955,9 @@ class MailboxBasedOnMpQueue(_Mailbox):
             except queue.Empty:
                 ioimage = None
 
+        if ioimage is not None and self._codec:
+            ioimage = self._codec.decode( ioimage)
+
         return ioimage
 
 
@@ -782,10 +975,17 @@ class MailboxBasedOnMpValue(_Mailbox):
     \param  size    Größe des Arrays, das für den Datentransfer verwendet wird.
                     Muss leider so früh festgelegt werden. Schlimmer noch: Man
                     kann auch zuwenig angeben (sehr große Images).
+
+    \param  codec   IoImageCodec, optional. Mit Codec werden die Daten binär
+                    ins Array geschrieben, der Codec darf aber nicht im Delta
+                    Mode arbeiten, weil die Mailbox ungelesene Daten überschreibt.
     """
 
-    def __init__( self, iochannelid, size=4096):
-        super().__init__( iochannelid)
+    def __init__( self, iochannelid, size=4096, codec: IoImageCodec=None):
+        if codec and codec.is_delta():
+            raise ValueError( "%s cannot use a codec in delta mode!" % self.__class__.__name__)
+
+        super().__init__( iochannelid, codec)
 
 # ##### Hängt sich beim Unpicklen auf! Siehe dazu _ioimage_unpickled_().
 #        self.__ioimage_pickled = mp.Value( ctypes.c_char_p, lock=True)
@@ -807,7 +1007,11 @@ class MailboxBasedOnMpValue(_Mailbox):
                                             #   die Dirty-Erkennung für den nächsten
                                             #   Durchlauf automatisch zurück!
                 self.ioimage_mark_as_dirty()
-                self.__ioimage_pickled.value = self._ioimage_pickled_( ioimage)
+                if self._codec:
+                    self.__ioimage_pickled.raw = self._codec.encode( ioimage)
+
+                else:
+                    self.__ioimage_pickled.value = self._ioimage_pickled_( ioimage)
 
             return self
 
@@ -819,9 +1023,13 @@ class MailboxBasedOnMpValue(_Mailbox):
         with self._lock:
             ioimage = None
             if self.ioimage_is_marked_as_dirty():
-                ioimage = self._ioimage_unpickled_( self.__ioimage_pickled.value)
-                if not ioimage:
-                    ioimage = None
+                if self._codec:
+                    ioimage = self._codec.decode( self.__ioimage_pickled.get_obj())
+
+                else:
+                    ioimage = self._ioimage_unpickled_( self.__ioimage_pickled.value)
+                    if not ioimage:
+                        ioimage = None
 
                 self.ioimage_unmark_as_dirty()
 
@@ -851,8 +1059,8 @@ class MailboxBasedOnMpPipe(_Mailbox):
     Relativ schnell und zuverlässig.
     """
 
-    def __init__( self, iochannelid):
-        super().__init__( iochannelid)
+    def __init__( self, iochannelid, codec: IoImageCodec=None):
+        super().__init__( iochannelid, codec)
 
         self.__conn_rcv, self.__conn_snd = mp.Pipe( False)
         self.__lock = mp.Lock()
@@ -863,7 +1071,11 @@ class MailboxBasedOnMpPipe(_Mailbox):
         """
         with self.__lock:
             try:
-                self.__conn_snd.send( ioimage)
+                if self._codec:
+                    self.__conn_snd.send_bytes( self._codec.encode( ioimage))
+
+                else:
+                    self.__conn_snd.send( ioimage)
 
             except ValueError as e:
                 _Logger.critical( "%s.put_nowait(): %s. ", self.__class__.__name__, e)
@@ -879,7 +1091,13 @@ class MailboxBasedOnMpPipe(_Mailbox):
         with self.__lock:
             try:
                 while self.__conn_rcv.poll():
-                    ioimage = self.__conn_rcv.recv()
+                    if self._codec:
+                        self.__conn_rcv.recv_bytes_into( self._codec.buffer())
+                        ioimage = self._codec.decode( self._codec.buffer())
+                                        # Im Delta Mode muss jede Nachricht
+                                        #   decodiert werden.
+                    else:
+                        ioimage = self.__conn_rcv.recv()
 
             except ValueError as e:
                 _Logger.critical( "%s.get_nowait(): %s. ", self.__class__.__name__, e)
@@ -887,6 +1105,175 @@ class MailboxBasedOnMpPipe(_Mailbox):
         return ioimage
 
 
+class MailboxBasedOnSharedMemory(_Mailbox):
+
+    """Mailbox des IoChannel und damit der eigentliche Kanal, basierend auf shared_memory.SharedMemory.
+
+    Die Mailbox unterscheidet sich von einer Queue, Connection (oder was auch immer)
+    dadurch, dass der Sender darin befindliche Daten überschreibt, wenn sie durch
+    den Empfänger nicht abgeholt worden sind. So ist gesichert, dass der Empfänger
+    nur aktuelle Daten erhält.
+
+    Das Image wird nicht gepickelt: Das Layout des Shared Memory wird einmal aus
+    den Imagelines des IoImage abgeleitet (float -> 'd', int -> 'q'), die Werte
+    werden per struct.Struct.pack_into() direkt ins Shared Memory geschrieben
+    und per unpack_from() direkt in ein vorhandenes Image gelesen.
+
+    Sender und Empfänger synchronisieren sich über einen Sequence Counter
+    (Seqlock) am Anfang des Shared Memory: Der Sender zählt vor dem Schreiben
+    auf eine ungerade und danach auf eine gerade Zahl. Der Empfänger liest
+    erneut, wenn der Counter ungerade ist oder sich während des Lesens geändert
+    hat. Der Sender wird also nie blockiert.
+
+    Schnell und zuverlässig, es darf aber nur \b einen Sender geben.
+
+    Owner des Shared Memory ist der Prozess, der die Mailbox erzeugt (in der
+    Regel der, in dem der IoChannelBuilder läuft). Jeder Prozess, der die
+    Mailbox verwendet, ruft beim Shutdown close(), der Owner danach
+    unlink(); IoChannelBuilder.close() erledigt beides für alle Channels.
+    Vergisst der Owner unlink(), holt das ein Finalizer nach, wenn die
+    Mailbox im Owner abgeräumt wird oder der Owner sich beendet.
+
+    \param  ioimage Image, aus dessen Imagelines das Layout abgeleitet wird.
+    """
+
+    _FORMATS = { float: "d", int: "q"}
+
+    _SEQ = struct.Struct( "=Q")
+
+    _READ_RETRIES_MAX = 100
+                                        # Versuche pro get_nowait(), danach gilt
+                                        #   die Mailbox in diesem Zyklus als leer.
+
+    def __init__( self, iochannelid, ioimage: IoImage2):
+        super().__init__( iochannelid)
+
+        self.__usrids = tuple( ioimage._iodefs_by_usrid.keys())
+        self.__struct = struct.Struct( "=" + "".join( self._FORMATS[ il._typecaster] for il in ioimage._iodefs_by_usrid.values()))
+                                        # Werte, sie liegen hinter dem Sequence Counter.
+        size = self._SEQ.size + self.__struct.size
+        self.__shm = shared_memory.SharedMemory( create=True, size=size)
+        self.__shm.buf[ :size] = bytes( size)
+        self.__finalizer = weakref.finalize( self, self._Unlink_, self.__shm, os.getpid())
+                                        # Nur der Owner gibt das Shared Memory frei.
+
+        self.__rcvimage = ioimage.clone()
+                                        # Image, in das der Empfänger liest.
+        self.__seq_seen = 0
+        self.__retries = 0
+        return
+
+    def __getstate__( self):
+        state = self.__dict__.copy()
+        state[ "_MailboxBasedOnSharedMemory__struct"] = self.__struct.format
+                                        # struct.Struct kann nicht gepickelt werden.
+        state[ "_MailboxBasedOnSharedMemory__finalizer"] = None
+                                        # Der Finalizer gehört zum Owner.
+        return state
+
+    def __setstate__( self, state):
+        self.__dict__.update( state)
+        self.__struct = struct.Struct( self.__struct)
+        return
+
+    @staticmethod
+    def _Unlink_( shm, pid):
+        if os.getpid() != pid:
+            return
+                                        # Geforkte Kopie der Mailbox: Nicht Owner.
+        shm.close()
+        try:
+            shm.unlink()
+
+        except FileNotFoundError:
+            pass
+
+        return
+
+    @classmethod
+    def FromIoImage( klass, iochannelid, ioimage, codec=None):
+        if codec:
+            raise ValueError( "%s doesn't need a codec, it derives its own layout from the IoImage!" % klass.__name__)
+
+        return klass( iochannelid, ioimage)
+
+    @overrides( _Mailbox)
+    def close( self):
+        """Shared Memory schließen, auszuführen von allen Prozessen, die die Mailbox verwenden.
+        """
+        self.__shm.close()
+        return self
+
+    @overrides( _Mailbox)
+    def unlink( self):
+        """Shared Memory freigeben, auszuführen vom Owner, also vom Prozess, der die Mailbox erzeugt hat.
+
+        Wiederholte Aufrufe und Aufrufe aus anderen Prozessen tun nichts.
+        """
+        if self.__finalizer is not None:
+            self.__finalizer()
+
+        return self
+
+    def name( self):
+        """Name des Shared Memory.
+        """
+        return self.__shm.name
+
+    def put_nowait( self, ioimage):
+        """Senden, Ausführung durch Sender.
+        """
+        buf = self.__shm.buf
+        seq = self._SEQ.unpack_from( buf)[ 0] + 1
+        self._SEQ.pack_into( buf, 0, seq)
+                                        # Ungerade: Sender schreibt gerade.
+        ilines = ioimage._iodefs_by_usrid
+        self.__struct.pack_into( buf, self._SEQ.size, *[ilines[ usrid]._value for usrid in self.__usrids])
+        self._SEQ.pack_into( buf, 0, seq + 1)
+                                        # Gerade: Werte sind konsistent.
+        return self
+
+    def get_nowait( self):
+        """Nichtblockierendes Empfangen, Ausführung durch Empfänger.
+
+        \returns    None    wenn keine neuen Daten zum Empfangen da sind
+                            oder der Sender länger als _READ_RETRIES_MAX
+                            Versuche lang schreibt (ein Sender, der mitten im
+                            Schreiben stirbt, hinterlässt einen ungeraden
+                            Counter), sonst immer dasselbe Image mit den neuen
+                            Werten.
+        """
+        buf = self.__shm.buf
+        for _ in range( self._READ_RETRIES_MAX):
+            seq = self._SEQ.unpack_from( buf)[ 0]
+            if seq == self.__seq_seen:
+                return None
+
+            if not seq & 1:
+                values = self.__struct.unpack_from( buf, self._SEQ.size)
+                if self._SEQ.unpack_from( buf)[ 0] == seq:
+                    break
+
+            self.__retries += 1
+            time.sleep( 0)
+                                        # Dem Sender die CPU lassen.
+        else:
+            return None
+
+        self.__seq_seen = seq
+
+        ilines = self.__rcvimage._iodefs_by_usrid
+        for usrid, value in zip( self.__usrids, values):
+            ilines[ usrid]._value = value
+
+        return self.__rcvimage
+
+    def retries( self):
+        """Wie oft der Empfänger erneut lesen musste, weil der Sender gerade geschrieben hat.
+        """
+        return self.__retries
+
+
 class HwIoPort:
 
     """Erzeugt aus IoDef -s ios2.Port -s und stellt sie HwIoControl zur Verfügung.
@@ -1062,10 +1449,19 @@ class SwIoChannel:
 class IoChannelBuilder:
 
     """Erzeugt aus den IoDef -s die SwIoChannel -s.
+
+    \param  mailboxclass    Klasse der Mailboxes der SwIoChannel -s, Default
+                            ist MailboxBasedOnMpValue.
+
+    \param  codec           None (pickle), "full" oder "delta": Die Mailboxes
+                            verwenden einen IoImageCodec im jeweiligen Mode.
     """
 
-    def __init__( self, iodefs):
+    def __init__( self, iodefs, mailboxclass=None, codec=None):
+        assert codec in (None, "full", "delta")
         self.__iodefs = iodefs
+        self.__mailboxclass = mailboxclass if mailboxclass else MailboxBasedOnMpValue
+        self.__codec = codec
 
         self.__iochannels = {}
         return
@@ -1086,11 +1482,23 @@ class IoChannelBuilder:
         #
         for channelid, iodefs in iodefdicts_by_channelid.items():
             ioimage = SwIoImage2( list( iodefs.values()))
-            iochannel = SwIoChannel( ioimage, MailboxBasedOnMpValue( channelid))
+            codec = IoImageCodec( ioimage, is_delta=self.__codec == "delta") if self.__codec else None
+            iochannel = SwIoChannel( ioimage, self.__mailboxclass.FromIoImage( channelid, ioimage, codec))
             self.__iochannels[ channelid] = iochannel
 
         return
 
+    def close( self):
+        """Mailboxes aller gebauten Channels schließen und freigeben.
+
+        Auszuführen vom Owner des Builders beim Shutdown, nachdem die Controls,
+        die die Channels verwenden, beendet sind.
+        """
+        for iochannel in self.__iochannels.values():
+            iochannel.mailbox().close().unlink()
+
+        return self
+
     def iochannel( self, iochannelid) -> SwIoChannel:
         return self.iochannels()[ iochannelid]
 
@@ -1118,8 +1526,8 @@ class ControlCP(mtp.CyclingProcess):
             HwIoControl!
     """
 
-    def __init__( self, cycletime):
-        super().__init__( id=self.__class__.__name__, cycletime=cycletime)
+    def __init__( self, cycletime, schedprofile: mtp.SchedulingProfile=None, gc_in_slack=False):
+        super().__init__( id=self.__class__.__name__, cycletime=cycletime, schedprofile=schedprofile, gc_in_slack=gc_in_slack)
 
         ### Channels und ihre Reader und Writer
         #
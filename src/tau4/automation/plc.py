@@ -22,6 +22,7 @@
 
 import abc
 from collections import OrderedDict
+import heapq
 import time
 
 from tau4.timing import Timer
@@ -473,9 +474,20 @@ class PLC(Cycler, metaclass=abc.ABCMeta):
     """SPS.
 
     Eine SPS ist üblicherweise der "Schrittmacher" in Automatisierungslösungen.
+
+    Die Jobs werden über einen Min-Heap auf dem Zykluszähler der PLC
+    geplant: Ein Job mit der Zykluszeit c wird alle n Zyklen ausgeführt, wobei
+    n die Anzahl der Zyklen ist, nach denen c - n*cycletime_plc <= 0 wird;
+    das entspricht dem Herunterzählen der Restzeit in jedem Zyklus. Ein Zyklus
+    kostet also nur für die fälligen Jobs etwas. Die in einem Zyklus fälligen
+    Jobs laufen in der Reihenfolge, in der sie hinzugefügt worden sind.
+
+    Zurücksetzen (job_reset()) und Entfernen (job_cancel()) eines Jobs
+    invalidieren seinen Eintrag im Heap nur; er wird verworfen, wenn er oben
+    ankommt.
     """
 
-    def __init__( self, *, cycletime_plc, cycletime_ios, is_daemon, startdelay=0):
+    def __init__( self, *, cycletime_plc, cycletime_ios, is_daemon, startdelay=0, id=None):
         """
 
         :param  iainps:
@@ -486,10 +498,24 @@ class PLC(Cycler, metaclass=abc.ABCMeta):
         Usage::
             2DO: Code aus iio hier her kopieren.
         """
-        super().__init__( cycletime=cycletime_plc, udata=None, is_daemon=is_daemon)
+        super().__init__( id=id, cycletime=cycletime_plc, udata=None, is_daemon=is_daemon, startdelay=startdelay)
 
         self.__jobs = []
-        self.__jobindexes = dict( list( zip( [ job.id() for job in self.__jobs], list( range( len( self.__jobs))))))
+        self.__jobs_by_id = {}
+
+        self.__cycles = 0
+        self.__jobheap = []
+        self.__jobentries = {}
+                                        # Job -> [due, order, seq, job, period],
+                                        #   job ist None bei invalidierten
+                                        #   Einträgen. seq ist je Eintrag
+                                        #   eindeutig, sodass heapq nie Jobs
+                                        #   vergleicht.
+        self.__jobentry_seq = 0
+        self.__joborders = {}
+        self.__joborder_next = 0
+        self.__jobperiods = {}
+                                        # Zykluszeit eines Jobs -> Zyklen.
 
         self.__operationmode = OpMode()
         return
@@ -526,19 +552,84 @@ class PLC(Cycler, metaclass=abc.ABCMeta):
         """
         pass
 
+    def cycles( self):
+        """Anzahl der bisher ausgeführten Zyklen.
+        """
+        return self.__cycles
+
     def job_add( self, job):
         if job.cycletime() < self.cycletime():
             raise ValueError( "Cycletime of Job '%s' must not be greater than %f, but is %f!" % (self.__class__.__name__, self.cycletime(), job.cycletime()))
 
+        self.__joborders[ job] = self.__joborder_next
+        self.__joborder_next += 1
         self.__jobs.append( job)
-        self.__jobindexes = dict( list( zip( [ job.id() for job in self.__jobs], list( range( len( self.__jobs))))))
+        self.__jobs_by_id[ job.id()] = job
+        self._job_schedule_( job)
+        return self
+
+    def job_cancel( self, job):
+        """Job entfernen, er wird nicht mehr ausgeführt.
+        """
+        entry = self.__jobentries.pop( job)
+        entry[ 3] = None
+        self.__jobs.remove( job)
+        if self.__jobs_by_id.get( job.id()) is job:
+            del self.__jobs_by_id[ job.id()]
+
+        del self.__joborders[ job]
+        return self
+
+    def job_period( self, job):
+        """Anzahl der Zyklen zwischen zwei Ausführungen von \c job.
+        """
+        cycletime = job.cycletime()
+        period = self.__jobperiods.get( cycletime)
+        if period is None:
+            period = 0
+            rtime = cycletime
+            while rtime > 0:
+                rtime -= self.cycletime()
+                period += 1
+                                        # Wie bisher Job.rtime_decr() in
+                                        #   jedem Zyklus, mit denselben Fehlern
+                                        #   der Floating Point Arithmetik.
+            self.__jobperiods[ cycletime] = period
+
+        return period
+
+    def job_reset( self, job):
+        """Job neu starten, d.h. er wird eine Zykluszeit nach jetzt fällig.
+        """
+        entry = self.__jobentries.get( job)
+        if entry is not None:
+            entry[ 3] = None
+            self._job_schedule_( job)
+
         return self
 
+    def job_rtime( self, job):
+        """Zeit bis zur nächsten Ausführung von \c job oder None, wenn er nicht geplant ist.
+        """
+        entry = self.__jobentries.get( job)
+        if entry is None:
+            return None
+
+        return (entry[ 0] - self.__cycles)*self.cycletime()
+
+    def _job_schedule_( self, job):
+        period = self.job_period( job)
+        self.__jobentry_seq += 1
+        entry = [ self.__cycles + period, self.__joborders[ job], self.__jobentry_seq, job, period]
+        self.__jobentries[ job] = entry
+        heapq.heappush( self.__jobheap, entry)
+        return
+
     def jobs( self, id=None):
         if id is None:
             return self.__jobs
 
-        return self.__jobs[ self.__jobindexes[ id]]
+        return self.__jobs_by_id[ id]
 
     def operationmode( self) -> OpMode:
         return self.__operationmode
@@ -557,15 +648,26 @@ class PLC(Cycler, metaclass=abc.ABCMeta):
         #
         self.operationmode().sm().execute()
 
+        self.__cycles += 1
+        cycles = self.__cycles
+        heap = self.__jobheap
         jobs2exec = []
-        for job in self.__jobs:
-            job.rtime_decr( self.cycletime())
-            if job.rtime() <= 0:
-                jobs2exec.append( job)
-                job.rtime_reset()
-
+        while heap and heap[ 0][ 0] <= cycles:
+            entry = heapq.heappop( heap)
+            job = entry[ 3]
+            if job is None:
+                continue
+                                        # Invalidiert.
+            jobs2exec.append( job)
+            entry[ 0] = cycles + entry[ 4]
+            heapq.heappush( heap, entry)
+
+        perf_counter = time.perf_counter
         for job in jobs2exec:
+            t = perf_counter()
             job.execute()
+            if perf_counter() - t > job.cycletime():
+                job._overrun_()
 
         ### Alle Ausgänge schreiben
         #
@@ -613,6 +715,7 @@ class Job(metaclass=abc.ABCMeta):
         self.__id = id if not id in (-1, None, "") else self.__class__.__name__
         self.__cycletime = cycletime
         self.__time_rem = cycletime
+        self.__overruns = 0
 
         return
 
@@ -626,11 +729,23 @@ class Job(metaclass=abc.ABCMeta):
     def id( self):
         return self.__id
 
+    def _overrun_( self):
+        self.__overruns += 1
+        return self
+
+    def overruns( self):
+        """How often execute() took longer than the job's cycle time.
+        """
+        return self.__overruns
+
     def plc( self) -> PLC:
         return self.__plc
 
     def rtime_decr( self, secs):
         """Decrease the remaining time until executed.
+
+        \note  Only effective for jobs not added to a PLC, the PLC schedules
+                its jobs on its cycle counter.
         """
         self.__time_rem -= secs
         return self
@@ -638,12 +753,20 @@ class Job(metaclass=abc.ABCMeta):
     def rtime( self):
         """Remaining time until executed.
         """
+        if self.__plc is not None:
+            rtime = self.__plc.job_rtime( self)
+            if rtime is not None:
+                return rtime
+
         return self.__time_rem
 
     def rtime_reset( self):
         """Reset remaining time until executed to cycle time again.
         """
         self.__time_rem = self.__cycletime
+        if self.__plc is not None:
+            self.__plc.job_reset( self)
+
         return self
 
 
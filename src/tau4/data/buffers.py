@@ -20,7 +20,9 @@
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
 
+import bisect
 import collections
+import math
 import statistics
 import sys
 
@@ -68,28 +70,218 @@ class RingbufferTyped(Ringbuffer):
         return self
 
 
+class _StatistixEngine:
+
+    """Incremental mean, variance, median, min, and max of a sliding window.
+
+    The window is FIFO: remove() always removes the oldest sample.
+
+    -   Mean and variance: Welford's algorithm, extended by removal.
+    -   Median: Sorted list maintained by bisect.
+    -   Min and max: Monotonic deques.
+
+    Welford accumulates rounding errors when samples are removed. Therefore
+    mean and variance are recomputed from scratch every \c recompute_every
+    updates.
+    """
+
+    def __init__( self, recompute_every):
+        self.__recompute_every = max( 1, recompute_every)
+        self.__updates = 0
+        self.__recomputes = 0
+        self.clear()
+        return
+
+    def add( self, value):
+        self.__n += 1
+        delta = value - self.__mean
+        self.__mean += delta/self.__n
+        self.__m2 += delta*(value - self.__mean)
+
+        bisect.insort( self.__sorted, value)
+
+        seq = self.__seq_in
+        self.__seq_in += 1
+        mins = self.__mins
+        while mins and mins[ -1][ 1] >= value:
+            mins.pop()
+
+        mins.append( (seq, value))
+        maxs = self.__maxs
+        while maxs and maxs[ -1][ 1] <= value:
+            maxs.pop()
+
+        maxs.append( (seq, value))
+        return self
+
+    def clear( self):
+        self.__n = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0
+        self.__sorted = []
+        self.__mins = collections.deque()
+        self.__maxs = collections.deque()
+        self.__seq_in = 0
+        self.__seq_out = 0
+        return self
+
+    def max( self):
+        return self.__maxs[ 0][ 1]
+
+    def mean( self):
+        return self.__mean
+
+    def median( self):
+        values = self.__sorted
+        n = len( values)
+        i = n//2
+        if n % 2:
+            return values[ i]
+
+        return (values[ i - 1] + values[ i])/2
+
+    def min( self):
+        return self.__mins[ 0][ 1]
+
+    def recompute( self, values):
+        """Exact mean and variance of \c values, which must be the current window.
+        """
+        n = len( values)
+        self.__n = n
+        self.__mean = math.fsum( values)/n if n else 0.0
+        self.__m2 = math.fsum( (value - self.__mean)**2 for value in values)
+        self.__updates = 0
+        self.__recomputes += 1
+        return self
+
+    def recomputes( self):
+        return self.__recomputes
+
+    def remove( self, value):
+        """Remove the oldest sample, which is \c value.
+        """
+        if self.__n == 1:
+            return self.clear()
+
+        self.__n -= 1
+        delta = value - self.__mean
+        self.__mean -= delta/self.__n
+        self.__m2 -= delta*(value - self.__mean)
+        if self.__m2 < 0:
+            self.__m2 = 0.0
+
+        values = self.__sorted
+        del values[ bisect.bisect_left( values, value)]
+
+        seq = self.__seq_out
+        self.__seq_out += 1
+        if self.__mins[ 0][ 0] == seq:
+            self.__mins.popleft()
+
+        if self.__maxs[ 0][ 0] == seq:
+            self.__maxs.popleft()
+
+        return self
+
+    def updated( self, values):
+        """Count an update, recompute if due.
+        """
+        self.__updates += 1
+        if self.__updates >= self.__recompute_every:
+            self.recompute( values)
+
+        return self
+
+    def variance( self):
+        return self.__m2/(self.__n - 1)
+
+
 class RingbufferStatistix(RingbufferTyped):
 
-    def __init__( self, elemcount_max, elems=None):
-        super().__init__( float, elemcount_max, elems)
+    """Ringbuffer providing statistics of its elements.
+
+    The statistics are maintained incrementally by each elem() call, so
+    querying them is O(1) (median: O(1) query, O(n) memmove on update).
+
+    \param  recompute_every Number of updates after which mean and variance
+                            are recomputed from scratch to get rid of
+                            accumulated rounding errors. Defaults to
+                            elemcount_max.
+
+    \note   Don't modify the deque returned by elems(), as this bypasses the
+            statistics.
+    """
+
+    def __init__( self, elemcount_max, elems=None, recompute_every=None):
+        super().__init__( float, elemcount_max, [float( elem) for elem in elems] if elems else None)
+
+        self.__engine = _StatistixEngine( recompute_every or elemcount_max)
+        for elem in self.elems():
+            self.__engine.add( elem)
+
         return
 
+    def elem( self, elem=None):
+        engine = self.__engine
+        if elem is None:
+            elem = super().elem()
+            if elem is not None:
+                engine.remove( elem)
+                engine.updated( self.elems())
+
+            return elem
+
+        elem = float( elem)
+                                        # Typecast first: If it fails, neither
+                                        #   buffer nor statistics have changed.
+        elems = self.elems()
+        if len( elems) == elems.maxlen:
+            engine.remove( elems[ 0])
+
+        super().elem( elem)
+        engine.add( elem)
+        engine.updated( elems)
+        return self
+
+    def max( self):
+        if not self.elemcount():
+            raise statistics.StatisticsError( "max requires at least one data point")
+
+        return self.__engine.max()
+
     def mean( self):
-        return statistics.mean( self.elems())
+        if not self.elemcount():
+            raise statistics.StatisticsError( "mean requires at least one data point")
+
+        return self.__engine.mean()
 
     def median( self):
-        return statistics.median( self.elems())
+        if not self.elemcount():
+            raise statistics.StatisticsError( "no median for empty data")
 
-    def stddev( self):
-        try:
-            return statistics.stdev( self.elems())
+        return self.__engine.median()
+
+    def min( self):
+        if not self.elemcount():
+            raise statistics.StatisticsError( "min requires at least one data point")
+
+        return self.__engine.min()
+
+    def recomputes( self):
+        """Number of exact recomputes done so far.
+        """
+        return self.__engine.recomputes()
 
-        except statistics.StatisticsError:
+    def stddev( self):
+        if self.elemcount() < 2:
             return sys.float_info.max
 
-    def stdev( self):
-        try:
-            return statistics.stdev( self.elems())
+        return math.sqrt( self.__engine.variance())
+
+    stdev = stddev
 
-        except statistics.StatisticsError:
+    def variance( self):
+        if self.elemcount() < 2:
             return sys.float_info.max
+
+        return self.__engine.variance()
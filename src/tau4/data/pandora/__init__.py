@@ -19,7 +19,7 @@
 #   You should have received a copy of the GNU General Public License
 #   along with pandora. If not, see <http://www.gnu.org/licenses/>.
 
-from tau4.data.pandora._boxes import Box, BoxClipping, BoxClippingMonitored, BoxGuarded, BoxMonitored, Shelf
+from tau4.data.pandora._boxes import Box, BoxClipping, BoxColumnar, BoxClippingMonitored, BoxGuarded, BoxMonitored, Shelf
 import tau4.data.pandora.formatters
 import tau4.data.pandora.plugins
 
@@ -23,10 +23,13 @@ from collections import OrderedDict
 import configparser as cp
 import sys
 import uuid
+import weakref
 
 from tau4 import Object
 from tau4.sweng import Singleton
 
+from tau4.data.pandora import _pipelines
+from tau4.data.pandora._columns import _Columns
 from tau4.data.pandora.plugins import _Plugins, Clipper, Clipper4Numbers, Guard, Guard4Numbers, Monitor, Plugin
 
 
@@ -112,7 +115,9 @@ class Box(Object):
         if plugins:
             for plugin in plugins:
                 self.__plugins.append( plugin)
+                Shelf()._plugin_owner_add_( plugin.id(), self)
 
+        self._pipeline_compile_()
         return
 
     def __iter__( self):
@@ -177,12 +182,36 @@ class Box(Object):
         """
         raise NotImplementedError( "'%s' does not support this protocol, try 'BoxMonitored' etc.!" % self.__class__.__name__)
 
+    def _pipeline_compile_( self):
+        """Fuse typecast and plugins into a single function (see module _pipelines).
+        """
+        typecast = self.__type if type( self)._typecast_ is Box._typecast_ else self._typecast_
+        self.__pipeline = _pipelines.compiled( typecast, self.__plugins.values())
+        return self
+
     def plugin_append( self, plugin : Plugin):
         """Append a new plugin.
 
         \note   The order the plugns are appended defines the order the plugins are executed.
         """
         self.__plugins.append( plugin)
+        Shelf()._plugin_owner_add_( plugin.id(), self)
+        self._pipeline_compile_()
+        return self
+
+    def plugin_remove( self, plugin_id):
+        """Remove a plugin.
+        """
+        self.__plugins.remove( plugin_id)
+        Shelf()._plugin_owner_remove_( plugin_id, self)
+        self._pipeline_compile_()
+        return self
+
+    def _plugin_replace_( self, plugin : Plugin):
+        """Replace the plugin having the same id and recompile the pipeline, see Shelf.plugin_replace().
+        """
+        self.__plugins.replace( plugin)
+        self._pipeline_compile_()
         return self
 
     def _typecast_( self, arg):
@@ -205,10 +234,8 @@ class Box(Object):
         if value is None:
             return self.__value
 
-        value = self._typecast_( value)
-
-        for plugin in self.__plugins.values():
-            value = plugin.process_value( value)
+        value = self.__pipeline( value)
+                                        # Typecast and all plugins, see _pipeline_compile_().
 
         #assert self._type_is_valid_( value)
         self.__value = value
@@ -216,6 +243,89 @@ class Box(Object):
     data = value
 
 
+class _ColumnDetached:
+
+    """Column of a BoxColumnar, that has been removed from the Shelf.
+
+    Its slot may already belong to another box, so any access raises.
+    """
+
+    def __init__( self, id):
+        self.__id = id
+        return
+
+    @property
+    def data( self):
+        raise KeyError( "Box '%s' has been removed from the shelf!" % self.__id)
+
+
+class BoxColumnar(Box):
+
+    """Box, deren Wert nicht in der Box, sondern in einer Column des Shelfs liegt.
+
+    \param  value   Initial value. Must be a bool, an int, or a float, which
+                    determines the column (and the type) of the box's value.
+
+    \param  id      The Box's identification. Must not be None, because the
+                    Box is addressed by its id when accessed in bulk.
+
+    Usage:
+        \code{.py}
+            from tau4.data import pandora
+
+            ids = tuple( "sensor.%d" % i for i in range( 10000))
+            for id in ids:
+                pandora.BoxColumnar( value=0.0, id=id)
+
+            values = pandora.Shelf().values_get( ids)
+                                        # numpy array
+            pandora.Shelf().values_set( ids, values * 2)
+        \endcode
+
+    \note   A columnar box does not support plugins, it's meant for cycles that
+            read and write lots of boxes at once. Use the other boxes if you
+            need clipping, monitoring etc.
+    """
+
+    def __init__( self, *, value, id, label="", dim="", infos=""):
+        if id is None:
+            raise ValueError( "A '%s' needs an id!" % self.__class__.__name__)
+
+        Shelf().columns().column( type( value))
+                                        # Raises a TypeError before the box is
+                                        #   added to the shelf.
+        super().__init__( value=value, id=id, label=label, dim=dim, infos=infos, plugins=None)
+
+        self.__column, self.__slot = Shelf().columns().slot_alloc( id, value)
+        return
+
+    def __iter__( self):
+        for item in (self.id(), self.value()):
+            yield item
+
+    def plugin_append( self, plugin : Plugin):
+        raise NotImplementedError( "'%s' does not support plugins!" % self.__class__.__name__)
+
+    def _slot_detach_( self):
+        """Called by Shelf.box_remove() after the slot has been freed.
+        """
+        self.__column, self.__slot = _ColumnDetached( self.id()), None
+        return self
+
+    def slot( self):
+        """Index of the box's value in its column, None if the box has been removed from the Shelf.
+        """
+        return self.__slot
+
+    def value( self, value=None):
+        if value is None:
+            return self.__column.data.item( self.__slot)
+
+        self.__column.data[ self.__slot] = self._typecast_( value)
+        return self.__column.data.item( self.__slot)
+    data = value
+
+
 class BoxGuarded(Box):
 
     """Box enthält einen Guard und einen Monitor.
@@ -246,6 +356,9 @@ class BoxGuarded(Box):
         Shelf().plugin_add( monitor)
 
         self.plugin_append( monitor)
+
+        self.__guard = _PluginBinding( Shelf(), self.__guard_id)
+        self.__monitor = _PluginBinding( Shelf(), self.__monitor_id)
         return
 
     def bounds( self, bounds: tuple):
@@ -258,7 +371,7 @@ class BoxGuarded(Box):
     def guard( self) -> Clipper:
         """Zugriff auf den \c Guard.
         """
-        return Shelf().plugin( self.__guard_id)
+        return self.__guard()
 
     def is_clipping( self):
         """False.
@@ -268,7 +381,7 @@ class BoxGuarded(Box):
     def monitor( self) -> Monitor:
         """Zugriff auf den Monitor.
         """
-        return Shelf().plugin( self.__monitor_id)
+        return self.__monitor()
 
     def reg_tau4s_on_limit_violated( self, tau4s):
         """For compatibility w/ clipped flex varbls.
@@ -366,16 +479,16 @@ class BoxClipping(Box):
 
         self.plugin_append( clipper)
 
-        self.__clipper = clipper
+        self.__clipper = _PluginBinding( Shelf(), self.__clipper_id)
         return
 
     def bounds( self, bounds: tuple):
         assert isinstance( bounds, tuple)
-        self.__clipper.bounds( bounds)
+        self.clipper().bounds( bounds)
         return self
 
     def clipper( self) -> Clipper:
-        return Shelf().plugin( self.__clipper_id)
+        return self.__clipper()
 
     def is_clipping( self):
         """True.
@@ -417,6 +530,9 @@ class BoxClippingMonitored(Box):
         Shelf().plugin_add( monitor)
 
         self.plugin_append( monitor)
+
+        self.__clipper = _PluginBinding( Shelf(), self.__clipper_id)
+        self.__monitor = _PluginBinding( Shelf(), self.__monitor_id)
         return
 
     def bounds( self, bounds: tuple):
@@ -425,12 +541,12 @@ class BoxClippingMonitored(Box):
         return self
 
     def clipper( self) -> Clipper:
-        return Shelf().plugin( self.__clipper_id)
+        return self.__clipper()
 
     def is_clipping( self): return True
 
     def monitor( self) -> Monitor:
-        return Shelf().plugin( self.__monitor_id)
+        return self.__monitor()
 
     def reg_tau4s_on_limit_violated( self, tau4s):
         """For compatibility w/ clipped flex varbls.
@@ -528,10 +644,12 @@ class BoxMonitored(Box):
         Shelf().plugin_add( monitor)
 
         self.plugin_append( monitor)
+
+        self.__monitor = _PluginBinding( Shelf(), self.__monitor_id)
         return
 
     def monitor( self) -> Monitor:
-        return Shelf().plugin( self.__monitor_id)
+        return self.__monitor()
 
     def reg_tau4s_on_modified( self, tau4s):
         """For compatibility w/ monitored flex varbls.
@@ -585,6 +703,19 @@ class Shelf(metaclass=Singleton):
         self.__sectionname_boxes = "pandora.boxes"
         self.__sectionname_plugins = "pandora.plugins"
         self.__cp = None
+
+        self.__columns = None
+
+        self.__plugin_owners = {}
+                                        # Plugin id -> boxes that have
+                                        #   appended the plugin.
+        self._generation = 0
+                                        # Incremented whenever a plugin is
+                                        #   replaced, see _PluginBinding.
+        self._lookups = 0
+        self._bindings = weakref.WeakSet()
+                                        # Each binding counts its own cache
+                                        #   hits, stats() adds them up.
         return
 
     def box( self, id):
@@ -602,6 +733,10 @@ class Shelf(metaclass=Singleton):
 
     def box_remove( self, p):
         del self.__boxes[ p.id()]
+        if self.__columns is not None and p.id() in self.__columns:
+            self.__columns.slot_free( p.id())
+            p._slot_detach_()
+
         return
 
     def box_restore( self, p):
@@ -640,6 +775,17 @@ class Shelf(metaclass=Singleton):
         return self
     store_box = box_store # DEPRECATED
 
+    def columns( self, capacity=1024) -> _Columns:
+        """The columns holding the values of all BoxColumnar's.
+
+        The columns are allocated when the first BoxColumnar is created, \c capacity
+        is used then only.
+        """
+        if self.__columns is None:
+            self.__columns = _Columns( capacity)
+
+        return self.__columns
+
     def pathname_ini( self, pathname=None):
         if pathname is None:
             return str( self.__pathname)
@@ -656,8 +802,103 @@ class Shelf(metaclass=Singleton):
         return
 
     def plugin( self, id):
+        self._lookups += 1
         return self.__plugins[ id]
 
+    def _plugin_owner_add_( self, id, box):
+        self.__plugin_owners.setdefault( id, weakref.WeakSet()).add( box)
+        return
+
+    def _plugin_owner_remove_( self, id, box):
+        owners = self.__plugin_owners.get( id)
+        if owners is not None:
+            owners.discard( box)
+            if not owners:
+                del self.__plugin_owners[ id]
+
+        return
+
+    def plugin_replace( self, p):
+        """Replace the plugin having the same id as \c p.
+
+        The boxes, that have appended the plugin replaced, get \c p in their
+        plugins and recompile their pipelines. Boxes, that have bound the
+        plugin replaced, resolve it again on their next access.
+        """
+        if p.id() not in self.__plugins:
+            raise KeyError( "Plugin '%s' not in Plugins!" % p.id())
+
+        self.__plugins[ p.id()] = p
+        for box in list( self.__plugin_owners.get( p.id(), ())):
+            box._plugin_replace_( p)
+
+        self._generation += 1
+        return self
+
+    def stats( self):
+        """Generation of the plugins, plugin lookups via plugin(), and cache hits of the plugin bindings.
+
+        Hits are counted per binding and added up here, so there's no shared
+        counter on the hot path. Hits of bindings, whose boxes have been
+        garbage collected, are lost.
+
+        \note   The counters aren't locked, so they're approximate if
+                plugin() or a box are accessed by several threads.
+        """
+        return {"generation": self._generation, "lookups": self._lookups, "hits": sum( binding._hits for binding in list( self._bindings))}
+
+    def values_get( self, ids):
+        """Values of many BoxColumnar's at once.
+
+        \param  ids     Ids of the boxes, which must all be of the same type.
+                        Pass a tuple to let the shelf cache the slot indices.
+
+        \returns        numpy array.
+        """
+        return self.columns().values_get( ids)
+
+    def values_set( self, ids, values):
+        """Set the values of many BoxColumnar's at once.
+
+        \param  ids     See values_get().
+
+        \param  values  Sequence or numpy array of len( ids) values or a scalar.
+        """
+        self.columns().values_set( ids, values)
+        return self
+
+
+class _PluginBinding:
+
+    """Reference to a plugin in the Shelf.
+
+    The plugin is looked up once when the binding is created and looked up
+    again only if the Shelf's plugins have been replaced in the meantime.
+    So a box doesn't need to call Shelf() and Shelf.plugin() on every access.
+    """
+
+    def __init__( self, shelf, id):
+        self.__shelf = shelf
+        self.__id = id
+
+        self.__generation = shelf._generation
+        self.__plugin = shelf.plugin( id)
+
+        self._hits = 0
+        shelf._bindings.add( self)
+        return
+
+    def __call__( self):
+        shelf = self.__shelf
+        if self.__generation == shelf._generation:
+            self._hits += 1
+            return self.__plugin
+
+        generation = shelf._generation
+        self.__plugin = shelf.plugin( self.__id)
+        self.__generation = generation
+        return self.__plugin
+
 
 class _ConfigParser(cp.ConfigParser):
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of pandora.
+#
+#   pandora is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   pandora is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with pandora. If not, see <http://www.gnu.org/licenses/>.
+
+"""Columnar Value Store für den Shelf.
+
+Jeder Typ (float, int, bool) bekommt eine eigene numpy-Column. Eine BoxColumnar
+hält nur den Slot-Index in ihrer Column, der Wert selbst liegt in der Column.
+Damit können viele Boxes mit einem einzigen Aufruf gelesen bzw. geschrieben
+werden (siehe Shelf.values_get() und Shelf.values_set()).
+"""
+
+import logging; _Logger = logging.getLogger()
+
+try:
+    import numpy as np
+
+except ImportError as e:
+    _Logger.error( e)
+
+
+class _Column:
+
+    """Eine Column für einen bestimmten Typ.
+
+    \note   Das Array wird bei Bedarf vergrößert, d.h. neu alloziert. Deshalb
+            darf sich niemand das Array selbst merken, sondern immer nur die
+            Column und den Slot.
+    """
+
+    def __init__( self, type, dtype, capacity):
+        self.type = type
+        self.data = np.zeros( capacity, dtype=dtype)
+
+        self.__size = 0
+        self.__slots_free = []
+        return
+
+    def __len__( self):
+        return self.__size - len( self.__slots_free)
+
+    def capacity( self):
+        return len( self.data)
+
+    def slot_alloc( self, value):
+        if self.__slots_free:
+            slot = self.__slots_free.pop()
+
+        else:
+            if self.__size == len( self.data):
+                data = np.zeros( 2*len( self.data), dtype=self.data.dtype)
+                data[ :self.__size] = self.data
+                self.data = data
+
+            slot = self.__size
+            self.__size += 1
+
+        self.data[ slot] = value
+        return slot
+
+    def slot_free( self, slot):
+        self.__slots_free.append( slot)
+        return self
+
+
+class _Columns:
+
+    """Alle Columns des Shelfs.
+
+    \param  capacity    Anfängliche Anzahl Slots pro Column.
+    """
+
+    _DTYPES = {bool: "bool", int: "int64", float: "float64"}
+
+    def __init__( self, capacity=1024):
+        self.__columns = {}
+        for type, dtype in self._DTYPES.items():
+            self.__columns[ type] = _Column( type, np.dtype( dtype), capacity)
+
+        self.__slots = {}
+        self.__indices = {}
+        return
+
+    def __contains__( self, id):
+        return id in self.__slots
+
+    def column( self, type) -> _Column:
+        try:
+            return self.__columns[ type]
+
+        except KeyError:
+            raise TypeError( "Columnar boxes support %s only, not '%s'!" % ([t.__name__ for t in self._DTYPES], type.__name__))
+
+    def slot( self, id):
+        """Column und Slot der Box mit der Id \c id.
+        """
+        return self.__slots[ id]
+
+    def slot_alloc( self, id, value):
+        if id in self.__slots:
+            raise KeyError( "Slot for box '%s' already allocated!" % id)
+
+        column = self.column( type( value))
+        slot = column.slot_alloc( value)
+        self.__slots[ id] = (column, slot)
+        self.__indices.clear()
+        return column, slot
+
+    def slot_free( self, id):
+        column, slot = self.__slots.pop( id)
+        column.slot_free( slot)
+        self.__indices.clear()
+        return self
+
+    def _indices_( self, ids):
+        """Column und Indexarray zu den \c ids.
+
+        Das Ergebnis wird gecacht, wenn \c ids hashable ist (Tuple). Wird ein
+        Slot alloziert oder freigegeben, wird der Cache verworfen.
+        """
+        try:
+            return self.__indices[ ids]
+
+        except (KeyError, TypeError):
+            pass
+
+        column = self.__columns[ float] if not ids else None
+        indices = np.empty( len( ids), dtype=np.intp)
+        for i, id in enumerate( ids):
+            column_, indices[ i] = self.__slots[ id]
+            if column is None:
+                column = column_
+
+            elif column_ is not column:
+                raise TypeError( "Boxes '%s' and '%s' don't share the same type!" % (ids[ 0], id))
+
+        if isinstance( ids, tuple):
+            self.__indices[ ids] = (column, indices)
+
+        return column, indices
+
+    def values_get( self, ids):
+        column, indices = self._indices_( ids)
+        return column.data[ indices]
+
+    def values_set( self, ids, values):
+        column, indices = self._indices_( ids)
+        column.data[ indices] = values
+        return self
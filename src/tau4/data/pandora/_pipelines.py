@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of pandora.
+#
+#   pandora is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   pandora is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with pandora. If not, see <http://www.gnu.org/licenses/>.
+
+"""Pipeline Compiler: Typecast und Plugins einer Box in einer einzigen Funktion.
+
+Box.value( value) führt den Typecast und dann alle Plugins aus. Statt für jedes
+Plugin process_value() aufzurufen, setzt der Compiler den Code aller Plugins
+(siehe Plugin._pipeline_source_()) zu einer einzigen Funktion zusammen, die
+ohne weitere Methodenaufrufe auskommt::
+
+    def _pipeline_( value):
+        value = _type( value)
+        p0._value_unclipped = value
+        ...
+        return value
+
+Die Box compiliert ihre Pipeline neu, wenn ein Plugin hinzugefügt oder entfernt
+wird.
+"""
+
+
+def compiled( type, plugins):
+    """Compiled pipeline.
+
+    \param  type    Type of the box's value.
+
+    \param  plugins Plugins in the order they're to be executed.
+
+    \returns        Function taking the value to be written, returning the
+                    processed value.
+    """
+    lines = ["def _pipeline_( value):", "    value = _type( value)"]
+    namespace = {"_type": type}
+    for i, plugin in enumerate( plugins):
+        lines_plugin, namespace_plugin = plugin._pipeline_source_( "p%d" % i)
+        lines.append( "    # %s: %r" % (plugin.__class__.__name__, str( plugin.id())))
+                                        # repr(), so that an id can't end the
+                                        #   comment and inject code.
+        lines.extend( "    " + line for line in lines_plugin)
+        namespace.update( namespace_plugin)
+
+    lines.append( "    return value")
+
+    source = "\n".join( lines)
+    exec( compile( source, "<pandora pipeline>", "exec"), namespace)
+    pipeline = namespace[ "_pipeline_"]
+    pipeline.source = source
+    return pipeline
+
+
+def interpreted( type, plugins):
+    """Pipeline executing process_value() of each plugin, i.e. the reference for compiled().
+    """
+    plugins = tuple( plugins)
+    def _pipeline_( value):
+        value = type( value)
+        for plugin in plugins:
+            value = plugin.process_value( value)
+
+        return value
+
+    return _pipeline_
@@ -42,7 +42,16 @@ class _Plugins(OrderedDict):
         return self
 
     def remove( self, plugin_id):
-        del self[ id]
+        del self[ plugin_id]
+        return self
+
+    def replace( self, plugin):
+        """Replace the plugin having the same id, keeping its position.
+        """
+        if plugin.id() not in self:
+            raise KeyError( "A plugin '%s' has not been appended!" % plugin.id())
+
+        OrderedDict.__setitem__( self, plugin.id(), plugin)
         return self
 
 
@@ -50,7 +59,7 @@ class Plugin(metaclass=abc.ABCMeta):
 
     def __init__( self, id):
         self.__id = id
-        self.__value = None
+        self._value = None
         return
 
     def id( self):
@@ -69,12 +78,26 @@ class Plugin(metaclass=abc.ABCMeta):
         """
         pass
 
+    def _pipeline_source_( self, p):
+        """Source code the pipeline compiler inlines for this plugin.
+
+        \param  p       Name the plugin is known by in the compiled code.
+
+        \returns        Lines of code, that take \c value and leave the result
+                        in \c value, and the namespace the lines need.
+
+        \note   Derived classes, that override process_value(), get this
+                default, i.e. their process_value() is called, unless they
+                override this method as well.
+        """
+        return ["value = %s.process_value( value)" % p], {p: self}
+
     def value( self, value=None):
         if value is None:
-            return self.__value
+            return self._value
 
-        self.__value = value
-        return self.__value
+        self._value = value
+        return self._value
 
 
 class Mapper4Numbers(Plugin):
@@ -110,6 +133,17 @@ class Mapper4Numbers(Plugin):
     def is_clipping( self):
         return False
 
+    def _pipeline_source_( self, p):
+        if type( self).process_value is not Mapper4Numbers.process_value:
+            return super()._pipeline_source_( p)
+
+        lines = [
+            "value = %s_k * (value - %s_x) + %s_y" % (p, p, p),
+            "%s._value = value" % p,
+        ]
+        namespace = {p: self, p + "_k": self.__line._k, p + "_x": self.__line._P._x, p + "_y": self.__line._P._y}
+        return lines, namespace
+
     def process_value( self, value):
         value = self.__line.y( value)
         self.value( value)
@@ -120,24 +154,35 @@ class Monitor(Plugin):
 
     def __init__( self, *, id, callable=None):
         super().__init__( id)
-        self.__on_data_changed = PublisherChannel.Synch( self)
+        self._on_data_changed = PublisherChannel.Synch( self)
         if callable:
             self.callable_append( callable)
 
         return
 
     def callable_append( self, callable):
-        assert len( inspect.getargspec( callable).args) == 2, "Your callable must accept one arg besides 'self'!"
-        self.__on_data_changed += callable
+        assert len( inspect.getfullargspec( callable).args) == 2, "Your callable must accept one arg besides 'self'!"
+        self._on_data_changed += callable
         return self
 
     def callable_remove( self, callable):
-        self.__on_data_changed -= callable
+        self._on_data_changed -= callable
         return self
 
     def is_clipping( self):
         return False
 
+    def _pipeline_source_( self, p):
+        if type( self).process_value is not Monitor.process_value:
+            return super()._pipeline_source_( p)
+
+        lines = [
+            "%s._value = value" % p,
+            "if %s._on_data_changed:" % p,
+            "    %s._on_data_changed()" % p,
+        ]
+        return lines, {p: self}
+
     def process_value( self, value):
         """
         NOTE:
@@ -168,7 +213,7 @@ class Monitor(Plugin):
 
         """
         self.value( value)
-        self.__on_data_changed()
+        self._on_data_changed()
         return value
 
 
@@ -197,7 +242,7 @@ class Clipper(Monitor):
     def callable_on_out_of_bounds_append( self, callable_on_out_of_bounds):
         """Callable wird ausgeführt, wenn Daten geclippt worden sind, vorher aber within bounds waren (Flankensteuerung).
         """
-        assert len( inspect.getargspec( callable_on_out_of_bounds).args) == 2, "Your callable_on_out_of_bounds must accept one arg besides 'self'!"
+        assert len( inspect.getfullargspec( callable_on_out_of_bounds).args) == 2, "Your callable_on_out_of_bounds must accept one arg besides 'self'!"
         self._on_data_clipped += callable_on_out_of_bounds
         return self
 
@@ -208,7 +253,7 @@ class Clipper(Monitor):
     def callable_on_within_bounds_append( self, callable_on_within_bounds):
         """Callable wird ausgeführt, wenn Daten nicht geclippt worden sind, vorher aber out of bounds waren (Flankensteuerung).
         """
-        assert len( inspect.getargspec( callable_on_within_bounds).args) == 2, "Your callable_on_within_bounds must accept one arg besides 'self'!"
+        assert len( inspect.getfullargspec( callable_on_within_bounds).args) == 2, "Your callable_on_within_bounds must accept one arg besides 'self'!"
         self._on_data_not_clipped += callable_on_within_bounds
         return self
 
@@ -234,31 +279,57 @@ class Clipper4Numbers(Clipper):
 
     def __init__( self, *, id, bounds=(-sys.float_info.max, sys.float_info.max)):
         super().__init__( id=id)
-        self.__min, self.__max = bounds
+        self._min, self._max = bounds
 
         return
 
     def bounds( self, bounds):
-        self.__min, self.__max = bounds
+        self._min, self._max = bounds
         return self
 
     def min( self):
-        return self.__min
+        return self._min
 
     def max( self):
-        return self.__max
+        return self._max
+
+    def _pipeline_source_( self, p):
+        if type( self).process_value is not Clipper4Numbers.process_value:
+            return super()._pipeline_source_( p)
+
+        lines = [
+            "%s._value_unclipped = value" % p,
+            "%s_is_clipped = False" % p,
+            "if not %s._min <= value:" % p,
+            "    value = type( value)( %s._min)" % p,
+            "    %s_is_clipped = True" % p,
+            "if not value <= %s._max:" % p,
+            "    value = type( value)( %s._max)" % p,
+            "    %s_is_clipped = True" % p,
+            "%s._value = value" % p,
+            "if %s_is_clipped:" % p,
+            "    if not %s._is_out_of_bounds:" % p,
+            "        if %s._on_data_clipped:" % p,
+            "            %s._on_data_clipped()" % p,
+            "        %s._is_out_of_bounds = True" % p,
+            "elif %s._is_out_of_bounds:" % p,
+            "    if %s._on_data_not_clipped:" % p,
+            "        %s._on_data_not_clipped()" % p,
+            "    %s._is_out_of_bounds = False" % p,
+        ]
+        return lines, {p: self}
 
     def process_value( self, value):
         _type = type( value)
         self._value_unclipped = value
 
         is_clipped = False
-        if not self.__min <= value:
-            value = _type( self.__min)
+        if not self._min <= value:
+            value = _type( self._min)
             is_clipped = True
 
-        if not value <= self.__max:
-            value = _type( self.__max)
+        if not value <= self._max:
+            value = _type( self._max)
             is_clipped = True
 
         self.value( value)
@@ -297,7 +368,7 @@ class Guard(Plugin):
     def callable_on_out_of_bounds_append( self, callable_on_out_of_bounds):
         """Callable wird ausgeführt, wenn Daten Grenzen überschreiten, vorher aber within bounds waren (Flankensteuerung).
         """
-        assert len( inspect.getargspec( callable_on_out_of_bounds).args) == 2, "Your callable_on_out_of_bounds must accept one arg besides 'self'!"
+        assert len( inspect.getfullargspec( callable_on_out_of_bounds).args) == 2, "Your callable_on_out_of_bounds must accept one arg besides 'self'!"
         self._on_data_out_of_bounds += callable_on_out_of_bounds
         self._is_out_of_bounds = False
         return self
@@ -309,7 +380,7 @@ class Guard(Plugin):
     def callable_on_within_bounds_append( self, callable_on_within_bounds):
         """Callable wird ausgeführt, wenn Daten innerhalb der Grenzen sind, vorher aber out of bounds waren (Flankensteuerung).
         """
-        assert len( inspect.getargspec( callable_on_within_bounds).args) == 2, "Your callable_on_within_bounds must accept one arg besides 'self'!"
+        assert len( inspect.getfullargspec( callable_on_within_bounds).args) == 2, "Your callable_on_within_bounds must accept one arg besides 'self'!"
         self._on_data_within_bounds += callable_on_within_bounds
         self._is_out_of_bounds = False
         return self
@@ -328,27 +399,40 @@ class Guard4Numbers(Guard):
 
     def __init__( self, *, id, bounds=(-sys.float_info.max, sys.float_info.max)):
         super().__init__( id=id)
-        self.__min, self.__max = bounds
+        self._min, self._max = bounds
 
         return
 
     def bounds( self, bounds):
-        self.__min, self.__max = bounds
+        self._min, self._max = bounds
         self._is_out_of_bounds = False
         return self
 
     def min( self):
-        return self.__min
+        return self._min
 
     def max( self):
-        return self.__max
+        return self._max
+
+    def _pipeline_source_( self, p):
+        if type( self).process_value is not Guard4Numbers.process_value:
+            return super()._pipeline_source_( p)
+
+        lines = [
+            "if %s._min <= value <= %s._max:" % (p, p),
+            "    if %s._is_out_of_bounds:" % p,
+            "        if %s._on_data_within_bounds:" % p,
+            "            %s._on_data_within_bounds()" % p,
+            "        %s._is_out_of_bounds = False" % p,
+            "elif not %s._is_out_of_bounds:" % p,
+            "    if %s._on_data_out_of_bounds:" % p,
+            "        %s._on_data_out_of_bounds()" % p,
+            "    %s._is_out_of_bounds = True" % p,
+        ]
+        return lines, {p: self}
 
     def process_value( self, value):
-
-        if not 0.020 < value < 0.030:
-            return value
-
-        is_out_of_bounds = False if self.__min <= value <= self.__max else True
+        is_out_of_bounds = False if self._min <= value <= self._max else True
 
         if is_out_of_bounds:
             if not self._is_out_of_bounds:
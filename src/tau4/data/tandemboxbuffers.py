@@ -145,6 +145,20 @@ Performance-Fall 4::
     OK
     Press any key to exit...
 
+Seqlock-Modus::
+
+    images = Images( ("plc", "mmi", "rc"), seqlock=True)
+
+Hier verwendet weder der Sender noch der Empfänger den RWLock. Der Sender
+schreibt beim Publishen die Werte seiner Inboxes in den hinteren von zwei
+Puffern und schaltet durch Inkrementieren einer Sequenznummer um: Ist sie
+ungerade, schreibt der Sender gerade, ist sie gerade, ist der Puffer
+(seq >> 1) & 1 der vordere. Der Empfänger kopiert den vorderen Puffer und
+prüft danach die Sequenznummer. Hat der Sender inzwischen begonnen, genau
+diesen Puffer wieder zu beschreiben (der Empfänger war also langsamer als zwei
+Publishs), wiederholt er das Kopieren. Das Empfänger-Image hält die Werte in
+einer Liste und nicht in Boxes.
+
 \_2DO
     In CRUISER4 einbauen.
 
@@ -376,17 +390,130 @@ class _ImageR(_Image):
         return self
 
 
+class _SeqlockedBuffers:
+
+    """Die beiden Puffer eines Sender-Images im Seqlock-Modus.
+
+    Die Werte liegen in Listen, der Index eines Wertes steht in \c indices.
+    """
+
+    def __init__( self):
+        self.buffers = ([], [])
+        self.indices = {}
+        self.seq = 0
+        return
+
+    def front( self):
+        return self.buffers[ (self.seq >> 1) & 1]
+
+    def value_add( self, vid, value):
+        self.indices[ vid] = len( self.buffers[ 0])
+        for buffer in self.buffers:
+            buffer.append( value)
+
+        return self
+
+
+class _ImageSSeqlocked(_ImageS):
+
+    """Sender-Image im Seqlock-Modus.
+    """
+
+    def __init__( self, seqlocked: _SeqlockedBuffers):
+        super().__init__( lock=None)
+        self._seqlocked = seqlocked
+        self._inboxes = []
+        return
+
+    @overrides( _ImageS)
+    def _add_tandembox_( self, vid, value, label="", dim=""):
+        tandemboxS = super()._add_tandembox_( vid, value, label, dim)
+        self._inboxes.append( tandemboxS._inbox_())
+        self._seqlocked.value_add( vid, value)
+        return tandemboxS
+
+    @overrides( _ImageS)
+    def inboxes_to_outboxes( self):
+        """Inboxes in den hinteren Puffer kopieren und diesen zum vorderen machen.
+        """
+        seqlocked = self._seqlocked
+        seq = seqlocked.seq + 1
+        seqlocked.seq = seq
+                                        # Ungerade: Sender schreibt.
+        seqlocked.buffers[ ((seq + 1) >> 1) & 1][ :] = [inbox.value() for inbox in self._inboxes]
+        seqlocked.seq = seq + 1
+                                        # Gerade: Der eben beschriebene Puffer
+                                        #   ist jetzt der vordere.
+        return self
+
+    def publishs( self):
+        """Anzahl bisheriger Publishs.
+        """
+        return self._seqlocked.seq >> 1
+
+
+class _ImageRSeqlocked(_ImageR):
+
+    """Empfänger-Image im Seqlock-Modus.
+    """
+
+    def __init__( self, seqlocked: _SeqlockedBuffers):
+        super().__init__( lock=None)
+        self._seqlocked = seqlocked
+        self._values = list( seqlocked.front())
+        self._reads = 0
+        self._retries = 0
+        return
+
+    @overrides( _ImageR)
+    def _add_tandembox_( self, vid, inbox):
+        tandemboxR = super()._add_tandembox_( vid, inbox)
+        self._values = list( self._seqlocked.front())
+        return tandemboxR
+
+    @overrides( _ImageR)
+    def inboxes_to_outboxes( self):
+        """Vorderen Puffer des Senders kopieren, wiederholen, falls der Sender ihn inzwischen wieder beschreibt.
+        """
+        seqlocked = self._seqlocked
+        while True:
+            version = seqlocked.seq >> 1
+            values = seqlocked.buffers[ version & 1][ :]
+            if seqlocked.seq - 2*version < 3:
+                break
+
+            self._retries += 1
+
+        self._values = values
+        self._reads += 1
+        return self
+
+    def reads( self):
+        return self._reads
+
+    def retries( self):
+        return self._retries
+
+    @overrides( _ImageR)
+    def value( self, id_value):
+        return self._values[ self._seqlocked.indices[ id_value]]
+
+
 class _ImageCollection:
 
     """Images aller Control Units.
+
+    \param  seqlock
+        Seqlock-Modus statt RWLock verwenden - siehe Modul-Doc.
     """
 
-    def __init__( self, id_sending_control_unit):
+    def __init__( self, id_sending_control_unit, seqlock=False):
         self.__id_sending_control_unit = id_sending_control_unit
 
         self.__lock = RWLock( do_logging=_DO_LOGGING)
+        self.__seqlocked = _SeqlockedBuffers() if seqlock else None
         self.__receiverimages = {}
-        self.__senderimage = _ImageS( self.__lock)
+        self.__senderimage = _ImageSSeqlocked( self.__seqlocked) if seqlock else _ImageS( self.__lock)
         return
 
     def __getitem__( self, rid):
@@ -400,7 +527,8 @@ class _ImageCollection:
     def image_add( self, id_receiving_control_unit):
         """Ein neues Empfänger-Image _ImageR zu dieser TandemBoxCollections-Instanz hinzufügen.
         """
-        self.__receiverimages[ id_receiving_control_unit] = _ImageR( self.__lock) << self.__senderimage
+        image = _ImageRSeqlocked( self.__seqlocked) if self.__seqlocked else _ImageR( self.__lock)
+        self.__receiverimages[ id_receiving_control_unit] = image << self.__senderimage
         return self
 
     def id( self):
@@ -430,10 +558,13 @@ class _ImageCollection:
 
 
 _Images = {}
-def Images( senderids=None):
+def Images( senderids=None, seqlock=False):
 
     """Images des ganzen Systems erzeugen.
 
+    \param  seqlock
+        Seqlock-Modus verwenden - siehe Modul-Doc.
+
     Usage
         \code{.py}
             ### Alle Images aufbauen
@@ -474,7 +605,7 @@ def Images( senderids=None):
 
         sids = set( senderids)
         for sid in sids:
-            _Images[ sid] = _ImageCollection( sid)
+            _Images[ sid] = _ImageCollection( sid, seqlock)
             for rid in sids - set( (sid,)):
                 _Images[ sid].image_add( rid)
 
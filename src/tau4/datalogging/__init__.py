@@ -21,12 +21,16 @@ import abc
 
 from collections import deque
 from datetime import datetime
+import heapq
+import itertools
 import logging
 import logging.config
 from logging import handlers
+import queue
 import sys
 
 from tau4 import ThisName
+from tau4.datalogging.journal import Journal, JournalReader, JournalRecord
 from tau4.time import Timer2
 from tau4.oop import overrides, Singleton
 
@@ -64,16 +68,22 @@ class _Event(metaclass=abc.ABCMeta):
 
     :type   source: (int, str)
 
+    :param  seq:
+            Laufende Nummer des Events im Event-Log, siehe seq().
+
+    :type   seq: int
+
     Das Verschicken eines Events erfolgt über Methode von SysEventLog() und UsrEventLog().
     """
 
     _SEVERITY_INFO, _SEVERITY_WARNING, _SEVERITY_ERROR = range( 3)
 
 
-    def __init__( self, reason, source, severity):
+    def __init__( self, reason, source, severity, seq=0):
         self.__reason = reason
         self.__source = source
         self.__severity = severity
+        self.__seq = seq
 
         self.__time_stamp = time.time()
         return
@@ -91,6 +101,14 @@ class _Event(metaclass=abc.ABCMeta):
         """Text der Alarmursache. """
         return self.__reason[ 1]
 
+    def seq( self):
+        """Laufende Nummer des Events, vom Event-Log streng monoton vergeben.
+
+        Anders als timestamp() ist seq() eindeutig und springt nicht, wenn die
+        Uhrzeit verstellt wird.
+        """
+        return self.__seq
+
     def severity_is_info( self):
         """
         """
@@ -161,8 +179,8 @@ class _ErrorEvent(_Event):
     Das Verschicken eines Events erfolgt über Methode von SysEventLog() und UsrEventLog().
     """
 
-    def __init__( self, reason, source):
-        _Event.__init__( self, reason, source, self._SEVERITY_ERROR)
+    def __init__( self, reason, source, seq=0):
+        _Event.__init__( self, reason, source, self._SEVERITY_ERROR, seq)
         return
 
     def severity_text( self):
@@ -204,8 +222,8 @@ class _InfoEvent(_Event):
             )
     """
 
-    def __init__( self, reason, source):
-        _Event.__init__( self, reason, source, self._SEVERITY_INFO)
+    def __init__( self, reason, source, seq=0):
+        _Event.__init__( self, reason, source, self._SEVERITY_INFO, seq)
         return
 
     def severity_text( self):
@@ -282,24 +300,110 @@ class _WarningEvent(_Event):
             )
     """
 
-    def __init__( self, reason, source):
-        _Event.__init__( self, reason, source, self._SEVERITY_WARNING)
+    def __init__( self, reason, source, seq=0):
+        _Event.__init__( self, reason, source, self._SEVERITY_WARNING, seq)
         return
 
     def severity_text( self):
         return "WARNING"
 
 
+class EventWriter:
+
+    """Gibt Events in einem eigenen Thread auf einen Stream aus.
+
+    Das Event-Log übergibt die Events nur an write(), formatiert und
+    ausgegeben werden sie im Thread des Writers. Das Loggen wartet also nicht
+    auf sys.stderr.
+
+    :param  file:
+            Stream, auf den geschrieben wird. None bedeutet sys.stderr, und
+            zwar das zum Zeitpunkt der Ausgabe gültige.
+    """
+
+    _Default = None
+    _DefaultLock = threading.Lock()
+
+    @classmethod
+    def Default( klass):
+        with klass._DefaultLock:
+            if klass._Default is None:
+                klass._Default = klass()
+
+            return klass._Default
+
+    def __init__( self, file=None):
+        self.__file = file
+        self.__queue = queue.SimpleQueue()
+        self.__thread = None
+        self.__lock = threading.Lock()
+        return
+
+    def flush( self, timeout=None):
+        """Warten, bis alle bisher übergebenen Events ausgegeben sind.
+
+        \returns    False, wenn \c timeout abgelaufen ist.
+        """
+        done = threading.Event()
+        self.write( done)
+        return done.wait( timeout)
+
+    def write( self, event):
+        if self.__thread is None:
+            with self.__lock:
+                if self.__thread is None:
+                    self.__thread = threading.Thread( target=self._work_, name="EventWriter", daemon=True)
+                    self.__thread.start()
+
+        self.__queue.put( event)
+        return self
+
+    def _work_( self):
+        while True:
+            event = self.__queue.get()
+            if isinstance( event, threading.Event):
+                event.set()
+                continue
+
+            try:
+                print( str( event), file=self.__file or sys.stderr)
+
+            except (OSError, ValueError):
+                pass
+                                        # Stream geschlossen: Das Event-Log
+                                        #   selbst hat das Event ja noch.
+
+
 class _EventLog(metaclass=Singleton):
 
     """Basisklasse für die beiden Event-Logs ``SysEventLog`` und ``UsrEventLog``.
+
+    Errors, Infos und Warnings liegen in je einer Deque. Jedes Event bekommt
+    beim Loggen eine laufende Nummer (_Event.seq()), damit ist jede Deque nach
+    seq sortiert. Die gemeinsame Sicht (event(), num_events()) ist ein
+    k-Way-Merge dieser Deques und wird erst beim Lesen und nur nach Änderungen
+    erzeugt: Für die ersten Events lazy mit heapq.merge(), für die ganze Liste
+    mit einem Sort, der nur noch die sortierten Deques mergen muss. Wer nur die neuen Events braucht, merkt sich
+    seq_last() und holt sich später events_since().
+
+    Errors und Warnings gehen außerdem an einen EventWriter, der sie außerhalb
+    des Locks auf sys.stderr ausgibt.
+
+    Ist mit journal_attach() ein Journal angehängt, wird jedes Event auch dort
+    gespeichert, und zwar unter dem Lock, damit die Records im Journal in
+    derselben Reihenfolge liegen wie die seq() der Events.
     """
 
 
-    def __init__( self, id4usr):
+    _EVENTS_LAZY_MAX = 64
+
+
+    def __init__( self, id4usr, writer=None):
         from tau4.sweng import PublisherChannel
 
         self.__id4usr = id4usr
+        self.__writer = writer if writer else EventWriter.Default()
+        self.__journal = None
 
         self.__tau4p_on_changes = PublisherChannel.Synch( self)
 
@@ -308,6 +412,9 @@ class _EventLog(metaclass=Singleton):
         self.__warnings = DequeWithLock( maxlen=10000)
 
         self.__events = []
+        self.__events_are_valid = True
+        self.__seqs = itertools.count( 1)
+        self.__seq_last = 0
 
         self.__is_errors_on = True
         self.__is_infos_on = True
@@ -320,12 +427,13 @@ class _EventLog(metaclass=Singleton):
         """
         """
         with self.__lock:
-            self.__errors[:] = []
-            self.__infos[:] = []
-            self.__warnings[:] = []
+            self.__errors.clear()
+            self.__infos.clear()
+            self.__warnings.clear()
 
             self._events_clear_()
 
+        self.__tau4p_on_changes()
         return self
 
     def errors_off( self):
@@ -335,6 +443,7 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
         return self
 
     def errors_on( self):
@@ -344,18 +453,55 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
         return self
 
     def event( self, i):
-        """
+        """i-tes Event, das neueste hat den Index 0.
+
+        Die ersten Events (z.B. die sichtbaren Zeilen einer Liste) werden direkt
+        aus dem Merge geholt, ohne dass die ganze Liste neu aufgebaut wird.
         """
         with self.__lock:
+            if not self.__events_are_valid and 0 <= i < self._EVENTS_LAZY_MAX:
+                return next( itertools.islice( self._events_merged_(), i, None), None)
+
             try:
                 return self._events_()[ i]
 
-            except IndentationError:
+            except IndexError:
                 return None
 
+    def events_since( self, seq):
+        """Alle (eingeschalteten) Events mit einer seq() größer als \c seq, das älteste zuerst.
+
+        Usage:
+            ::
+
+                seq = log.seq_last()
+                ...
+                events = log.events_since( seq)
+                if events:
+                    seq = events[ -1].seq()
+
+        Der Aufwand hängt nur von der Anzahl der neuen Events ab, nicht von der
+        Größe des Logs.
+        """
+        with self.__lock:
+            tails = []
+            for events in self._deques_():
+                tail = []
+                for event in reversed( events):
+                    if event.seq() <= seq:
+                        break
+
+                    tail.append( event)
+
+                tail.reverse()
+                tails.append( tail)
+
+            return list( heapq.merge( *tails, key=_Event.seq))
+
     def id4usr( self):
         return self.__id4usr
 
@@ -366,6 +512,7 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
         return self
 
     def infos_on( self):
@@ -375,42 +522,66 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
+        return self
+
+    def journal( self) -> Journal:
+        return self.__journal
+
+    def journal_attach( self, journal: Journal):
+        """Ab jetzt jedes Event auch im \c journal speichern. None hängt das Journal ab.
+        """
+        self.__journal = journal
         return self
 
     def log_error( self, reason_text, source_name="n.a.", reason_ident=0, source_ident=0):
         """
         """
         with self.__lock:
-            event = _ErrorEvent( (reason_ident, reason_text), (source_ident, source_name))
+            event = _ErrorEvent( (reason_ident, reason_text), (source_ident, source_name), next( self.__seqs))
             self.__errors.append( event)
             self._event_add_( event)
-            print( str( event), file=sys.stderr)
-            return self
+            if self.__journal:
+                self.__journal.append( int( event.timestamp()*1000000000), LoggingLevel._ERROR, source_name, reason_text, reason_ident, source_ident)
+                                            # Unter dem Lock, damit das Journal
+                                            #   die Events in seq-Reihenfolge hat.
+
+        self.__writer.write( event)
+        self.__tau4p_on_changes()
+        return self
 
     def log_info( self, reason_text, source_name="n.a.", reason_ident=0, source_ident=0):
         """
         """
         with self.__lock:
-            event = _InfoEvent( (reason_ident, reason_text), (source_ident, source_name))
+            event = _InfoEvent( (reason_ident, reason_text), (source_ident, source_name), next( self.__seqs))
             self.__infos.append( event)
             self._event_add_( event)
-            return self
+            if self.__journal:
+                self.__journal.append( int( event.timestamp()*1000000000), LoggingLevel._INFO, source_name, reason_text, reason_ident, source_ident)
+
+        self.__tau4p_on_changes()
+        return self
 
     def log_warning( self, reason_text, source_name="n.a.", reason_ident=0, source_ident=0):
         """
         """
         with self.__lock:
-            event = _WarningEvent( (reason_ident, reason_text), (source_ident, source_name))
+            event = _WarningEvent( (reason_ident, reason_text), (source_ident, source_name), next( self.__seqs))
             self.__warnings.append( event)
             self._event_add_( event)
-            print( str( event), file=sys.stderr)
-            return self
+            if self.__journal:
+                self.__journal.append( int( event.timestamp()*1000000000), LoggingLevel._WARNING, source_name, reason_text, reason_ident, source_ident)
+
+        self.__writer.write( event)
+        self.__tau4p_on_changes()
+        return self
 
     def num_events( self):
         """
         """
         with self.__lock:
-            return len( self._events_())
+            return sum( len( events) for events in self._deques_())
 
     def register_tau4s_on_changes( self, tau4s):
         """
@@ -418,14 +589,24 @@ class _EventLog(metaclass=Singleton):
         self.__tau4p_on_changes += tau4s
         return self
 
+    def seq_last( self):
+        """seq() des zuletzt geloggten Events, 0, wenn noch keines geloggt worden ist.
+        """
+        return self.__seq_last
+
     def store( self):
-        try:
-            f = open( self.id4usr() + ".txt", "wb")
-            for event in self._events_():
-                f.write( str( event))
-                f.write( "\n")
+        """Alle eingeschalteten Events als Text in die Datei id4usr().txt schreiben.
+
+        Für laufendes, effizientes Speichern siehe journal_attach().
+        """
+        with self.__lock:
+            events = list( self._events_())
 
-            f.close()
+        try:
+            with open( self.id4usr() + ".txt", "w", encoding="utf8") as f:
+                for event in events:
+                    f.write( str( event))
+                    f.write( "\n")
 
         except (IOError, OSError) as e:
             pass
@@ -439,6 +620,7 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
         return self
 
     def warnings_on( self):
@@ -448,44 +630,62 @@ class _EventLog(metaclass=Singleton):
         with self.__lock:
             self._events_clear_()
                                             # Force recreation of events list
+        self.__tau4p_on_changes()
         return self
 
+    def writer( self):
+        return self.__writer
+
+    def _deques_( self):
+        """Die Deques der eingeschalteten Severities.
+        """
+        deques = []
+        if self.__is_errors_on:
+            deques.append( self.__errors)
+        if self.__is_infos_on:
+            deques.append( self.__infos)
+        if self.__is_warnings_on:
+            deques.append( self.__warnings)
+
+        return deques
+
     def _event_add_( self, event):
         """
         """
-        self.__events[:] = []
+        self.__seq_last = event.seq()
+        self.__events_are_valid = False
                                         # Das führt dazu, dass die Liste
                                         #   self.__events bei der nächsten
                                         #   Ausführung von self._events_()
                                         #   neu aufgebaut wird.
-        self.__tau4p_on_changes()
         return self
 
     def _events_( self):
+        """Alle eingeschalteten Events, das neueste zuerst.
         """
-        """
-        if not self.__events:
-            if self.__is_errors_on:
-                self.__events.extend( self.__errors)
-            if self.__is_infos_on:
-                self.__events.extend( self.__infos)
-            if self.__is_warnings_on:
-                self.__events.extend( self.__warnings)
-
-            self._events_sort_()
+        if not self.__events_are_valid:
+            self.__events = sorted( itertools.chain( *self._deques_()), key=_Event.seq, reverse=True)
+                                        # Die Deques sind schon sortiert:
+                                        #   Timsort erkennt das und merged
+                                        #   nur noch, und zwar schneller als
+                                        #   heapq.merge().
+            self.__events_are_valid = True
 
         return self.__events
 
+    def _events_merged_( self):
+        """Iterator über alle eingeschalteten Events, das neueste zuerst.
+
+        Der Merge erfolgt lazy, es wird also nur so viel gemerged, wie gelesen
+        wird. Solange der Iterator läuft, muss der Lock gehalten werden.
+        """
+        return heapq.merge( *[reversed( events) for events in self._deques_()], key=_Event.seq, reverse=True)
+
     def _events_clear_( self):
         """
         """
-        self.__events[:] = []
-        self.__tau4p_on_changes()
-        return self
-
-    def _events_sort_( self):
-        self.__events.sort( key=lambda event: event.timestamp())
-        self.__events.reverse()
+        self.__events = []
+        self.__events_are_valid = False
         return self
 
 
@@ -0,0 +1,445 @@
+#   -*- coding: utf8 -*- #
+#
+#   Copyright (C) by DATEC Datentechnik GmbH, A-6890 LUSTENAU, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+"""Binäres Journal für Events: Nur anhängen, in Segmenten fester Größe.
+
+Aufbau eines Records:
+    ::
+
+        <II>    Länge des Payloads, CRC32 des Payloads
+        <qhiiH> ts_ns, level, reason_ident, source_ident, Länge von source
+        source  utf8
+        message utf8
+
+Die Segmente werden beim Anlegen auf ihre volle Größe gebracht und sind mit
+Nullen gefüllt. Ein Record mit der Länge 0 markiert also das Ende der Daten.
+Ein Record, dessen CRC nicht stimmt, ist bei einem Absturz nur teilweise
+geschrieben worden und beendet das Segment ebenfalls. Ein Journal, das neu
+geöffnet wird, beginnt immer mit einem neuen Segment.
+
+Zu jedem Segment gibt es einen dünnen Index: Für jeden index_every-ten Record
+ein Eintrag <qQ> mit ts_ns und Offset. Damit findet JournalReader.seek() den
+Record zu einem Zeitpunkt, ohne das Journal von vorne zu lesen.
+"""
+
+import bisect
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+_RECORDHEADER = struct.Struct( "<II")
+_PAYLOADHEADER = struct.Struct( "<qhiiH")
+_INDEXENTRY = struct.Struct( "<qQ")
+
+
+JournalRecord = collections.namedtuple( "JournalRecord", "ts_ns level reason_ident source_ident source message")
+
+
+def _segment_numbers_( dirpath, prefix):
+    numbers = []
+    for name in os.listdir( dirpath):
+        head, _, tail = name.rpartition( ".")
+        if tail == "seg" and head.startswith( prefix + "."):
+            number = head[ len( prefix) + 1:]
+            if number.isdigit():
+                numbers.append( int( number))
+
+    return sorted( numbers)
+
+
+def _segment_pathname_( dirpath, prefix, number, ext):
+    return os.path.join( dirpath, "%s.%08d.%s" % (prefix, number, ext))
+
+
+class Journal:
+
+    """Schreibt Records in Segmente des Verzeichnisses \\c dirpath.
+
+    :param  segment_size:
+            Größe eines Segments in Bytes. Die Segmente werden beim Anlegen
+            auf diese Größe gebracht.
+
+    :param  fsync_interval:
+            Sekunden zwischen zwei fsync(). 0 bedeutet fsync() nach jedem
+            Commit, None überlässt das Schreiben auf die Platte dem OS.
+
+    :param  commit_bytes:
+            Group Commit: Die Records werden gesammelt und erst geschrieben,
+            wenn so viele Bytes beisammen sind, spätestens aber nach
+            fsync_interval (bzw. nach 1 s, wenn fsync_interval None ist).
+
+    :param  index_every:
+            Jeder wievielte Record in den Index kommt.
+
+    Usage:
+        ::
+
+            with Journal( "./journal") as journal:
+                journal.append( time.time_ns(), logging.ERROR, "Laufwerk A:", "Wasser in Laufwerk")
+
+            reader = JournalReader( "./journal")
+            for record in reader.seek( ts_ns):
+                ...
+
+    Die Zeitstempel der Records sind nicht fallend: Ist ein Zeitstempel kleiner
+    als der des vorigen Records (Uhr verstellt), wird der vorige verwendet.
+    """
+
+    def __init__( self, dirpath, prefix="journal", segment_size=64*1024*1024, fsync_interval=1.0, commit_bytes=64*1024, index_every=64):
+        os.makedirs( dirpath, exist_ok=True)
+
+        self.__dirpath = dirpath
+        self.__prefix = prefix
+        self.__segment_size = segment_size
+        self.__fsync_interval = fsync_interval
+        self.__commit_bytes = commit_bytes
+        self.__index_every = index_every
+
+        numbers = _segment_numbers_( dirpath, prefix)
+        self.__segment_number = numbers[ -1] if numbers else -1
+        self.__segment = None
+        self.__index = None
+
+        self.__offset = 0
+        self.__offset_written = 0
+        self.__pending = bytearray()
+        self.__pending_index = bytearray()
+        self.__records_since_index = 0
+        self.__ts_last = 0
+        self.__is_dirty = False
+        self.__t_fsync = time.monotonic()
+
+        self.__appends = 0
+        self.__commits = 0
+        self.__fsyncs = 0
+
+        self.__lock = threading.Lock()
+        self.__stopevent = threading.Event()
+        self.__flusher = None
+
+        self._segment_roll_()
+        return
+
+    def __enter__( self):
+        return self
+
+    def __exit__( self, *args):
+        self.close()
+        return False
+
+    def append( self, ts_ns, level, source, message, reason_ident=0, source_ident=0):
+        """Record anhängen.
+
+        \\throws ValueError, wenn der Record nicht in ein Segment passt.
+        """
+        source = source.encode( "utf8")
+        tail = source + message.encode( "utf8")
+        size = _RECORDHEADER.size + _PAYLOADHEADER.size + len( tail)
+        if size > self.__segment_size:
+            raise ValueError( "Record of %d bytes doesn't fit into a segment of %d bytes!" % (size, self.__segment_size))
+
+        if self.__flusher is None:
+            self._flusher_start_()
+
+        with self.__lock:
+            if self.__segment is None:
+                raise ValueError( "Journal is closed!")
+
+            if ts_ns < self.__ts_last:
+                ts_ns = self.__ts_last
+
+            self.__ts_last = ts_ns
+
+            payload = _PAYLOADHEADER.pack( ts_ns, level, reason_ident, source_ident, len( source)) + tail
+            if self.__offset + size > self.__segment_size:
+                self._commit_( True)
+                self._segment_roll_()
+
+            if self.__records_since_index == 0:
+                self.__pending_index += _INDEXENTRY.pack( ts_ns, self.__offset)
+
+            self.__records_since_index = (self.__records_since_index + 1) % self.__index_every
+
+            self.__pending += _RECORDHEADER.pack( len( payload), zlib.crc32( payload))
+            self.__pending += payload
+            self.__offset += size
+            self.__appends += 1
+            if len( self.__pending) >= self.__commit_bytes:
+                self._commit_( None)
+
+        return self
+
+    def close( self):
+        """Alle Records schreiben, fsync(), Dateien schließen.
+        """
+        self.__stopevent.set()
+        if self.__flusher is not None and self.__flusher is not threading.current_thread():
+            self.__flusher.join()
+
+        with self.__lock:
+            if self.__segment is not None:
+                self._commit_( True)
+                self.__segment.close()
+                self.__index.close()
+                self.__segment = self.__index = None
+
+        return self
+
+    def commit( self, fsync=True):
+        """Gesammelte Records jetzt schreiben.
+
+        \\param  fsync   True: fsync() in jedem Fall, False: nie, None: wenn
+                        fsync_interval abgelaufen ist.
+        """
+        with self.__lock:
+            if self.__segment is not None:
+                self._commit_( fsync)
+
+        return self
+
+    def dirpath( self):
+        return self.__dirpath
+
+    def prefix( self):
+        return self.__prefix
+
+    def stats( self):
+        with self.__lock:
+            return {"appends": self.__appends, "commits": self.__commits, "fsyncs": self.__fsyncs, "segment": self.__segment_number, "offset": self.__offset}
+
+    def _commit_( self, fsync):
+        if self.__pending:
+            os.pwrite( self.__segment.fileno(), self.__pending, self.__offset_written)
+            self.__offset_written += len( self.__pending)
+            self.__pending.clear()
+            if self.__pending_index:
+                self.__index.write( self.__pending_index)
+                self.__pending_index.clear()
+                                        # Der Index erst nach den Daten: Ein
+                                        #   Eintrag zeigt nie auf einen Record,
+                                        #   der noch nicht geschrieben ist.
+            self.__is_dirty = True
+            self.__commits += 1
+
+        if fsync is None:
+            fsync = self.__fsync_interval is not None and time.monotonic() - self.__t_fsync >= self.__fsync_interval
+
+        if fsync and self.__is_dirty:
+            os.fsync( self.__segment.fileno())
+            os.fsync( self.__index.fileno())
+            self.__is_dirty = False
+            self.__fsyncs += 1
+
+        if fsync:
+            self.__t_fsync = time.monotonic()
+
+        return
+
+    def _flush_( self):
+        interval = self.__fsync_interval if self.__fsync_interval else 1.0
+        while not self.__stopevent.wait( interval):
+            with self.__lock:
+                if self.__segment is not None:
+                    self._commit_( None)
+
+        return
+
+    def _flusher_start_( self):
+        with self.__lock:
+            if self.__flusher is None:
+                self.__flusher = threading.Thread( target=self._flush_, name="JournalFlusher", daemon=True)
+                self.__flusher.start()
+
+        return
+
+    def _segment_roll_( self):
+        if self.__segment is not None:
+            self.__segment.close()
+            self.__index.close()
+
+        self.__segment_number += 1
+        pathname = _segment_pathname_( self.__dirpath, self.__prefix, self.__segment_number, "seg")
+        self.__segment = open( pathname, "w+b", buffering=0)
+        if hasattr( os, "posix_fallocate"):
+            os.posix_fallocate( self.__segment.fileno(), 0, self.__segment_size)
+
+        else:
+            self.__segment.truncate( self.__segment_size)
+
+        self.__index = open( _segment_pathname_( self.__dirpath, self.__prefix, self.__segment_number, "idx"), "wb", buffering=0)
+
+        self.__offset = self.__offset_written = 0
+        self.__records_since_index = 0
+        return
+
+
+class _Segment:
+
+    def __init__( self, pathname_seg, pathname_idx):
+        self.pathname_seg = pathname_seg
+        self.pathname_idx = pathname_idx
+        self.mmap = None
+        self.index_ts = []
+        self.index_offsets = []
+        self.index_size = 0
+        return
+
+    def close( self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+        return
+
+    def index_load( self):
+        """Neue Einträge des Index laden.
+
+        Der Index wächst, solange das Segment geschrieben wird. Es werden also
+        bei jedem seek() die dazugekommenen Einträge gelesen.
+        """
+        try:
+            with open( self.pathname_idx, "rb") as f:
+                f.seek( self.index_size)
+                data = f.read()
+
+        except OSError:
+            data = b""
+
+        data = data[ :len( data) - len( data) % _INDEXENTRY.size]
+        for ts, offset in _INDEXENTRY.iter_unpack( data):
+            self.index_ts.append( ts)
+            self.index_offsets.append( offset)
+
+        self.index_size += len( data)
+        return self
+
+    def mm( self):
+        if self.mmap is None:
+            with open( self.pathname_seg, "rb") as f:
+                if os.fstat( f.fileno()).st_size == 0:
+                    return None
+
+                self.mmap = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self.mmap
+
+
+class JournalReader:
+
+    """Liest die Records eines Journals über mmap.
+
+    Der Reader darf auch laufen, während das Journal noch geschrieben wird. Er
+    sieht dann alle Records, die bereits committet sind.
+    """
+
+    def __init__( self, dirpath, prefix="journal"):
+        self.__dirpath = dirpath
+        self.__prefix = prefix
+        self.__segments = []
+        self.refresh()
+        return
+
+    def __enter__( self):
+        return self
+
+    def __exit__( self, *args):
+        self.close()
+        return False
+
+    def __iter__( self):
+        for segment in list( self.__segments):
+            yield from self._records_( segment, 0)
+
+    def close( self):
+        for segment in self.__segments:
+            segment.close()
+
+        return self
+
+    def refresh( self):
+        """Neu dazugekommene Segmente aufnehmen.
+        """
+        known = {segment.pathname_seg for segment in self.__segments}
+        for number in _segment_numbers_( self.__dirpath, self.__prefix):
+            pathname_seg = _segment_pathname_( self.__dirpath, self.__prefix, number, "seg")
+            if pathname_seg not in known:
+                self.__segments.append( _Segment( pathname_seg, _segment_pathname_( self.__dirpath, self.__prefix, number, "idx")))
+
+        return self
+
+    def seek( self, ts_ns):
+        """Iterator über alle Records ab dem ersten mit einem Zeitstempel >= \\c ts_ns.
+        """
+        segments = list( self.__segments)
+        firsts = []
+        for segment in segments:
+            record = next( self._records_( segment, 0), None)
+            firsts.append( record.ts_ns if record else None)
+
+        candidates = [i for i, ts in enumerate( firsts) if ts is not None and ts < ts_ns]
+        i = candidates[ -1] if candidates else 0
+                                        # Letztes Segment, das vor ts_ns beginnt.
+        for j, segment in enumerate( segments[ i:]):
+            offset = self._offset_( segment, ts_ns) if j == 0 else 0
+            for record in self._records_( segment, offset):
+                if record.ts_ns >= ts_ns:
+                    yield record
+
+    def _offset_( self, segment, ts_ns):
+        """Offset des letzten Index-Eintrags vor \\c ts_ns.
+        """
+        segment.index_load()
+        k = bisect.bisect_left( segment.index_ts, ts_ns) - 1
+        while k >= 0:
+            offset = segment.index_offsets[ k]
+            if next( self._records_( segment, offset), None) is not None:
+                return offset
+                                        # Eintrag zeigt auf einen gültigen
+                                        #   Record.
+            k -= 1
+
+        return 0
+
+    def _records_( self, segment, offset):
+        mm = segment.mm()
+        if mm is None:
+            return
+
+        size = len( mm)
+        headersize = _RECORDHEADER.size
+        while offset + headersize <= size:
+            length, crc = _RECORDHEADER.unpack_from( mm, offset)
+            end = offset + headersize + length
+            if length < _PAYLOADHEADER.size or end > size:
+                return
+                                        # Ende der Daten oder kaputter Header.
+            payload = mm[ offset + headersize:end]
+            if zlib.crc32( payload) != crc:
+                return
+                                        # Record beim Absturz nur teilweise
+                                        #   geschrieben.
+            ts_ns, level, reason_ident, source_ident, sourcelen = _PAYLOADHEADER.unpack_from( payload)
+            i = _PAYLOADHEADER.size + sourcelen
+            yield JournalRecord( ts_ns, level, reason_ident, source_ident, payload[ _PAYLOADHEADER.size:i].decode( "utf8"), payload[ i:].decode( "utf8"))
+            offset = end
@@ -22,6 +22,9 @@
 
 import argparse
 import logging
+import logging.handlers
+import os
+import queue
 import sys
 
 from tau4 import DictWithUniqueKeys
@@ -40,8 +43,142 @@ class _LoggerSetup:
         return
 
 
+class _LevelFlags:
+
+    """Welche Levels ein Logger ausgibt, als einfache Attribute.
+
+    Usage:
+        ::
+
+            _Levels = Pool().levelflags( "plc")
+            ...
+            if _Levels.DEBUG:
+                _Logger.debug( "%s(): distance = %.3f m. ", this_name, distance)
+
+    Ein abgeschalteter debug()-Aufruf kostet so nur das Lesen eines Attributs.
+    Die Flags werden von Pool nachgeführt, die Levels müssen also über Pool
+    geändert werden (logginglevel_to() usw.), nicht direkt am Logger.
+    """
+
+    __slots__ = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+    def __init__( self, logginglevel=logging.NOTSET):
+        self.update( logginglevel)
+        return
+
+    def update( self, logginglevel):
+        self.DEBUG = logginglevel <= logging.DEBUG
+        self.INFO = logginglevel <= logging.INFO
+        self.WARNING = logginglevel <= logging.WARNING
+        self.ERROR = logginglevel <= logging.ERROR
+        self.CRITICAL = logginglevel <= logging.CRITICAL
+        return self
+
+
+class _BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+
+    """RotatingFileHandler, der während eines Batches nicht nach jedem Record flusht.
+    """
+
+    is_batching = False
+
+    def flush( self):
+        if not self.is_batching:
+            super().flush()
+
+        return
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+
+    """QueueHandler, der nicht formatiert.
+
+    Der Record geht unverändert, also samt msg und args, an den Listener und
+    wird erst dort formatiert. Die args sollten also nach dem Loggen nicht mehr
+    verändert werden.
+    """
+
+    def __init__( self, queue, loggername):
+        super().__init__( queue)
+        self.__loggername = loggername
+        return
+
+    def prepare( self, record):
+        return (self.__loggername, record)
+
+
+class _PipelineListener(logging.handlers.QueueListener):
+
+    """Ein QueueListener für alle Logger eines Prozesses.
+
+    Jeder Record geht an den File-Handler des Loggers, dessen _LazyQueueHandler
+    ihn in die Queue gestellt hat. Der Listener holt sich alle anstehenden
+    Records (höchstens \c batchsize), schreibt sie und flusht die Handler erst
+    danach.
+    """
+
+    def __init__( self, queue, batchsize=256):
+        super().__init__( queue, respect_handler_level=True)
+        self.__batchsize = batchsize
+        self.__handlers = {}
+        return
+
+    def handle( self, item):
+        loggername, record = item
+        handler = self.__handlers.get( loggername)
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle( record)
+
+        return
+
+    def handler_add( self, loggername, handler):
+        self.__handlers[ loggername] = handler
+        return self
+
+    def handler_remove( self, loggername):
+        self.__handlers.pop( loggername, None)
+        return self
+
+    def _monitor( self):
+        q = self.queue
+        stop = False
+        while not stop:
+            batch = [q.get()]
+            while len( batch) < self.__batchsize:
+                try:
+                    batch.append( q.get_nowait())
+
+                except queue.Empty:
+                    break
+
+            handlers = list( self.__handlers.values())
+            for handler in handlers:
+                handler.is_batching = True
+
+            for item in batch:
+                if item is self._sentinel:
+                    stop = True
+
+                else:
+                    self.handle( item)
+
+            for handler in handlers:
+                handler.is_batching = False
+                handler.flush()
+
+        return
+
+
 class Pool(metaclass=Singleton):
 
+    """Logger, die in je eine eigene Datei schreiben.
+
+    Im Pipeline-Betrieb (pipeline_on()) hängt an jedem Logger statt des
+    File-Handlers ein QueueHandler. Formatiert und geschrieben wird dann in
+    einem einzigen Listener-Thread pro Prozess. Der Thread, der loggt, bezahlt
+    nur noch das Erzeugen des LogRecords.
+    """
+
     def __init__( self):
         self.__logginglevels = { \
             None: logging.INFO,
@@ -55,6 +192,12 @@ class Pool(metaclass=Singleton):
 
         self.__loggersetups = DictWithUniqueKeys()
         self.__loggers = DictWithUniqueKeys()
+        self.__filehandlers = {}
+        self.__queuehandlers = {}
+        self.__levelflags = {}
+
+        self.__listener = None
+        self.__listener_pid = None
 
         ### Root Logger zurechtbiegen
         #
@@ -86,16 +229,23 @@ class Pool(metaclass=Singleton):
                                         # Die SUb-Logger loggen alle auch
                                         #   in den Root Logger
         if format_is_ascii:
-            handler = logging.handlers.RotatingFileHandler( "./" + loggername + ".log", "a", 10000000, 10)
+            handler = _BatchingRotatingFileHandler( "./" + loggername + ".log", "a", 10000000, 10)
             formatter = logging.Formatter( "%(asctime)s - %(process)10d - %(thread)20d - %(levelname)10s %(message)s")
 
         else:
-            handler = logging.handlers.RotatingFileHandler( "./" + loggername + ".log.csv", "a", 10000000, 10)
+            handler = _BatchingRotatingFileHandler( "./" + loggername + ".log.csv", "a", 10000000, 10)
             formatter = logging.Formatter( "%(asctime)s\t%(process)d\t%(thread)d\t%(levelname)s\t%(message)s")
 
         handler.setFormatter( formatter)
-        logger.addHandler( handler)
+        self.__filehandlers[ loggername] = handler
+        if self.is_pipelining():
+            self._handler_to_pipeline_( logger, loggername)
+
+        else:
+            logger.addHandler( handler)
+
         logger.setLevel( self.__loggersetups[ loggername]._logginglevel)
+        self.levelflags( loggername).update( logger.getEffectiveLevel())
 
         logger.critical( "***** Logger '%s' created. *****" % loggername)
 
@@ -106,6 +256,71 @@ class Pool(metaclass=Singleton):
     def _logger_exists_( self, loggername):
         return loggername in self.__loggers
 
+    def _handler_to_pipeline_( self, logger, loggername):
+        handler = self.__filehandlers[ loggername]
+        self.__listener.handler_add( loggername, handler)
+        queuehandler = _LazyQueueHandler( self.__listener.queue, loggername)
+        self.__queuehandlers[ loggername] = queuehandler
+        logger.removeHandler( handler)
+        logger.addHandler( queuehandler)
+        return
+
+    def is_pipelining( self):
+        return self.__listener is not None and self.__listener_pid == os.getpid()
+                                        # Nach einem fork() läuft der
+                                        #   Listener-Thread im Kind nicht mehr.
+
+    def levelflags( self, loggername="main") -> _LevelFlags:
+        """Level-Flags des Loggers, siehe _LevelFlags.
+
+        Liefert für einen Logger immer dieselbe Instanz, sie kann also gleich
+        beim Import eines Moduls geholt werden.
+        """
+        if loggername not in self.__levelflags:
+            self.__levelflags[ loggername] = _LevelFlags( logging.getLogger( loggername).getEffectiveLevel())
+
+        return self.__levelflags[ loggername]
+
+    def pipeline_off( self):
+        """Zurück zu synchronem Schreiben. Alle anstehenden Records werden noch geschrieben.
+        """
+        if self.__listener is None:
+            return self
+
+        listener = self.__listener
+        self.__listener = None
+        for loggername, queuehandler in self.__queuehandlers.items():
+            logger = self.__loggers[ loggername]
+            logger.removeHandler( queuehandler)
+            logger.addHandler( self.__filehandlers[ loggername])
+
+        self.__queuehandlers.clear()
+        if self.__listener_pid == os.getpid():
+            listener.stop()
+
+        return self
+
+    def pipeline_on( self, batchsize=256):
+        """Pipeline-Betrieb einschalten, siehe Pool.
+
+        \param  batchsize   Höchstzahl der Records, die der Listener schreibt,
+                            bevor er die Dateien flusht.
+        """
+        if self.is_pipelining():
+            return self
+
+        self.__listener = _PipelineListener( queue.SimpleQueue(), batchsize)
+        self.__listener_pid = os.getpid()
+        for loggername, logger in self.__loggers.items():
+            for handler in list( logger.handlers):
+                if isinstance( handler, _LazyQueueHandler):
+                    logger.removeHandler( handler)
+                                        # Vom Elternprozess geerbt.
+            self._handler_to_pipeline_( logger, loggername)
+
+        self.__listener.start()
+        return self
+
     def logginglevel_to_DEBUG( self, loggername="main"):
         self.logginglevel_to( loggername, "debug")
         return self
@@ -128,5 +343,8 @@ class Pool(metaclass=Singleton):
 
     def logginglevel_to( self, loggername, logginglevelname):
         self.__loggers[ loggername].setLevel( self.__logginglevels[ logginglevelname])
+        for name, levelflags in self.__levelflags.items():
+            levelflags.update( logging.getLogger( name).getEffectiveLevel())
+                                        # Auch die Kinder des Loggers.
         return self
 
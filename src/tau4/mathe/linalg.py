@@ -38,7 +38,9 @@ try:
     from tau4.mathe.linalg_cy import T3D
     from tau4.mathe.linalg_cy import T3DFromEuler
     from tau4.mathe.linalg_py import T3Dnp
+    from tau4.mathe.linalg_py import T3DBatch
     from tau4.mathe.linalg_cy import V3D
+    from tau4.mathe.linalg_py import V3DBatch
 
 except ImportError as e:
     text = "Pure Python code version is used."
@@ -47,6 +49,8 @@ except ImportError as e:
     from tau4.mathe.linalg_py import R3D
     from tau4.mathe.linalg_py import T3D
     from tau4.mathe.linalg_py import T3Dnp
+    from tau4.mathe.linalg_py import T3DBatch
     from tau4.mathe.linalg_py import V3D
+    from tau4.mathe.linalg_py import V3DBatch
 
 
@@ -18,6 +18,7 @@
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
 import logging; _Logger = logging.getLogger()
+from array import array
 from copy import copy
 import itertools
 from math import atan2, cos, degrees, pi, radians, sin, sqrt
@@ -45,21 +46,52 @@ def _tuples_to_tuple_( tuples):
     return t
 
 
+def _elems_( elems, typecode):
+    """Storage for the elements: a list or, if \c typecode is given, an array.
+    """
+    if typecode is None:
+        return list( elems)
+
+    return array( typecode, elems)
+
+
+def _elems_assign_( elems, other):
+    if isinstance( elems, array):
+        elems[ :] = array( elems.typecode, other)
+
+    else:
+        elems[ :] = other
+
+    return elems
+
+
 class Matrix3x3:
 
+    """3x3-Matrix.
+
+    \param  rows        Die drei Zeilen.
+
+    \param  typecode    None: Die Elemente liegen in einer Liste.
+                        'd': Die Elemente liegen in einem array( 'd').
+
+    Die Operatoren *, inverted() etc. liefern neue Objekte. Für zeitkritischen
+    Code gibt es Methoden, die in bereits bestehende Objekte schreiben und
+    direkt auf den flachen Elementen arbeiten: mul_into(), invert_into() und
+    der Operator *=.
+    """
+
     @staticmethod
     def FromRows( *rows):
         return Matrix3x3( *list(itertools.chain.from_iterable( rows)))
 
 
-    def __init__( self, *rows):
+    def __init__( self, *rows, typecode=None):
         if not rows:
             rows = ((0,)*3,)*3
 
         assert isinstance( rows, tuple)
 
-        self.__elems = [ 0]*9
-        self.__elems[ :] = [ elem for elem in _tuples_to_tuple_( rows)]
+        self.__elems = _elems_( _tuples_to_tuple_( rows), typecode)
         return
 
     def __eq__( self, other):
@@ -78,9 +110,15 @@ class Matrix3x3:
         i, j = indices
         return self.__elems[ (i - 1)*3 + j - 1]
 
+    def __imul__( self, other):
+        """self = self*other, ohne neues Objekt.
+        """
+        return self.mul_into( other, self)
+
     def __lshift__( self, other):
-        self.__elems[:] = other.__elems[:9]
+        _elems_assign_( self.__elems, other.__elems[:9])
         assert self.num_elems() == 9
+        self._elems_changed_()
         return self
 
     def __mul__( self, other):
@@ -116,14 +154,91 @@ class Matrix3x3:
         self.__elems[ (i - 1)*3 + j - 1] = v
         assert self.num_elems() == 9
 
+    def _elems_changed_( self):
+        """Wird nach dem Schreiben der Elemente durch in-place-Operationen aufgerufen.
+        """
+        return
+
     def elems( self):
         return self.__elems
 
     def num_elems( self):
         return len( self.__elems)
 
+    def determinant( self):
+        a11, a12, a13, a21, a22, a23, a31, a32, a33 = self.__elems
+        return a11*(a22*a33 - a23*a32) - a12*(a21*a33 - a23*a31) + a13*(a21*a32 - a22*a31)
+
+    def invert_into( self, out):
+        """Inverse von self nach \c out schreiben. \c out darf self sein.
+
+        \returns    out
+
+        \raises     ValueError, wenn die Matrix singulär ist.
+        """
+        a11, a12, a13, a21, a22, a23, a31, a32, a33 = self.__elems
+        c11 = a22*a33 - a23*a32
+        c12 = a23*a31 - a21*a33
+        c13 = a21*a32 - a22*a31
+        det = a11*c11 + a12*c12 + a13*c13
+        if det == 0:
+            raise ValueError( "Matrix is singular!")
+
+        e = out.__elems
+        e[ 0] = c11/det
+        e[ 1] = (a13*a32 - a12*a33)/det
+        e[ 2] = (a12*a23 - a13*a22)/det
+        e[ 3] = c12/det
+        e[ 4] = (a11*a33 - a13*a31)/det
+        e[ 5] = (a13*a21 - a11*a23)/det
+        e[ 6] = c13/det
+        e[ 7] = (a12*a31 - a11*a32)/det
+        e[ 8] = (a11*a22 - a12*a21)/det
+        out._elems_changed_()
+        return out
+
     def inverted( self):
-        raise NotImplementedError()
+        return self.invert_into( self.__class__())
+
+    def mul_into( self, other, out):
+        """self*other nach \c out schreiben.
+
+        \param  other   Matrix3x3 oder V3D.
+
+        \param  out     Matrix3x3 bzw. V3D. Darf self oder other sein.
+
+        \returns    out
+        """
+        a11, a12, a13, a21, a22, a23, a31, a32, a33 = self.__elems
+        if isinstance( other, Matrix3x3):
+            b11, b12, b13, b21, b22, b23, b31, b32, b33 = other.__elems
+            e = out.__elems
+            e[ 0] = a11*b11 + a12*b21 + a13*b31
+            e[ 1] = a11*b12 + a12*b22 + a13*b32
+            e[ 2] = a11*b13 + a12*b23 + a13*b33
+            e[ 3] = a21*b11 + a22*b21 + a23*b31
+            e[ 4] = a21*b12 + a22*b22 + a23*b32
+            e[ 5] = a21*b13 + a22*b23 + a23*b33
+            e[ 6] = a31*b11 + a32*b21 + a33*b31
+            e[ 7] = a31*b12 + a32*b22 + a33*b32
+            e[ 8] = a31*b13 + a32*b23 + a33*b33
+            out._elems_changed_()
+            return out
+
+        v1, v2, v3 = other.elems()
+        e = out.elems()
+        e[ 0] = a11*v1 + a12*v2 + a13*v3
+        e[ 1] = a21*v1 + a22*v2 + a23*v3
+        e[ 2] = a31*v1 + a32*v2 + a33*v3
+        return out
+
+    def transpose_into( self, out):
+        """Transponierte von self nach \c out schreiben. \c out darf self sein.
+        """
+        a11, a12, a13, a21, a22, a23, a31, a32, a33 = self.__elems
+        _elems_assign_( out.__elems, (a11, a21, a31, a12, a22, a32, a13, a23, a33))
+        out._elems_changed_()
+        return out
 
     def transposed( self):
         tM = self.__class__()
@@ -140,12 +255,14 @@ class V3D:
     """Vector in Euklidean space.
     """
 
-    def __init__( self, v1=0, v2=0, v3=0):
+    def __init__( self, v1=0, v2=0, v3=0, *, typecode=None):
         """Ctor.
 
         v3=0 erleichtert die Verwendung im 2D.
+
+        typecode siehe Matrix3x3.
         """
-        self.__elems = [v1, v2, v3]
+        self.__elems = _elems_( (v1, v2, v3), typecode)
         return
 
     def __add__( self, other):
@@ -161,13 +278,13 @@ class V3D:
         return V3D( v1 + w1, v2 + w2, v3 + w3)
 
     def __eq__( self, other):
-        return self.__elems == other.__elems
+        return tuple( self.__elems) == tuple( other.__elems)
 
     def __getitem__( self, i):
         return self.__elems[ i - 1]
 
     def __lshift__( self, other):
-        self.__elems[:] = other.__elems[:3]
+        _elems_assign_( self.__elems, other.__elems[:3])
         return self
 
     def __ne__( self, other):
@@ -207,9 +324,16 @@ class V3D:
 
 class T3D:
 
+    """Homogene Transformation.
+
+    Wie bei Matrix3x3 gibt es neben den Operatoren, die neue Objekte liefern,
+    in-place-Varianten für zeitkritischen Code: mul_into(), invert_into() und
+    der Operator *=.
+    """
+
     @staticmethod
-    def FromEuler( x=0, y=0, z=0, alpha=0, beta=0, gamma=0):
-        return T3D( R3D.FromEuler( alpha, beta, gamma), p3D( x, y, z))
+    def FromEuler( x=0, y=0, z=0, alpha=0, beta=0, gamma=0, *, typecode=None):
+        return T3D( R3D.FromEuler( alpha, beta, gamma, typecode=typecode), p3D( x, y, z, typecode=typecode))
 
     def __init__( self, R, p):
         self.__R3D = R
@@ -225,6 +349,11 @@ class T3D:
     def __eq__( self, other):
         return self.__p3D == other.__p3D and self.__R3D == other.__R3D
 
+    def __imul__( self, other):
+        """self = self*other, ohne neue Objekte.
+        """
+        return self.mul_into( other, self)
+
     def __mul__( self, other):
         if isinstance( other, (p3D, V3D, V3D)):
             return p3D( *(self.__R3D*other + self.__p3D).elems())
@@ -269,9 +398,51 @@ class T3D:
     euler_coords = euler
 
     def inverted( self):
-        transposedR = self.__R3D.transposed()
-        invertedT = T3D( transposedR, -transposedR*self.__p3D)
-        return invertedT
+        return self.invert_into( T3D( R3D(), p3D()))
+
+    def invert_into( self, out):
+        """Inverse von self nach \c out schreiben. \c out darf self sein.
+
+        Da R orthonormal ist, ist die Inverse geschlossen berechenbar: R^T und
+        -R^T*p.
+
+        \returns    out
+        """
+        r11, r12, r13, r21, r22, r23, r31, r32, r33 = self.__R3D.elems()
+        p1, p2, p3 = self.__p3D.elems()
+
+        _elems_assign_( out.__R3D.elems(), (r11, r21, r31, r12, r22, r32, r13, r23, r33))
+        out.__R3D._elems_changed_()
+        p = out.__p3D.elems()
+        p[ 0] = -(r11*p1 + r21*p2 + r31*p3)
+        p[ 1] = -(r12*p1 + r22*p2 + r32*p3)
+        p[ 2] = -(r13*p1 + r23*p2 + r33*p3)
+        return out
+
+    def mul_into( self, other, out):
+        """self*other nach \c out schreiben.
+
+        \param  other   T3D oder V3D bzw. p3D.
+
+        \param  out     T3D bzw. V3D, p3D. Darf self oder other sein.
+
+        \returns    out
+        """
+        r11, r12, r13, r21, r22, r23, r31, r32, r33 = self.__R3D.elems()
+        p1, p2, p3 = self.__p3D.elems()
+        if isinstance( other, V3D):
+            v1, v2, v3 = other.elems()
+            p = out.elems()
+
+        else:
+            v1, v2, v3 = other.__p3D.elems()
+            self.__R3D.mul_into( other.__R3D, out.__R3D)
+            p = out.__p3D.elems()
+
+        p[ 0] = r11*v1 + r12*v2 + r13*v3 + p1
+        p[ 1] = r21*v1 + r22*v2 + r23*v3 + p2
+        p[ 2] = r31*v1 + r32*v2 + r33*v3 + p3
+        return out
 
     def _P_( self):
         return self.__p3D
@@ -366,6 +537,9 @@ class T3Dnp:
             P = tuple( np.squeeze( np.asarray( P)).tolist())
             return P
 
+        if isinstance( other, (T3DBatch, V3DBatch)):
+            return T3DBatch.FromT3Ds( (self,)) * other
+
         T = T3Dnp( np.dot( self.__R, other.__R), tuple( np.squeeze( np.asarray( np.dot( self.__R, other.__P) + self.__P)).tolist()))
         return T
 
@@ -450,6 +624,14 @@ class T3Dnp:
     def _R_( self):
         return self.__R
 
+    def homogeneous( self):
+        """Homogene 4x4-Matrix, wie sie T3DBatch verwendet.
+        """
+        H = np.eye( 4)
+        H[ :3, :3] = self.__R
+        H[ :3, 3] = self.__P
+        return H
+
     def vnorm( self):
         return np.sqrt( np.dot( self.__P, self.__P))
 
@@ -469,6 +651,231 @@ class T3Dnp:
         return self.euler()[ 2]
 
 
+class T3DBatch:
+
+    """N Transformationen in einem (N,4,4)-Array (homogene Matrizen).
+
+    Für Aufrufer, die viele Posen oder viele Punkte auf einmal transformieren:
+    Statt für jede Multiplikation neue R3D- bzw. p3D-Objekte zu erzeugen, wird
+    alles mit einem einzigen numpy-Aufruf erledigt.
+
+    Multiplikation:
+    --  T3DBatch * T3DBatch:    Elementweise Verkettung. Hat einer der beiden
+                                Batches die Länge 1, wird er auf alle Elemente
+                                des anderen angewendet (broadcasting).
+
+    --  T3DBatch * V3DBatch:    Transformation der Punkte, ebenso elementweise
+                                bzw. mit broadcasting.
+
+    --  T3DBatch * T3Dnp:       Wie T3DBatch * T3DBatch.FromT3Ds( (T,)).
+
+    \note   Die Daten werden nicht kopiert, d.h. array() liefert das Array
+            selbst.
+    """
+
+    @staticmethod
+    def FromArray( H):
+        """Batch aus einem (N,4,4)-Array oder einer einzelnen 4x4-Matrix.
+        """
+        H = np.asarray( H, dtype=float)
+        if H.ndim == 2:
+            H = H[ np.newaxis]
+
+        if H.shape[ 1:] != (4, 4):
+            raise ValueError( "Array of shape (N,4,4) expected, got %s!" % (H.shape,))
+
+        return T3DBatch( H)
+
+    @staticmethod
+    def FromEuler( x=0, y=0, z=0, alpha=0, beta=0, gamma=0):
+        """Batch aus Euler-Koordinaten, wie T3Dnp.FromEuler().
+
+        Jedes Argument ist ein Skalar oder ein Array der Länge N.
+        """
+        x, y, z, alpha, beta, gamma = np.broadcast_arrays( *(np.asarray( arg, dtype=float) for arg in (x, y, z, alpha, beta, gamma)))
+        n = x.size
+        x, y, z, alpha, beta, gamma = (arg.reshape( n) for arg in (x, y, z, alpha, beta, gamma))
+
+        ca = np.cos( alpha)
+        cb = np.cos( beta)
+        cg = np.cos( gamma)
+        sa = np.sin( alpha)
+        sb = np.sin( beta)
+        sg = np.sin( gamma)
+
+        H = np.zeros( (n, 4, 4))
+        H[ :, 0, 0] = ca*cb
+        H[ :, 0, 1] = ca*sb*sg - sa*cg
+        H[ :, 0, 2] = ca*sb*cg + sa*sg
+        H[ :, 1, 0] = sa*cb
+        H[ :, 1, 1] = sa*sb*sg + ca*cg
+        H[ :, 1, 2] = sa*sb*cg - ca*sg
+        H[ :, 2, 0] = -sb
+        H[ :, 2, 1] = cb*sg
+        H[ :, 2, 2] = cb*cg
+        H[ :, 0, 3] = x
+        H[ :, 1, 3] = y
+        H[ :, 2, 3] = z
+        H[ :, 3, 3] = 1
+        return T3DBatch( H)
+
+    @staticmethod
+    def FromT3Ds( Ts):
+        """Batch aus T3Dnp- bzw. T3D-Objekten.
+        """
+        Ts = list( Ts)
+        H = np.zeros( (len( Ts), 4, 4))
+        for i, T in enumerate( Ts):
+            if isinstance( T, T3Dnp):
+                H[ i] = T.homogeneous()
+
+            else:
+                H[ i, :3, :3] = np.reshape( T._R_().elems(), (3, 3))
+                H[ i, :3, 3] = T._P_().elems()
+                H[ i, 3, 3] = 1
+
+        return T3DBatch( H)
+
+    def __init__( self, H):
+        self.__H = H
+        return
+
+    def __getitem__( self, i):
+        """Das i-te Element als T3Dnp.
+        """
+        H = self.__H[ i]
+        return T3Dnp( H[ :3, :3], H[ :3, 3].copy())
+
+    def __len__( self):
+        return len( self.__H)
+
+    def __mul__( self, other):
+        if isinstance( other, V3DBatch):
+            R = self.__H[ :, :3, :3]
+            P = self.__H[ :, :3, 3]
+            if len( self) == 1:
+                return V3DBatch( other.array() @ R[ 0].T + P[ 0])
+
+            return V3DBatch( np.einsum( "nij,nj->ni", R, other.array()) + P)
+
+        if isinstance( other, T3Dnp):
+            other = T3DBatch( other.homogeneous()[ np.newaxis])
+
+        return T3DBatch( np.matmul( self.__H, other.__H))
+
+    def __repr__( self):
+        return u"T3DBatch( n=%d)" % len( self)
+
+    def array( self):
+        """Das (N,4,4)-Array.
+        """
+        return self.__H
+
+    def euler( self, deg=False):
+        """Euler-Koordinaten als (N,6)-Array (x, y, z, alpha, beta, gamma).
+
+        Gleicher Algorithmus wie T3Dnp.euler(), inklusive Sonderfall cos( beta) == 0.
+        """
+        H = self.__H
+        r11, r12, r21, r22 = H[ :, 0, 0], H[ :, 0, 1], H[ :, 1, 0], H[ :, 1, 1]
+        r31, r32, r33 = H[ :, 2, 0], H[ :, 2, 1], H[ :, 2, 2]
+        beta = np.arctan2( -r31, np.sqrt( r11*r11 + r21*r21))
+        cb = np.cos( beta)
+        singular = cb == 0
+        with np.errstate( divide="ignore", invalid="ignore"):
+            alpha = np.where( singular, 0.0, np.arctan2( r21/cb, r11/cb))
+            gamma = np.where( singular, np.where( beta > 0, 1, -1)*np.arctan2( r12, r22), np.arctan2( r32/cb, r33/cb))
+
+        E = np.empty( (len( self), 6))
+        E[ :, :3] = H[ :, :3, 3]
+        E[ :, 3] = alpha
+        E[ :, 4] = beta
+        E[ :, 5] = gamma
+        if deg:
+            E[ :, 3:] = np.degrees( E[ :, 3:])
+
+        return E
+
+    def inverted( self):
+        """Inverse aller Transformationen: R^T und -R^T*p, ohne allgemeine Matrixinversion.
+        """
+        Rt = np.transpose( self.__H[ :, :3, :3], (0, 2, 1))
+        H = np.zeros_like( self.__H)
+        H[ :, :3, :3] = Rt
+        H[ :, :3, 3] = -np.einsum( "nij,nj->ni", Rt, self.__H[ :, :3, 3])
+        H[ :, 3, 3] = 1
+        return T3DBatch( H)
+
+    def P( self):
+        """Verschiebevektoren als V3DBatch.
+        """
+        return V3DBatch( self.__H[ :, :3, 3])
+
+
+class V3DBatch:
+
+    """N Vektoren bzw. Punkte in einem (N,3)-Array.
+
+    Siehe T3DBatch.
+    """
+
+    @staticmethod
+    def FromArray( P):
+        """Batch aus einem (N,3)-Array. Ein (N,2)-Array wird mit z = 0 ergänzt.
+        """
+        P = np.asarray( P, dtype=float)
+        if P.ndim == 1:
+            P = P[ np.newaxis]
+
+        if P.shape[ 1] == 2:
+            P = np.column_stack( (P, np.zeros( len( P))))
+
+        if P.shape[ 1:] != (3,):
+            raise ValueError( "Array of shape (N,3) expected, got %s!" % (P.shape,))
+
+        return V3DBatch( P)
+
+    @staticmethod
+    def FromV3Ds( vs):
+        """Batch aus V3D- bzw. p3D-Objekten.
+        """
+        return V3DBatch( np.array( [v.elems() for v in vs], dtype=float).reshape( -1, 3))
+
+    def __init__( self, P):
+        self.__P = P
+        return
+
+    def __add__( self, other):
+        return V3DBatch( self.__P + other.__P)
+
+    def __getitem__( self, i):
+        """Das i-te Element als p3D.
+        """
+        return p3D( *self.__P[ i].tolist())
+
+    def __len__( self):
+        return len( self.__P)
+
+    def __repr__( self):
+        return u"V3DBatch( n=%d)" % len( self)
+
+    def __sub__( self, other):
+        return V3DBatch( self.__P - other.__P)
+
+    def array( self):
+        """Das (N,3)-Array.
+        """
+        return self.__P
+
+    def mags( self):
+        return np.sqrt( np.einsum( "ni,ni->n", self.__P, self.__P))
+
+    def xyz( self):
+        """Die drei Spalten x, y und z.
+        """
+        return self.__P[ :, 0], self.__P[ :, 1], self.__P[ :, 2]
+
+
 class e3D:
 
     def __init__( self, alpha, beta, gamma):
@@ -501,14 +908,14 @@ class e3D:
 
 class p3D(V3D):
 
-    def __init__( self, x=0, y=0, z=0):
-        V3D.__init__( self, x, y, z)
+    def __init__( self, x=0, y=0, z=0, *, typecode=None):
+        V3D.__init__( self, x, y, z, typecode=typecode)
 
 
 class R3D(Matrix3x3):
 
     @staticmethod
-    def FromEuler( alpha=0, beta=0, gamma=0):
+    def FromEuler( alpha=0, beta=0, gamma=0, *, typecode=None):
         ca = cos( alpha)
         cb = cos( beta)
         cg = cos( gamma)
@@ -524,23 +931,26 @@ class R3D(Matrix3x3):
         r31 = -sb
         r32 = cb*sg
         r33 = cb*cg
-        return R3D( (r11, r12, r13), (r21, r22, r23), (r31, r32, r33))
+        return R3D( (r11, r12, r13), (r21, r22, r23), (r31, r32, r33), typecode=typecode)
 
 
     @staticmethod
     def FromVectors( ex: V3D, ey: V3D, ez: V3D):
         return R3DFromVectors( ex, ey, ez)
 
-    def __init__( self, *rows):
-        Matrix3x3.__init__( self, *rows)
+    def __init__( self, *rows, typecode=None):
+        Matrix3x3.__init__( self, *rows, typecode=typecode)
+        self.__euler = None
         if not len( rows):
             self << R3D.FromEuler()
 
-        self.__euler = None
         return
 
     def __lshift__( self, other):
         super().__lshift__( other)
+        return self
+
+    def _elems_changed_( self):
         self.__euler = None
         return
 
@@ -21,11 +21,16 @@
 
 import abc
 import threading
+import time
 
 from tau4.multitasking import _multitasking
+from tau4.multitasking.scheduling import SchedulingProfile
 
 
 CycletimeMonitor = _multitasking._CycletimeMonitor
+LatencyHistogram = _multitasking.LatencyHistogram
+SlackCollector = _multitasking.SlackCollector
+SnapshotWriter = _multitasking.SnapshotWriter
 
 
 class RWLock:
@@ -200,7 +205,7 @@ class RWLockWritePreferring:
                 self.__lock.wait()
 
             self.__one_writer = True
-            self.__num_writers_waiting += 1
+            self.__num_writers_waiting -= 1
             self.log( "%s.%s(), called by %s: Writer has access now. ", *_names)
 
         self.log( "%s.%s(), called by %s: Exit now.\n", *_names)
@@ -238,3 +243,272 @@ class RWLockWritePreferring:
         return
 
 
+class RWLockPhaseFair:
+
+    """Readers-Writers Lock, phase-fair.
+
+    Lockt eine Shared Region (SR) wie RWLock, aber ohne dass Reader oder
+    Writer verhungern:
+
+    -   Writer kommen in der Reihenfolge ihres Eintreffens dran (Tickets).
+
+    -   Ein Reader, der eintrifft, während ein Writer die SR hat oder auf sie
+        wartet, wartet auf genau diesen Writer. Gibt der Writer die SR frei,
+        betreten alle wartenden Reader sie gemeinsam, bevor der nächste
+        Writer drankommt.
+
+    -   Ein Writer wartet also höchstens auf eine Reader-Phase und die Writer
+        vor ihm, ein Reader höchstens auf einen Writer.
+
+    Das Lock ist nicht reentrant: Acquiriert ein Thread, der die SR schon hat,
+    erneut, wirft das RuntimeError statt zu deadlocken. Ebenso das Freigeben
+    durch einen Thread, der die SR nicht hat.
+
+    \param  stats
+        Contention-Statistik führen (stats()). Ohne kosten Acquire und
+        Release nichts dafür, die Methoden sind dann gar nicht gebunden.
+
+    Usage:
+        \code{.py}
+            lock = RWLockPhaseFair()
+            with lock.readaccess():
+                ...
+
+            with lock.writeaccess( timeout=0.010):
+                ...                     # TimeoutError, wenn's nicht klappt.
+        \endcode
+    """
+
+    class _Access:
+
+        def __init__( self, acquire, release, timeout):
+            self.__acquire = acquire
+            self.__release = release
+            self.__timeout = timeout
+            return
+
+        def __enter__( self):
+            if not self.__acquire( self.__timeout):
+                raise TimeoutError( "Lock not acquired within %s s!" % self.__timeout)
+
+            return self
+
+        def __exit__( self, *args):
+            self.__release()
+            return False
+
+
+    def __init__( self, stats=False):
+        self.__lock = threading.Lock()
+        self.__readers_cv = threading.Condition( self.__lock)
+        self.__writers_cv = threading.Condition( self.__lock)
+
+        self.__readers = {}
+                                        # Thread Ident -> 1, Reader in der SR.
+        self.__readers_waiting = 0
+        self.__readers_admitted = 0
+                                        # Eingelassen von _phase_end_(), aber
+                                        #   noch nicht aufgewacht.
+        self.__phase = 0
+                                        # Zählt die Writer-Phasen.
+        self.__writer = None
+        self.__writers_waiting = 0
+        self.__ticket_next = 0
+        self.__ticket_serving = 0
+        self.__tickets_abandoned = set()
+
+        self.__stats = None
+        if stats:
+            self.__stats = dict.fromkeys( ("reads", "reads_contended", "reads_wait_ns", "writes", "writes_contended", "writes_wait_ns", "writes_wait_ns_max", "timeouts"), 0)
+            self.acquire_readaccess = self._acquire_readaccess_counting_
+            self.acquire_writeaccess = self._acquire_writeaccess_counting_
+
+        self.__readaccess = self._Access( self.acquire_readaccess, self.release_readaccess, None)
+        self.__writeaccess = self._Access( self.acquire_writeaccess, self.release_writeaccess, None)
+        return
+
+    def acquire_readaccess( self, timeout=None) -> bool:
+        """Die SR zum Lesen betreten.
+
+        \param  timeout     None wartet unbegrenzt.
+
+        \returns    False, wenn \c timeout abgelaufen ist.
+        """
+        return self._acquire_read_( timeout)[ 0]
+
+    def acquire_writeaccess( self, timeout=None) -> bool:
+        """Die SR zum Schreiben betreten.
+
+        \param  timeout     None wartet unbegrenzt.
+
+        \returns    False, wenn \c timeout abgelaufen ist.
+        """
+        return self._acquire_write_( timeout)[ 0]
+
+    def _acquire_read_( self, timeout):
+        ident = threading.get_ident()
+        with self.__lock:
+            if ident in self.__readers or ident == self.__writer:
+                raise RuntimeError( "%s is not reentrant!" % self.__class__.__name__)
+
+            if self.__writer is None and self.__writers_waiting == 0:
+                self.__readers[ ident] = 1
+                return True, False
+
+            phase = self.__phase
+            self.__readers_waiting += 1
+            if not self.__readers_cv.wait_for( lambda: self.__phase != phase, timeout):
+                self.__readers_waiting -= 1
+                return False, True
+
+            self.__readers_admitted -= 1
+            self.__readers[ ident] = 1
+            return True, True
+
+    def _acquire_write_( self, timeout):
+        ident = threading.get_ident()
+        with self.__lock:
+            if ident in self.__readers or ident == self.__writer:
+                raise RuntimeError( "%s is not reentrant!" % self.__class__.__name__)
+
+            if self.__writer is None and self.__writers_waiting == 0 and not self.__readers and not self.__readers_admitted:
+                self.__ticket_next += 1
+                self.__writer = ident
+                return True, False
+
+            ticket = self.__ticket_next
+            self.__ticket_next += 1
+            self.__writers_waiting += 1
+            if not self.__writers_cv.wait_for( lambda: self.__ticket_serving == ticket and self.__writer is None and not self.__readers and not self.__readers_admitted, timeout):
+                self.__writers_waiting -= 1
+                if self.__ticket_serving == ticket:
+                    self._ticket_next_serving_()
+                    self.__writers_cv.notify_all()
+
+                else:
+                    self.__tickets_abandoned.add( ticket)
+
+                if self.__writer is None and self.__writers_waiting == 0:
+                    self._phase_end_()
+                                        # Auf diesen Writer gewartet haben
+                                        #   Reader, die jetzt hinein dürfen.
+                return False, True
+
+            self.__writers_waiting -= 1
+            self.__writer = ident
+            return True, True
+
+    def _acquire_readaccess_counting_( self, timeout=None):
+        t = time.perf_counter_ns()
+        is_acquired, is_contended = self._acquire_read_( timeout)
+        dt = time.perf_counter_ns() - t
+        with self.__lock:
+            stats = self.__stats
+            if is_acquired:
+                stats[ "reads"] += 1
+
+            else:
+                stats[ "timeouts"] += 1
+
+            if is_contended:
+                stats[ "reads_contended"] += 1
+                stats[ "reads_wait_ns"] += dt
+
+        return is_acquired
+
+    def _acquire_writeaccess_counting_( self, timeout=None):
+        t = time.perf_counter_ns()
+        is_acquired, is_contended = self._acquire_write_( timeout)
+        dt = time.perf_counter_ns() - t
+        with self.__lock:
+            stats = self.__stats
+            if is_acquired:
+                stats[ "writes"] += 1
+
+            else:
+                stats[ "timeouts"] += 1
+
+            if is_contended:
+                stats[ "writes_contended"] += 1
+                stats[ "writes_wait_ns"] += dt
+                stats[ "writes_wait_ns_max"] = max( stats[ "writes_wait_ns_max"], dt)
+
+        return is_acquired
+
+    def _phase_end_( self):
+        """Alle wartenden Reader in die SR lassen.
+        """
+        self.__phase += 1
+        if self.__readers_waiting:
+            self.__readers_admitted += self.__readers_waiting
+            self.__readers_waiting = 0
+            self.__readers_cv.notify_all()
+
+        return
+
+    def readaccess( self, timeout=None):
+        """Context Manager für acquire_readaccess() und release_readaccess().
+        """
+        if timeout is None:
+            return self.__readaccess
+
+        return self._Access( self.acquire_readaccess, self.release_readaccess, timeout)
+
+    def release_readaccess( self):
+        with self.__lock:
+            if self.__readers.pop( threading.get_ident(), None) is None:
+                raise RuntimeError( "Release of a read access that has not been acquired by this thread!")
+
+            if not self.__readers and not self.__readers_admitted and self.__writers_waiting:
+                self.__writers_cv.notify_all()
+
+        return
+
+    def release_writeaccess( self):
+        with self.__lock:
+            if self.__writer != threading.get_ident():
+                raise RuntimeError( "Release of a write access that has not been acquired by this thread!")
+
+            self.__writer = None
+            self._ticket_next_serving_()
+            self._phase_end_()
+            if self.__writers_waiting:
+                self.__writers_cv.notify_all()
+
+        return
+
+    def stats( self):
+        """Anzahl der Zugriffe, davon mit Warten, Wartezeiten in ns, Timeouts.
+
+        None, wenn das Lock ohne \c stats erzeugt worden ist.
+        """
+        if self.__stats is None:
+            return None
+
+        with self.__lock:
+            return dict( self.__stats)
+
+    def stats_reset( self):
+        if self.__stats is not None:
+            with self.__lock:
+                for key in self.__stats:
+                    self.__stats[ key] = 0
+
+        return self
+
+    def _ticket_next_serving_( self):
+        self.__ticket_serving += 1
+        while self.__ticket_serving in self.__tickets_abandoned:
+            self.__tickets_abandoned.remove( self.__ticket_serving)
+            self.__ticket_serving += 1
+
+        return
+
+    def writeaccess( self, timeout=None):
+        """Context Manager für acquire_writeaccess() und release_writeaccess().
+        """
+        if timeout is None:
+            return self.__writeaccess
+
+        return self._Access( self.acquire_writeaccess, self.release_writeaccess, timeout)
+
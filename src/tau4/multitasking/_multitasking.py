@@ -19,7 +19,13 @@
 #   You should have received a copy of the GNU General Public License
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
+import array
+import gc
+import math
+import queue
+import struct
 import sys
+import threading
 import time
 
 from tau4 import Object
@@ -76,9 +82,427 @@ class _Stopwatch:
         return self.__dt_sum / self.__num_calls
 
 
+class LatencyHistogram:
+
+    """Log-lineares Histogramm (HDR-Histogramm) für Zeiten in ns.
+
+    :param  subbits:
+            Die Werte bis 2**subbits ns haben je einen eigenen Bucket, darüber
+            teilt sich jede Zweierpotenz in 2**(subbits - 1) Buckets. Der
+            relative Fehler ist also kleiner als 2**(1 - subbits), bei 8 also
+            kleiner als 0.8 %.
+
+    :param  max_ns:
+            Größter Wert mit eigenem Bucket. Größere Werte landen im letzten
+            Bucket, max() bleibt aber exakt.
+
+    Der Speicher ist fest (ein array.array), record() kostet O(1) und legt
+    außer ganzen Zahlen keine Objekte an. Snapshots (snapshot()) sind Kopien
+    und lassen sich mit merge() addieren, z.B. über mehrere Threads oder
+    Zeiträume.
+    """
+
+    def __init__( self, subbits:int=8, max_ns:int=2**36):
+        self.__subbits = subbits
+        self.__subcount = 1 << subbits
+        self.__halfcount = self.__subcount >> 1
+        self.__max_ns = max_ns
+        self.__counts = array.array( "q", bytes( 8*(self._index_( max_ns) + 1)))
+        self.__lastindex = len( self.__counts) - 1
+        self.__count = 0
+        self.__min = 0
+        self.__max = 0
+        return
+
+    def __eq__( self, other):
+        return isinstance( other, LatencyHistogram) and self.config() == other.config() and self.__counts == other._counts_() and (self.__count, self.__min, self.__max) == (other.count(), other.min(), other.max())
+
+    def config( self):
+        """(subbits, max_ns), nur Histogramme mit gleicher config() lassen sich mergen.
+        """
+        return (self.__subbits, self.__max_ns)
+
+    def count( self):
+        return self.__count
+
+    def count_above( self, ns):
+        """Anzahl Werte, die größer als \c ns sind.
+
+        Exakt, wenn \c ns der größte Wert eines Buckets ist (z.B. jeder
+        Wert < 2**subbits), sonst werden die Werte im Bucket von \c ns alle
+        mitgezählt.
+        """
+        i = self._index_( min( ns, self.__max_ns))
+        n = sum( self.__counts[ i + 1:])
+        if ns < self._value_upper_( i) - 1:
+            n += self.__counts[ i]
+                                        # Bucket i enthält auch Werte > ns.
+
+        return n
+
+    def exceeds( self, *thresholds):
+        """{threshold: count_above( threshold)} für alle \c thresholds.
+        """
+        return {threshold: self.count_above( threshold) for threshold in thresholds}
+
+    def max( self):
+        return self.__max
+
+    def merge( self, other):
+        """Die Werte eines anderen Histogramms dazuzählen.
+
+        \throws ValueError, wenn other.config() nicht passt.
+        """
+        if other.config() != self.config():
+            raise ValueError( "Histograms with configs %s and %s can't be merged!" % (self.config(), other.config()))
+
+        if other.count():
+            counts = self.__counts
+            for i, count in enumerate( other._counts_()):
+                if count:
+                    counts[ i] += count
+
+            self.__min = min( self.__min, other.min()) if self.__count else other.min()
+            self.__max = max( self.__max, other.max())
+            self.__count += other.count()
+
+        return self
+
+    def min( self):
+        return self.__min
+
+    def percentile( self, p):
+        """Wert, unter dem \c p Prozent der Werte liegen, in ns.
+
+        Geliefert wird die Mitte des Buckets, begrenzt auf min() und max().
+        """
+        if not self.__count:
+            return 0
+
+        rank = max( 1, math.ceil( p/100*self.__count))
+        n = 0
+        for i, count in enumerate( self.__counts):
+            n += count
+            if n >= rank:
+                if i == self.__lastindex:
+                    return self.__max
+                                        # Enthält auch alle Werte > max_ns.
+                value = (self._value_lower_( i) + self._value_upper_( i))//2
+                return min( max( value, self.__min), self.__max)
+
+        return self.__max
+
+    def percentiles( self):
+        """Die üblichen Kennzahlen als dict.
+        """
+        return {"count": self.__count, "p50": self.percentile( 50), "p99": self.percentile( 99), "p99.9": self.percentile( 99.9), "max": self.__max}
+
+    def record( self, ns):
+        """Einen Wert aufnehmen, 1-mal pro Zyklus.
+        """
+        if ns < 0:
+            ns = 0
+
+        if ns < self.__subcount:
+            i = ns
+
+        else:
+            k = ns.bit_length() - self.__subbits
+            i = self.__subcount + (k - 1)*self.__halfcount + (ns >> k) - self.__halfcount
+            if i > self.__lastindex:
+                i = self.__lastindex
+
+        self.__counts[ i] += 1
+        if ns > self.__max:
+            self.__max = ns
+
+        if ns < self.__min or not self.__count:
+            self.__min = ns
+
+        self.__count += 1
+        return
+
+    def reset( self):
+        self.__counts[ :] = array.array( "q", bytes( 8*len( self.__counts)))
+        self.__count = 0
+        self.__min = 0
+        self.__max = 0
+        return self
+
+    def snapshot( self):
+        """Kopie des Histogramms.
+        """
+        other = LatencyHistogram.__new__( LatencyHistogram)
+        other.__dict__.update( self.__dict__)
+        other.__counts = array.array( "q", self.__counts)
+        return other
+
+    def to_bytes( self):
+        """Binäre Darstellung, siehe FromBytes().
+        """
+        return self._HEADER.pack( self.__subbits, self.__max_ns, self.__count, self.__min, self.__max, len( self.__counts)) + self.__counts.tobytes()
+
+    @classmethod
+    def FromBytes( klass, data, offset=0):
+        """Histogramm aus to_bytes() wiederherstellen.
+
+        \returns    (histogram, offset hinter den gelesenen Daten)
+        """
+        subbits, max_ns, count, min_, max_, n = klass._HEADER.unpack_from( data, offset)
+        offset += klass._HEADER.size
+        histogram = klass( subbits, max_ns)
+        counts = array.array( "q")
+        counts.frombytes( data[ offset:offset + 8*n])
+        histogram.__counts = counts
+        histogram.__count, histogram.__min, histogram.__max = count, min_, max_
+        return histogram, offset + 8*n
+
+    _HEADER = struct.Struct( "<iqqqqi")
+
+    def _counts_( self):
+        return self.__counts
+
+    def _index_( self, ns):
+        if ns < self.__subcount:
+            return ns
+
+        k = ns.bit_length() - self.__subbits
+        return self.__subcount + (k - 1)*self.__halfcount + (ns >> k) - self.__halfcount
+
+    def _value_lower_( self, i):
+        if i < self.__subcount:
+            return i
+
+        k = (i - self.__subcount)//self.__halfcount + 1
+        return ((i - self.__subcount) % self.__halfcount + self.__halfcount) << k
+
+    def _value_upper_( self, i):
+        """Kleinster Wert, der nicht mehr in Bucket \c i fällt.
+        """
+        if i < self.__subcount:
+            return i + 1
+
+        k = (i - self.__subcount)//self.__halfcount + 1
+        return self._value_lower_( i) + (1 << k)
+
+
+class SnapshotWriter:
+
+    """Schreibt Snapshots von LatencyHistograms in einem eigenen Thread in eine Datei.
+
+    :param  format:
+            "csv": Eine Zeile pro Snapshot mit time, id, count, p50, p99, p99.9
+            und max (in ns). "binary": LatencyHistogram.to_bytes() samt time
+            und id, zu lesen mit Read().
+
+    write() stellt den Snapshot nur in eine Queue und blockiert den Zyklus
+    also nicht.
+    """
+
+    _HEADER = struct.Struct( "<dH")
+
+    def __init__( self, pathname, format="csv"):
+        if format not in ("csv", "binary"):
+            raise ValueError( "Format must be 'csv' or 'binary', not '%s'!" % format)
+
+        self.__pathname = pathname
+        self.__format = format
+        self.__queue = queue.SimpleQueue()
+        self.__thread = threading.Thread( target=self._work_, name="SnapshotWriter", daemon=True)
+        self.__thread.start()
+        return
+
+    def close( self):
+        """Alle Snapshots schreiben und den Thread beenden.
+        """
+        self.__queue.put( None)
+        self.__thread.join()
+        return self
+
+    def write( self, histogram, id=""):
+        """\c histogram sollte ein snapshot() sein, er wird erst später gelesen.
+        """
+        self.__queue.put( (time.time(), str( id), histogram))
+        return self
+
+    @staticmethod
+    def Read( pathname):
+        """Iterator über (time, id, histogram) einer binären Datei.
+        """
+        with open( pathname, "rb") as f:
+            data = f.read()
+
+        offset = 0
+        header = SnapshotWriter._HEADER
+        while offset < len( data):
+            t, idlen = header.unpack_from( data, offset)
+            offset += header.size
+            id = data[ offset:offset + idlen].decode( "utf8")
+            histogram, offset = LatencyHistogram.FromBytes( data, offset + idlen)
+            yield t, id, histogram
+
+    def _work_( self):
+        is_csv = self.__format == "csv"
+        with open( self.__pathname, "a" if is_csv else "ab") as f:
+            while True:
+                item = self.__queue.get()
+                if item is None:
+                    break
+
+                t, id, histogram = item
+                if is_csv:
+                    p = histogram.percentiles()
+                    f.write( "%.6f\t%s\t%d\t%d\t%d\t%d\t%d\n" % (t, id, p[ "count"], p[ "p50"], p[ "p99"], p[ "p99.9"], p[ "max"]))
+
+                else:
+                    idbytes = id.encode( "utf8")
+                    f.write( self._HEADER.pack( t, len( idbytes)) + idbytes + histogram.to_bytes())
+
+                f.flush()
+
+        return
+
+
+class SlackCollector:
+
+    """Cyclic GC nur im Leerlauf eines Zyklus.
+
+    Solange mindestens ein SlackCollector enabled ist, ist die automatische GC
+    abgeschaltet (gc.disable()). Der Task ruft nach seiner Nutzlast collect()
+    mit der Zeit bis zur nächsten Deadline auf. Ist nach gc.get_count() und
+    gc.get_threshold() eine Generation fällig, die auch die automatische GC
+    jetzt collecten würde, und passt ihre geschätzte Dauer in den Leerlauf,
+    wird sie collected. Die Schätzung je Generation ist ein langsam
+    abklingendes Maximum der gemessenen Pausen. Die für Generation 2 misst
+    enable() mit einem gc.collect(), also vor dem ersten Zyklus.
+
+    Passt eine fällige Collection \c force_factor Mal hintereinander nicht in den
+    Leerlauf, wird wenigstens Generation 0 collected, damit der Speicher nicht
+    unbegrenzt wächst. Generation 2 läuft also nur, wenn sie in den Leerlauf
+    passt; ist der Heap dafür zu groß, hilft gc.freeze() nach dem Setup
+    (SchedulingProfile( gc_freeze=True)).
+
+    \param  monitor
+        _CycletimeMonitor, in dessen gcpauses() die Dauer jeder Collection
+        landet.
+
+    \note
+        gc.disable() gilt für den ganzen Process. Threads, die keinen
+        SlackCollector haben, laufen also ebenfalls ohne automatische GC.
+    """
+
+    _lock = threading.Lock()
+    _num_enabled = 0
+    _was_enabled = True
+
+    def __init__( self, monitor=None, *, force_factor=8):
+        self.__monitor = monitor
+        self.__force_factor = force_factor
+
+        self.__estimates = [ 0, 0, 0]
+        self.__deferred = 0
+        self.__num_collections = [ 0, 0, 0]
+        self.__is_enabled = False
+        return
+
+    def collect( self, slack_ns) -> int:
+        """Fällige Generation collecten, wenn sie in \c slack_ns passt.
+
+        \returns    Die collectete Generation oder -1.
+        """
+        generation = self.generation_due()
+        if generation < 0:
+            return -1
+
+        if self.__estimates[ generation] > slack_ns:
+            self.__deferred += 1
+            if self.__deferred < self.__force_factor:
+                return -1
+
+            generation = 0
+
+        self.__deferred = 0
+
+        t = time.monotonic_ns()
+        gc.collect( generation)
+        dt = time.monotonic_ns() - t
+
+        estimate = self.__estimates[ generation]
+        self.__estimates[ generation] = max( dt, estimate - (estimate >> 4))
+        self.__num_collections[ generation] += 1
+        if self.__monitor is not None:
+            self.__monitor.gcpause_record( dt)
+
+        return generation
+
+    def disable( self):
+        """Automatische GC wieder einschalten, wenn das der letzte SlackCollector war und sie vorher an war.
+        """
+        if self.__is_enabled:
+            with self._lock:
+                SlackCollector._num_enabled -= 1
+                if SlackCollector._num_enabled == 0 and SlackCollector._was_enabled:
+                    gc.enable()
+
+            self.__is_enabled = False
+
+        return self
+
+    def enable( self):
+        """Automatische GC abschalten und die Dauer einer Collection der Generation 2 messen.
+        """
+        if not self.__is_enabled:
+            with self._lock:
+                if SlackCollector._num_enabled == 0:
+                    SlackCollector._was_enabled = gc.isenabled()
+                    gc.disable()
+
+                SlackCollector._num_enabled += 1
+
+            self.__is_enabled = True
+
+            t = time.monotonic_ns()
+            gc.collect()
+            self.__estimates[ 2] = max( self.__estimates[ 2], time.monotonic_ns() - t)
+
+        return self
+
+    def estimates( self):
+        """Geschätzte Dauer einer Collection je Generation in ns.
+        """
+        return tuple( self.__estimates)
+
+    def generation_due( self) -> int:
+        """Die Generation, die die automatische GC jetzt collecten würde, oder -1.
+        """
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        if thresholds[ 0] == 0 or counts[ 0] <= thresholds[ 0]:
+            return -1
+
+        for generation in (2, 1):
+            if counts[ generation] > thresholds[ generation]:
+                return generation
+
+        return 0
+
+    def num_collections( self):
+        """Anzahl der Collections je Generation.
+        """
+        return tuple( self.__num_collections)
+
+
 class _CycletimeMonitor(Object):
 
-    def __init__( self, id, cycletime, tolerance:float=0.10, cycletime_for_reporting:float=5.0, reporter:callable=print):
+    """Überwacht die effektive Zykluszeit und die Verspätung, mit der die Zyklen beginnen.
+
+    Beide werden in je einem LatencyHistogram gesammelt (cycletimes(),
+    lateness()), ebenso die Pausen der GC, wenn ein SlackCollector sie
+    meldet (gcpauses()). Ist ein \c exporter (SnapshotWriter) angegeben,
+    bekommt er bei jedem Report Snapshots der Histogramme.
+    """
+
+    def __init__( self, id, cycletime, tolerance:float=0.10, cycletime_for_reporting:float=5.0, reporter:callable=print, exporter=None):
         super().__init__( id=id)
 
         self.__cycletime = cycletime
@@ -95,14 +519,21 @@ class _CycletimeMonitor(Object):
         self.__num_calls = 0
 
         self.__stopwatch_usr = _Stopwatch()
+        self.__exporter = exporter
+        self.__cycletimes = LatencyHistogram()
+        self.__lateness = LatencyHistogram()
+        self.__gcpauses = LatencyHistogram()
         return
 
     def execute( self):
         """1-mal pro Zyklus ausführen!
         """
-        now = time.time()
+        now = time.monotonic()
 
         self.__cycletime_effective = (now - self.__then) if self.__then else self.__cycletime
+        if self.__then:
+            self.__cycletimes.record( int( self.__cycletime_effective*1000000000))
+
         self.__then = now
 
         self.__cycletime_effective_min = min( self.__cycletime_effective_min, self.__cycletime_effective)
@@ -129,11 +560,56 @@ class _CycletimeMonitor(Object):
 
                 self.__stopwatch_usr.reset_statistics()
 
+            for name, histogram in (("Cycle times", self.__cycletimes), ("Lateness of cycle starts", self.__lateness), ("GC pauses", self.__gcpauses)):
+                if histogram.count():
+                    s = "\t%s: p50 %.3f ms, p99 %.3f ms, p99.9 %.3f ms, max %.3f ms. " \
+                        % ( \
+                            name,
+                            histogram.percentile( 50)/1000000,
+                            histogram.percentile( 99)/1000000,
+                            histogram.percentile( 99.9)/1000000,
+                            histogram.max()/1000000
+                        )
+                    self.__reporter( s)
+
+            if self.__exporter:
+                self.__exporter.write( self.__cycletimes.snapshot(), "%s.cycletimes" % self.id())
+                self.__exporter.write( self.__lateness.snapshot(), "%s.lateness" % self.id())
+                if self.__gcpauses.count():
+                    self.__exporter.write( self.__gcpauses.snapshot(), "%s.gcpauses" % self.id())
+
             self.__time_of_last_reporting = now
             self.__cycletime_effective_min = sys.maxsize
             self.__cycletime_effective_max = 0
 
         return
 
+    def cycletimes( self) -> LatencyHistogram:
+        """Histogramm der effektiven Zykluszeiten.
+        """
+        return self.__cycletimes
+
+    def gcpauses( self) -> LatencyHistogram:
+        """Histogramm der Pausen, die Collections im Leerlauf gekostet haben.
+        """
+        return self.__gcpauses
+
+    def gcpause_record( self, ns):
+        """Dauer einer Collection in ns.
+        """
+        self.__gcpauses.record( ns)
+        return
+
+    def lateness( self) -> LatencyHistogram:
+        """Histogramm der Verspätungen, mit denen die Zyklen beginnen.
+        """
+        return self.__lateness
+
+    def lateness_record( self, ns):
+        """Verspätung des Zyklusbeginns gegenüber seiner Deadline in ns, 1-mal pro Zyklus.
+        """
+        self.__lateness.record( ns)
+        return
+
     def stopwatch_user( self):
         return self.__stopwatch_usr
\ No newline at end of file
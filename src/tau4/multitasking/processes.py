@@ -34,18 +34,241 @@ import abc
 import logging; _Logger = logging.getLogger()
 import queue
 import multiprocessing as mp
+from multiprocessing import shared_memory
 import os
+import struct
+import threading
 import time
+import weakref
 
 from tau4 import Id, Object
 from tau4.datalogging import DefaultProcessLoggerConfiger
 from tau4.multitasking import _multitasking
+from tau4.multitasking.scheduling import SchedulingProfile
 from tau4.oop import overrides
 
 
+class ControlBlock:
+
+    """Shared Memory zwischen App (Parent) und CyclingProcess (Child).
+
+    Die App schreibt Kommandos (command_terminate()) und zählt die Messages,
+    die sie schickt (message_sent()). Das Child schreibt nach jedem Zyklus
+    Zykluszähler, effektive Zykluszeit und Heartbeat (publish()) und ab und zu
+    Snapshots seiner Histogramme (publish_histograms()): Zykluszeiten,
+    Verspätungen und GC-Pausen.
+
+    Für jedes Feld gibt es genau einen Schreiber. Die Felder des Childs sind
+    per Seqlock geschützt: Das Child zählt den Sequence Counter vor dem
+    Schreiben auf eine ungerade und danach auf eine gerade Zahl, die App liest
+    erneut, wenn der Counter ungerade ist oder sich während des Lesens geändert
+    hat. Niemand wird also blockiert und es gibt keine IPC-Roundtrips. Stirbt
+    das Child mitten im Schreiben, bleibt der Counter ungerade; die App gibt
+    nach _READ_RETRIES_MAX Versuchen auf und liefert den letzten konsistent
+    gelesenen Stand.
+
+    Owner des Shared Memory ist der Prozess, der den ControlBlock erzeugt, also
+    die App. CyclingProcess gibt es frei, sobald das Child gejoint ist; für
+    Processes, die nie gejoint werden, holt das ein Finalizer nach, wenn der
+    ControlBlock in der App abgeräumt wird oder die App sich beendet.
+    """
+
+    _CMD_TERMINATE = 1
+
+    _COMMAND = struct.Struct( "=I")
+    _MSGS = struct.Struct( "=Q")
+    _SEQ = struct.Struct( "=Q")
+    _TELEMETRY = struct.Struct( "=Qdq")
+                                        # cycles, cycletime_effective, heartbeat_ns
+    _OFFSET_COMMAND = 0
+    _OFFSET_MSGS = 8
+    _OFFSET_SEQ = 16
+    _OFFSET_TELEMETRY = 24
+    _OFFSET_HSEQ = 48
+    _OFFSET_HISTOGRAMS = 56
+
+    _READ_RETRIES_MAX = 100
+
+    def __init__( self):
+        self.__histogramsize = len( _multitasking.LatencyHistogram().to_bytes())
+        size = self._OFFSET_HISTOGRAMS + 3*self.__histogramsize
+        self.__shm = shared_memory.SharedMemory( create=True, size=size)
+        self.__shm.buf[ :size] = bytes( size)
+        self.__finalizer = weakref.finalize( self, self._Unlink_, self.__shm, os.getpid())
+                                        # Nur der Owner gibt das Shared Memory frei.
+
+        self.__msgs_lock = threading.Lock()
+        self.__seq = 0
+        self.__hseq = 0
+
+        self.__telemetry = self._TELEMETRY.unpack_from( self.__shm.buf, self._OFFSET_TELEMETRY)
+        self.__histogramdata = bytearray( 3*self.__histogramsize)
+                                        # Zuletzt konsistent gelesen.
+        return
+
+    def __getstate__( self):
+        state = self.__dict__.copy()
+        del state[ "_ControlBlock__msgs_lock"]
+        state[ "_ControlBlock__finalizer"] = None
+                                        # Der Finalizer gehört zum Owner.
+        return state
+
+    def __setstate__( self, state):
+        self.__dict__.update( state)
+        self.__msgs_lock = threading.Lock()
+        return
+
+    @staticmethod
+    def _Unlink_( shm, pid):
+        if os.getpid() != pid:
+            return
+                                        # Geforkte Kopie des ControlBlock: Nicht Owner.
+        shm.close()
+        try:
+            shm.unlink()
+
+        except FileNotFoundError:
+            pass
+
+        return
+
+    def close( self):
+        """Shared Memory schließen, auszuführen von allen Prozessen, die den ControlBlock verwenden.
+        """
+        self.__shm.close()
+        return self
+
+    def unlink( self):
+        """Shared Memory freigeben, auszuführen vom Owner.
+
+        Schließt das Shared Memory im Owner. Wiederholte Aufrufe und Aufrufe
+        aus anderen Prozessen tun nichts.
+        """
+        if self.__finalizer is not None:
+            self.__finalizer()
+
+        return self
+
+    def name( self):
+        """Name des Shared Memory.
+        """
+        return self.__shm.name
+
+    ### App
+    #
+    def command_terminate( self):
+        self._COMMAND.pack_into( self.__shm.buf, self._OFFSET_COMMAND, self._CMD_TERMINATE)
+        return self
+
+    def message_sent( self):
+        """Eine Message ist in die Queue zum Child gestellt worden.
+        """
+        with self.__msgs_lock:
+            buf = self.__shm.buf
+            self._MSGS.pack_into( buf, self._OFFSET_MSGS, self._MSGS.unpack_from( buf, self._OFFSET_MSGS)[ 0] + 1)
+
+        return self
+
+    def gcpauses( self):
+        """GC-Pausen als LatencyHistogram, Stand des letzten publish_histograms().
+        """
+        return self._histograms_read_( 2, 1)[ 0]
+
+    def histograms( self):
+        """(cycletimes, lateness) als LatencyHistograms, Stand des letzten publish_histograms().
+        """
+        return self._histograms_read_( 0, 2)
+
+    def _histograms_read_( self, first, count):
+        buf = self.__shm.buf
+        beg = first*self.__histogramsize
+        end = beg + count*self.__histogramsize
+        for _ in range( self._READ_RETRIES_MAX):
+            seq = self._SEQ.unpack_from( buf, self._OFFSET_HSEQ)[ 0]
+            if not seq & 1:
+                data = bytes( buf[ self._OFFSET_HISTOGRAMS + beg:self._OFFSET_HISTOGRAMS + end])
+                if seq == self._SEQ.unpack_from( buf, self._OFFSET_HSEQ)[ 0]:
+                    self.__histogramdata[ beg:end] = data
+                    break
+
+            time.sleep( 0)
+
+        else:
+            _Logger.warning( "%s: Child doesn't finish writing histograms, returning the last consistent ones. ", self.__class__.__name__)
+            data = bytes( self.__histogramdata[ beg:end])
+
+        histograms = []
+        offset = 0
+        for _ in range( count):
+            histogram, offset = _multitasking.LatencyHistogram.FromBytes( data, offset)
+            histograms.append( histogram)
+
+        return tuple( histograms)
+
+    def telemetry( self):
+        """(cycles, cycletime_effective, heartbeat_ns) des Childs.
+
+        heartbeat_ns ist time.monotonic_ns() am Ende des letzten Zyklus.
+        """
+        buf = self.__shm.buf
+        for _ in range( self._READ_RETRIES_MAX):
+            seq = self._SEQ.unpack_from( buf, self._OFFSET_SEQ)[ 0]
+            if not seq & 1:
+                telemetry = self._TELEMETRY.unpack_from( buf, self._OFFSET_TELEMETRY)
+                if seq == self._SEQ.unpack_from( buf, self._OFFSET_SEQ)[ 0]:
+                    self.__telemetry = telemetry
+                    return telemetry
+
+            time.sleep( 0)
+
+        _Logger.warning( "%s: Child doesn't finish writing telemetry, returning the last consistent one. ", self.__class__.__name__)
+        return self.__telemetry
+
+    ### Child
+    #
+    def command( self):
+        return self._COMMAND.unpack_from( self.__shm.buf, self._OFFSET_COMMAND)[ 0]
+
+    def messages_sent( self):
+        return self._MSGS.unpack_from( self.__shm.buf, self._OFFSET_MSGS)[ 0]
+
+    def publish( self, cycles, cycletime_effective, heartbeat_ns):
+        buf = self.__shm.buf
+        self.__seq += 1
+        self._SEQ.pack_into( buf, self._OFFSET_SEQ, self.__seq)
+        self._TELEMETRY.pack_into( buf, self._OFFSET_TELEMETRY, cycles, cycletime_effective, heartbeat_ns)
+        self.__seq += 1
+        self._SEQ.pack_into( buf, self._OFFSET_SEQ, self.__seq)
+        return
+
+    def publish_histograms( self, cycletimes, lateness, gcpauses):
+        buf = self.__shm.buf
+        data = cycletimes.to_bytes() + lateness.to_bytes() + gcpauses.to_bytes()
+        self.__hseq += 1
+        self._SEQ.pack_into( buf, self._OFFSET_HSEQ, self.__hseq)
+        buf[ self._OFFSET_HISTOGRAMS:self._OFFSET_HISTOGRAMS + len( data)] = data
+        self.__hseq += 1
+        self._SEQ.pack_into( buf, self._OFFSET_HSEQ, self.__hseq)
+        return
+
+
 class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
 
     """Bauplan für Prozesse.
+
+    Der Process beginnt seine Zyklen zu absoluten Deadlines auf
+    time.monotonic_ns(), verpasste Zyklen entfallen. Kommandos und Telemetrie
+    laufen über einen ControlBlock im Shared Memory (controlblock()): Der
+    Process sieht dort nach, ob ein Shutdown angefordert ist und ob Messages
+    anstehen, und liest die Queue nur dann. Die App liest Zykluszähler,
+    effektive Zykluszeit und Histogramme ohne Message an den Process.
+
+    Ein SchedulingProfile (\c schedprofile) wendet der Process nach setup()
+    und os.nice( prio) auf sich an.
+
+    Mit \c gc_in_slack=True läuft der Process ohne automatische GC, ein
+    SlackCollector collectet nach der Nutzlast, wenn bis zur nächsten Deadline
+    genug Zeit ist. Die Pausen stehen im ControlBlock (gcpauses()).
     """
 
     class Priority:
@@ -59,12 +282,14 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
         _PRIO_HIGHEST = -20
 
 
-    def __init__( self, *, id, cycletime: float, prio=Priority._PRIO_NORMAL):
+    def __init__( self, *, id, cycletime: float, prio=Priority._PRIO_NORMAL, schedprofile: SchedulingProfile=None, gc_in_slack=False):
         super().__init__()
 
         self.__id = id
         self.__cycletime = cycletime
         self.__niceness = prio
+        self.__schedprofile = schedprofile
+        self.__gc_in_slack = gc_in_slack
 
         self.__q_from_app = mp.Queue()
         self.__q_to_app = mp.Queue()
@@ -74,8 +299,10 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
         self.__num_cycles = 0
         self.__num_cycletimeexceedings = 0
         self.__cycletimemonitor = _multitasking._CycletimeMonitor( id, cycletime)
+        self.__controlblock = ControlBlock()
 
         self.__start_syncly = False
+        self.__is_child = False
 
         self.daemon = True
         return
@@ -97,8 +324,26 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
     def cycletime( self):
         return self.__cycletime
 
+    def controlblock( self) -> ControlBlock:
+        return self.__controlblock
+
     def cycletime_effective( self):
-        return self.__cycletime_effective
+        """Effektive Zykluszeit.
+
+        In der App wird sie aus dem ControlBlock gelesen.
+        """
+        if self.__is_child:
+            return self.__cycletime_effective
+
+        return self.__controlblock.telemetry()[ 1]
+
+    def cycles( self):
+        """Anzahl bisher ausgeführter Zyklen.
+        """
+        if self.__is_child:
+            return self.__num_cycles
+
+        return self.__controlblock.telemetry()[ 0]
 
     def id( self):
         return self.__id
@@ -117,6 +362,7 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
             return self.__q_to_app.get()
 
         self.__q_from_app.put( ipm)
+        self.__controlblock.message_sent()
         return
 
     def message_nowait( self, ipm=None):
@@ -133,6 +379,11 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
         try:                return self.__q_from_app.get( block=timeout > 0, timeout=timeout)
         except queue.Empty: return None
 
+    def _message_pending_( self):
+        """Nachsehen im ControlBlock, ob eine Message in der Queue ist.
+        """
+        return self.__controlblock.messages_sent() > self.__num_messages
+
     def _message_to_app_( self, ipm):
         self.__q_to_app.put( ipm)
         return self
@@ -180,6 +431,9 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
     def run( self):
         from tau4 import ipc
 
+        self.__is_child = True
+        self.__num_messages = 0
+
         self.setup()
 
         if self.__start_syncly:
@@ -190,9 +444,19 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
         ipm = None
 
         os.nice( self.__niceness)
-
+        if self.__schedprofile is not None:
+            _Logger.info( "%s.%s(): Scheduling profile applied: %s. ", self.__class__.__name__, "run", self.__schedprofile.apply())
+
+        controlblock = self.__controlblock
+        monitor = self.__cycletimemonitor
+        gccollector = _multitasking.SlackCollector( monitor).enable() if self.__gc_in_slack else None
+        monotonic_ns = time.monotonic_ns
+        period = int( self.__cycletime*1000000000)
+        publish_every = max( 1, int( 0.1/self.__cycletime))
+                                        # Histogramme 10-mal pro Sekunde.
+        deadline = monotonic_ns()
         while True:
-            time_cyclestart = time.time()
+            time_cyclestart = monotonic_ns()
                                             # Startpunkt für die Berechnung der
                                             #   Cycletime.
             if self.__cycletime_effective > self.__cycletime * (1.0 + tolerance_cycletime_effective):
@@ -203,6 +467,9 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
             self.on_cyclebeg()
                                             # Ausführung von User-Code am Beginn
                                             #   eines Cycles.
+            if controlblock.command() & ControlBlock._CMD_TERMINATE:
+                break
+
             if ipm and ipm.is_instance_of( ipc.StandardInterProcessMessages.TerminationRequest):
                                             # Termination Request.
                                             #
@@ -224,22 +491,36 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
             self.on_cycleend()
                                             # Ausführung von User-Code am Ende
                                             #   eines Cycles.
-            timeout = self.__cycletime - (time.time() - time_cyclestart)
-            ipm = self._message_from_app_( timeout=timeout)
-                                            # Warten auf InterProcessMessage. Warten
-                                            #   nur, wenn timeout positiv ist,
-                                            #   s. _message_from_app_().
-            sleeptime = max( 0, self.__cycletime - (time.time() - time_cyclestart))
-            if sleeptime > self.__cycletime * tolerance_cycletime_effective:
-                                            # Weil time.sleep() nicht sehr genau
-                                            #   zu sein scheint: Wir gehen nur
-                                            #   schlafen, wenn sich's wirklich
-                                            #   rentiert.
-                time.sleep( sleeptime); print( "Going to sleep for %.f s. " % sleeptime)
-                                                # Warten, bis die Cycletime
-                                                #   vollständig abgelaufen ist.
-            self.__cycletime_effective = time.time() - time_cyclestart
+            if self.__num_cycles % publish_every == 0:
+                controlblock.publish_histograms( monitor.cycletimes(), monitor.lateness(), monitor.gcpauses())
+
+            deadline += period
+            now = monotonic_ns()
+            if deadline < now:
+                deadline += ((now - deadline)//period + 1)*period
+                                            # Verpasste Zyklen entfallen.
+            if gccollector is not None:
+                gccollector.collect( deadline - now)
+                now = monotonic_ns()
+
+            time.sleep( max( 0, deadline - now)/1000000000)
+            now = monotonic_ns()
+            monitor.lateness_record( now - deadline)
+
+            self.__cycletime_effective = (now - time_cyclestart)/1000000000
                                             # Effektive Cycletime.
+            controlblock.publish( self.__num_cycles, self.__cycletime_effective, now)
+
+            ipm = None
+            if self._message_pending_():
+                ipm = self.__q_from_app.get()
+                                            # Die Message ist unterwegs, kommt
+                                            #   also bestimmt.
+                self.__num_messages += 1
+
+        if gccollector is not None:
+            gccollector.disable()
+
         _Logger.critical( "%s.%s(): Exit now.\n", self.__class__.__name__, "run")
         return
 
@@ -247,14 +528,32 @@ class CyclingProcess(mp.Process, metaclass=abc.ABCMeta):
     def _run_( self, ipm):
         raise RuntimeError( "You must override tua4.multitasking.Process._run_()!")
 
+    def schedprofile( self) -> SchedulingProfile:
+        return self.__schedprofile
+
     def setup( self):
         """Ausführung von Code in run(), bevor die Methode in die while-Schleife eintritt; zu überschreiben in Sub Classes.
         """
         pass
 
+    def join( self, timeout=None):
+        """Auf das Ende des Process warten und danach den ControlBlock freigeben.
+        """
+        super().join( timeout)
+        if self.exitcode is not None:
+            self.__controlblock.unlink()
+
+        return
+
     def shutdown( self, syncly=False):
-        from tau4 import ipc
-        self.message( ipc.StandardInterProcessMessages.TerminationRequest())
+        """Process beenden.
+
+        \param  syncly  Warten, bis der Process beendet ist; join() gibt dann den
+                        ControlBlock frei. Ohne syncly gibt ihn das join() der
+                        App frei oder, wenn sie nie joint, der Finalizer des
+                        ControlBlock.
+        """
+        self.__controlblock.command_terminate()
 
         if syncly:
             self.join()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by F. Geiger, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""\package scheduling  Scheduling-Profile für CyclingThread und CyclingProcess.
+
+Synopsis:
+    Ein SchedulingProfile legt fest, auf welchen CPUs ein Control Task laufen
+    darf, mit welcher Scheduling Policy, ob sein Speicher gelockt wird und wie
+    der Garbage Collector sich verhält. Angewendet wird es vom Task selbst,
+    nach setup() und vor dem ersten Zyklus.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import logging; _Logger = logging.getLogger()
+import os
+
+
+class SchedulingProfile:
+
+    """Scheduling-Profil eines Control Tasks.
+
+    \param  cpus
+        CPUs, auf denen der Task laufen darf (os.sched_setaffinity()). None
+        lässt die Affinität, wie sie ist.
+
+    \param  policy
+        "other", "batch", "fifo" oder "rr" (os.sched_setscheduler()). Die
+        Real-Time Policies "fifo" und "rr" brauchen CAP_SYS_NICE bzw. ein
+        passendes RLIMIT_RTPRIO.
+
+    \param  rtprio
+        Priorität für "fifo" und "rr", 1 - 99.
+
+    \param  niceness
+        Absoluter Nice-Wert (os.setpriority()), None lässt ihn, wie er ist.
+
+    \param  mlock
+        Alle aktuellen und künftigen Pages des Processes im RAM locken
+        (mlockall( MCL_CURRENT | MCL_FUTURE) über ctypes), damit kein Zyklus
+        auf einen Page Fault wartet.
+
+    \param  gc_freeze
+        Alle Objekte, die bis zum Anwenden existieren, mit gc.freeze() in die
+        permanente Generation verschieben. Der GC besucht sie dann nicht mehr.
+
+    \param  gc_full
+        False setzt die Schwelle für Collections der Generation 2 so hoch,
+        dass sie nur noch durch einen expliziten gc.collect() stattfinden.
+
+    Schlägt ein Schritt fehl, weil das OS ihn nicht kennt oder nicht erlaubt,
+    wird das geloggt und mit dem nächsten weitergemacht; apply() liefert,
+    was geklappt hat.
+
+    \note
+        Affinität, Policy und Nice-Wert gelten für den aufrufenden Thread,
+        mlock und GC für den ganzen Process. Ein Profil mit mlock oder GC an
+        einem CyclingThread betrifft also alle Threads des Processes.
+
+    Usage:
+        \code{.py}
+            p = MyControl( 0.001, schedprofile=SchedulingProfile.Realtime( cpus={ 3}))
+            p.start()
+        \endcode
+    """
+
+    POLICIES = ("other", "batch", "fifo", "rr")
+
+    _GC_THRESHOLD_NEVER = 2**31 - 1
+
+    _MCL_CURRENT = 1
+    _MCL_FUTURE = 2
+
+    @classmethod
+    def Default( cls):
+        """Profil, das nichts ändert.
+        """
+        return cls()
+
+    @classmethod
+    def Isolated( cls, cpus):
+        """Eigene CPUs, GC ohne Collections der Generation 2 und eingefrorene Objekte aus setup().
+        """
+        return cls( cpus=cpus, gc_freeze=True, gc_full=False)
+
+    @classmethod
+    def Realtime( cls, cpus=None, rtprio=50):
+        """SCHED_FIFO, gelockter Speicher und GC wie Isolated().
+        """
+        return cls( cpus=cpus, policy="fifo", rtprio=rtprio, mlock=True, gc_freeze=True, gc_full=False)
+
+    def __init__( self, *, cpus=None, policy="other", rtprio=0, niceness=None, mlock=False, gc_freeze=False, gc_full=True):
+        if policy not in self.POLICIES:
+            raise ValueError( "Scheduling policy must be one of %s, not '%s'!" % (self.POLICIES, policy))
+
+        if policy in ("fifo", "rr") and not 1 <= rtprio <= 99:
+            raise ValueError( "Real-time priority must be in 1..99, not '%s'!" % rtprio)
+
+        self.__cpus = None if cpus is None else frozenset( cpus)
+        self.__policy = policy
+        self.__rtprio = rtprio if policy in ("fifo", "rr") else 0
+        self.__niceness = niceness
+        self.__mlock = mlock
+        self.__gc_freeze = gc_freeze
+        self.__gc_full = gc_full
+
+        self.__undo = []
+        return
+
+    def __repr__( self):
+        return "%s(cpus=%s, policy=%r, rtprio=%d, niceness=%s, mlock=%s, gc_freeze=%s, gc_full=%s)" \
+            % (self.__class__.__name__, None if self.__cpus is None else sorted( self.__cpus), self.__policy, self.__rtprio, self.__niceness, self.__mlock, self.__gc_freeze, self.__gc_full)
+
+    def apply( self) -> dict:
+        """Profil auf den aufrufenden Thread anwenden.
+
+        \returns    Dict Schritt -> "ok", "unsupported" oder Fehlermeldung.
+                    Schritte, die das Profil nicht verlangt, fehlen.
+        """
+        results = {}
+        if self.__cpus is not None:
+            results[ "affinity"] = self._step_( "affinity", self._affinity_apply_)
+
+        if self.__policy != "other":
+            results[ "policy"] = self._step_( "policy", self._policy_apply_)
+
+        if self.__niceness is not None:
+            results[ "niceness"] = self._step_( "niceness", self._niceness_apply_)
+
+        if self.__mlock:
+            results[ "mlock"] = self._step_( "mlock", self._mlock_apply_)
+
+        if not self.__gc_full:
+            threshold = gc.get_threshold()
+            gc.set_threshold( threshold[ 0], threshold[ 1], self._GC_THRESHOLD_NEVER)
+            self.__undo.append( lambda: gc.set_threshold( *threshold))
+            results[ "gc_full"] = "ok"
+
+        if self.__gc_freeze:
+            gc.freeze()
+            self.__undo.append( gc.unfreeze)
+            results[ "gc_freeze"] = "ok"
+
+        return results
+
+    def _step_( self, name, f):
+        try:
+            f()
+
+        except (AttributeError, NotImplementedError):
+            _Logger.warning( "%s: '%s' is not supported on this platform. ", self.__class__.__name__, name)
+            return "unsupported"
+
+        except OSError as e:
+            _Logger.warning( "%s: '%s' failed: '%s'. ", self.__class__.__name__, name, e)
+            return str( e)
+
+        return "ok"
+
+    def _affinity_apply_( self):
+        cpus = os.sched_getaffinity( 0)
+        os.sched_setaffinity( 0, self.__cpus)
+        self.__undo.append( lambda: os.sched_setaffinity( 0, cpus))
+        return
+
+    def _policy_apply_( self):
+        policy = os.sched_getscheduler( 0)
+        param = os.sched_getparam( 0)
+        os_policy = { "batch": os.SCHED_BATCH, "fifo": os.SCHED_FIFO, "rr": os.SCHED_RR}[ self.__policy]
+        os.sched_setscheduler( 0, os_policy, os.sched_param( self.__rtprio))
+        self.__undo.append( lambda: os.sched_setscheduler( 0, policy, param))
+        return
+
+    def _niceness_apply_( self):
+        niceness = os.getpriority( os.PRIO_PROCESS, 0)
+        os.setpriority( os.PRIO_PROCESS, 0, self.__niceness)
+        self.__undo.append( lambda: os.setpriority( os.PRIO_PROCESS, 0, niceness))
+        return
+
+    def _mlock_apply_( self):
+        libc = _libc()
+        if libc.mlockall( self._MCL_CURRENT | self._MCL_FUTURE) != 0:
+            errno = ctypes.get_errno()
+            raise OSError( errno, os.strerror( errno))
+
+        self.__undo.append( libc.munlockall)
+        return
+
+    def cpus( self):
+        return self.__cpus
+
+    def gc_freeze( self):
+        return self.__gc_freeze
+
+    def gc_full( self):
+        return self.__gc_full
+
+    def mlock( self):
+        return self.__mlock
+
+    def niceness( self):
+        return self.__niceness
+
+    def policy( self):
+        return self.__policy
+
+    def rtprio( self):
+        return self.__rtprio
+
+    def revert( self):
+        """Was apply() geändert hat, in umgekehrter Reihenfolge zurücknehmen.
+
+        Muss vom selben Thread aufgerufen werden wie apply().
+        """
+        while self.__undo:
+            try:
+                self.__undo.pop()()
+
+            except OSError as e:
+                _Logger.warning( "%s: Revert failed: '%s'. ", self.__class__.__name__, e)
+
+        return self
+
+
+_LIBC = None
+
+def _libc():
+    global _LIBC
+    if _LIBC is None:
+        name = ctypes.util.find_library( "c")
+        if name is None:
+            raise NotImplementedError( "No C library found!")
+
+        _LIBC = ctypes.CDLL( name, use_errno=True)
+
+    return _LIBC
@@ -20,6 +20,7 @@
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
 import abc
+import collections
 from queue import Empty, Full, Queue
 import threading
 import time
@@ -28,6 +29,7 @@ import time
 from tau4 import Object
 from tau4.data import pandora
 from tau4.multitasking import _multitasking
+from tau4.multitasking.scheduling import SchedulingProfile
 from tau4.oop import overrides, PublisherChannel, Singleton
 
 
@@ -43,18 +45,64 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
     :param  udata:
         User data.
 
+    :param  overrun:
+        Was passiert, wenn ein Zyklus seine Deadline verpasst hat:
+        -   "skip": Verpasste Zyklen entfallen, der nächste Zyklus beginnt
+            zur nächsten Deadline im Raster.
+        -   "catchup": Verpasste Zyklen werden ohne Pause nachgeholt, bis das
+            Raster wieder erreicht ist.
+        -   "stretch": Das Raster beginnt neu, der nächste Zyklus eine
+            Zykluszeit nach dem Ende des verspäteten.
+
+    :param  spin_us:
+        Die letzten \c spin_us Mikrosekunden vor einer Deadline wird nicht
+        geschlafen, sondern aktiv gewartet. Das kostet CPU, verringert aber den
+        Jitter, den das OS beim Aufwecken verursacht.
+
+    :param  schedprofile:
+        SchedulingProfile, das der Thread nach setup() auf sich anwendet und
+        am Ende von run() wieder zurücknimmt.
+
+    :param  gc_in_slack:
+        Automatische GC abschalten und stattdessen nach _run_() im Leerlauf
+        bis zur nächsten Deadline collecten (SlackCollector). Die Pausen
+        landen in cycletimemonitor().gcpauses(). Gilt für den ganzen Process,
+        solange der Thread läuft.
+
+    Start, Stop und Shutdown gehen über eine Mailbox mit einem einzigen Platz
+    (collections.deque( maxlen=1)) an den Thread, ein neuer Request ersetzt
+    also einen noch nicht abgeholten. Der Thread wartet auf seine Deadline
+    mit einem threading.Event, das die App nach dem Request setzt. Steht kein
+    Request an, kostet das Nachsehen ein Attribut.
+
+    Die Zyklen beginnen zu absoluten Deadlines auf time.monotonic_ns(). Die
+    Zykluszeit driftet also nicht und Sprünge der Uhrzeit haben keinen
+    Einfluss. Die Verspätung jedes Zyklusbeginns landet im Histogramm
+    cycletimemonitor().lateness().
+
     \warning
         Fügt die kreierte Instanz dem Singleton Threads hinzu.
 
     """
 
-    def __init__( self, *, id, cycletime, udata, is_daemon=True, startdelay=0):
+    OVERRUN_POLICIES = ("skip", "catchup", "stretch")
+
+    _WAKEUP_TIMEOUT_MIN = 0.002
+
+    def __init__( self, *, id, cycletime, udata, is_daemon=True, startdelay=0, overrun="skip", spin_us=0, schedprofile: SchedulingProfile=None, gc_in_slack=False):
+        if overrun not in self.OVERRUN_POLICIES:
+            raise ValueError( "Overrun policy must be one of %s, not '%s'!" % (self.OVERRUN_POLICIES, overrun))
+
         Object.__init__( self, id=id)
         threading.Thread.__init__( self, group=None, target=None, name=id, daemon=is_daemon)
 
         self.__cycletime = cycletime
         self.__udata = udata
         self.__startdelay = startdelay
+        self.__overrun = overrun
+        self.__spin_ns = int( spin_us*1000)
+        self.__schedprofile = schedprofile
+        self.__gc_in_slack = gc_in_slack
 
         self.__cycletime_effective = 0.0
         self.__is_super_started = False
@@ -66,9 +114,9 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
         self._STOP_REQUEST = 2
         self._SHUTDOWN_REQUEST = 3
 
-        self.__Q_ackn = Queue( 1)
         self.__Q_data = Queue( 1)
-        self.__Q_request = Queue( 1)
+        self.__mailbox = collections.deque( maxlen=1)
+        self.__wakeup = threading.Event()
 
         self._tau4p_on_START_REQUEST_ = PublisherChannel.Synch( self)
         self._tau4p_on_STOP_REQUEST_ = PublisherChannel.Synch( self)
@@ -85,8 +133,11 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
 
         return
 
-    def _ackn_to_app_( self):
-        return self.__Q_ackn.put( 42)
+    def _ackn_to_app_( self, ackn):
+        if ackn is not None:
+            ackn.set()
+
+        return
 
     def cycletime( self):
         return self.__cycletime
@@ -94,6 +145,20 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
     def cycletime_effective( self):
         return self.__cycletime_effective
 
+    def cycletimemonitor( self):
+        return self.__cycletimemonitor
+
+    def _deadline_on_overrun_( self, deadline, now, period):
+        """Deadline des nächsten Zyklus nach der Policy \c overrun, wenn \c deadline schon vorbei ist.
+        """
+        if self.__overrun == "skip":
+            return deadline + ((now - deadline)//period + 1)*period
+
+        if self.__overrun == "stretch":
+            return now
+
+        return deadline
+
     def _data_from_app_( self, timeout):
         try:
             return self.__Q_data.get( timeout=timeout)
@@ -151,18 +216,39 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
         """App sendet Request an Cycler.
         """
         with self.__lock:
-            self.__Q_request.put( (request, syncly))
+            ackn = threading.Event() if syncly else None
+            self.__mailbox.append( (request, ackn))
+            self.__wakeup.set()
             if syncly:
-                self.__Q_ackn.get()
+                ackn.wait()
 
         return
 
     def _request_from_app_( self, timeout):
+        """Auf einen Request warten, höchstens \c timeout Sekunden.
+
+        \returns    (request, ackn), (None, None), wenn kein Request ansteht.
+        """
+        if not self.__mailbox:
+            if timeout <= 0:
+                return (None, None)
+
+            if timeout < self._WAKEUP_TIMEOUT_MIN:
+                time.sleep( timeout)
+                if not self.__mailbox:
+                    return (None, None)
+                                        # Kurze Wartezeiten ohne Event: Ein
+                                        #   Request wird dann erst nach dem
+                                        #   Schlafen bearbeitet.
+            else:
+                self.__wakeup.wait( timeout)
+
+        self.__wakeup.clear()
         try:
-            return self.__Q_request.get( timeout=timeout)
+            return self.__mailbox.pop()
 
-        except Empty:
-            return (None, False)
+        except IndexError:
+            return (None, None)
 
     @abc.abstractmethod
     def _run_( self, *, udata):
@@ -172,61 +258,77 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
 
         self.setup()
 
-        dt_admin = 0
-#        dt_user = 0
-        dt_user = time.time()
+        if self.__schedprofile is not None:
+            self.__schedprofile.apply()
+
         is_running = False
+        is_shutdown = False
 
         time.sleep( abs( self.__startdelay))
 
+        gccollector = _multitasking.SlackCollector( self.__cycletimemonitor).enable() if self.__gc_in_slack else None
+
+        monotonic_ns = time.monotonic_ns
+        period = int( self.cycletime()*1000000000)
+        spin = self.__spin_ns
+        deadline = monotonic_ns() + period
         while True:
-            t_cyclestart = time.time()
+            t_cyclestart = monotonic_ns()
             self.on_cyclebeg()
             self._tau4p_on_cycle_beg_()
 
-            dt_user = time.time() - dt_user
-                                            # Solange haben wir auf den User
-                                            #   gewartet
-            timeout = self.cycletime() - (dt_admin + dt_user)
-            if timeout < 0:
-                self._tau4p_on_cycletime_underflow_( abs( timeout), idata=self.__udata)
-                timeout = 0
+            now = monotonic_ns()
+            if deadline < now:
+                self._tau4p_on_cycletime_underflow_( (now - deadline)/1000000000, idata=self.__udata)
+                deadline = self._deadline_on_overrun_( deadline, now, period)
 
-            request, is_ackn_requested = self._request_from_app_( timeout=timeout)
+            while True:
+                timeout = deadline - spin - monotonic_ns()
+                request, ackn = self._request_from_app_( timeout=timeout/1000000000)
                                                 # Auf   A p p   warten.
-            dt_admin = time.time()
-            if request == self._START_REQUEST:
-                if not is_running:
-                    self._tau4p_on_START_REQUEST_( idata=self.__udata)
-                    is_running = True
-                    if is_ackn_requested:
-                        self._ackn_to_app_()
-
-                else:
-                    self._tau4p_on_START_STOP_REQUEST_mismatch_()
-
-            elif request == self._STOP_REQUEST:
-                if is_running:
-                    self._tau4p_on_STOP_REQUEST_( idata=self.__udata)
+                if request is None:
+                    if timeout <= 0 or monotonic_ns() >= deadline - spin:
+                        break
+
+                    continue
+                                                # Aufgeweckt, aber der Request
+                                                #   ist schon abgeholt worden.
+
+                if request == self._START_REQUEST:
+                    if not is_running:
+                        self._tau4p_on_START_REQUEST_( idata=self.__udata)
+                        is_running = True
+                        self._ackn_to_app_( ackn)
+
+                    else:
+                        self._tau4p_on_START_STOP_REQUEST_mismatch_()
+
+                elif request == self._STOP_REQUEST:
+                    if is_running:
+                        self._tau4p_on_STOP_REQUEST_( idata=self.__udata)
+                        is_running = False
+                        self._ackn_to_app_( ackn)
+
+                    else:
+                        self._tau4p_on_START_STOP_REQUEST_mismatch_()
+
+                elif request == self._SHUTDOWN_REQUEST:
+                    self._tau4p_on_SHUTDOWN_REQUEST_( idata=self.__udata)
                     is_running = False
-                    if is_ackn_requested:
-                        self._ackn_to_app_()
-
-                else:
-                    self._tau4p_on_START_STOP_REQUEST_mismatch_()
+                    is_shutdown = True
+                    self._ackn_to_app_( ackn)
 
-            elif request == self._SHUTDOWN_REQUEST:
-                self._tau4p_on_SHUTDOWN_REQUEST_( idata=self.__udata)
-                is_running = False
-                if is_ackn_requested:
-                    self._ackn_to_app_()
+                    break
 
+            if is_shutdown:
                 break
 
-            dt_admin = time.time() - dt_admin
-                                            # Solange haben wir für das
-                                            #   Request Handling gebraucht
-            dt_user = time.time()
+            while monotonic_ns() < deadline:
+                pass
+                                                # Die letzten spin Nanosekunden.
+            self.__cycletimemonitor.lateness_record( monotonic_ns() - deadline)
+            deadline += period
+
             if is_running:
                 with self.__cycletimemonitor.stopwatch_user():
                     self._run_( udata=self.__udata)
@@ -234,14 +336,26 @@ class CyclingThread(Object, threading.Thread, metaclass=abc.ABCMeta):
             self.on_cycleend()
             self._tau4p_on_cycle_end_()
 
-#            dt_user = time.time() - dt_user
-#                                            # Solange haben wir auf den User
-#                                            #   gewartet
-            self.__cycletime_effective = time.time() - t_cyclestart
+            self.__cycletime_effective = (monotonic_ns() - t_cyclestart)/1000000000
+
+            if gccollector is not None:
+                gccollector.collect( deadline - spin - monotonic_ns())
+
+        if gccollector is not None:
+            gccollector.disable()
+
+        if self.__schedprofile is not None:
+            self.__schedprofile.revert()
+                                                # GC und mlock gelten für den
+                                                #   ganzen Process, sie dürfen
+                                                #   den Thread nicht überleben.
 
         Threads().remove( self)
         return
 
+    def schedprofile( self) -> SchedulingProfile:
+        return self.__schedprofile
+
     def setup( self):
         """Ausführung von Code in run(), bevor die Methode in die while-Schleife eintritt; zu überschreiben in Sub Classes.
         """
@@ -24,10 +24,13 @@ import logging; _Logger = logging.getLogger()
 
 
 import abc
+import collections
 import inspect
 
 import tau4
 import threading
+import time
+import weakref
 
 
 ### Decorators
@@ -92,6 +95,18 @@ class _PublisherChannel:
                                         #   den Wert 42 an alle Subscriber,
                                         #   die sich registriert haben.
 
+    Subscribers:
+        Die Subscriber liegen in einem Tuple, das nur bei Registrierung und
+        Deregistrierung neu gebaut wird (copy on write). Publishen iteriert
+        ohne Lock über dieses Tuple, ein Subscriber, der während des Publishens
+        (de)registriert wird, wirkt sich erst beim nächsten Publishen aus.
+        Duplikate werden über ein dict mit den ids der Subscriber (bei
+        gebundenen Methoden: ids von Objekt und Funktion) erkannt.
+
+        Mit subscriber_register( subscriber, weak=True) hält der Channel nur
+        eine schwache Referenz auf den Subscriber. Ist der Subscriber nicht mehr
+        vorhanden, wird er beim nächsten Publishen entfernt.
+
     History:
         2014-09-06:
             Created.
@@ -103,10 +118,49 @@ class _PublisherChannel:
 
     __metaclass__ = abc.ABCMeta
 
+    class _WeakSubscriber:
+
+        """Schwache Referenz auf einen Subscriber, die sich selbst wie der Subscriber aufrufen lässt.
+        """
+
+        __slots__ = ("_channel", "_key", "_ref")
+
+        def __init__( self, channel, key, subscriber):
+            self._channel = channel
+            self._key = key
+            self._ref = weakref.WeakMethod( subscriber) if inspect.ismethod( subscriber) else weakref.ref( subscriber)
+            return
+
+        def __call__( self, *args, **kwargs):
+            subscriber = self._ref()
+            if subscriber is None:
+                self._channel._subscriber_prune_( self)
+                return None
+
+            return subscriber( *args, **kwargs)
+
+        def is_alive( self):
+            return self._ref() is not None
+
+
+    @staticmethod
+    def _SubscriberKey( subscriber):
+        """Key eines Subscribers fürs dict der registrierten Subscriber.
+
+        Gebundene Methoden werden bei jedem Zugriff neu erzeugt, deshalb ist hier
+        nicht deren id, sondern die ids von Objekt und Funktion maßgeblich.
+        """
+        if inspect.ismethod( subscriber):
+            return (id( subscriber.__self__), id( subscriber.__func__))
+
+        return id( subscriber)
+
     def __init__( self, publisher):
         self.__publisher = publisher
 
-        self.__subscribers = []
+        self._subscribers = ()
+                                        # Wird nie verändert, sondern ersetzt.
+        self.__subscribers_by_key = {}
         self.__lock = threading.Lock()
         return
 
@@ -115,7 +169,7 @@ class _PublisherChannel:
         pass
 
     def __len__( self):
-        return len( self.__subscribers)
+        return len( self._subscribers)
 
     def client( self):
         """Same as ``parent()``: Returns hosting (= publishing) instance.
@@ -125,7 +179,7 @@ class _PublisherChannel:
     def is_empty( self):
         """Prüft, ob Handler auszuführen sind.
         """
-        return len( self.__subscribers) == 0
+        return len( self._subscribers) == 0
 
     @abc.abstractmethod
     def is_sync( self):
@@ -144,9 +198,19 @@ class _PublisherChannel:
         return self.__publisher
 
     def subscriber_count( self):
-        return len( self.__subscribers)
+        return len( self._subscribers)
+
+    def _subscriber_prune_( self, entry):
+        """Nicht mehr vorhandenen schwach referenzierten Subscriber entfernen.
+        """
+        with self.__lock:
+            if self.__subscribers_by_key.get( entry._key) is entry:
+                del self.__subscribers_by_key[ entry._key]
+                self._subscribers = tuple( s for s in self._subscribers if s is not entry)
+
+        return
 
-    def subscriber_register( self, subscriber):
+    def subscriber_register( self, subscriber, weak=False):
         """Neuen Subscriber hinzufügen.
 
         Parameters:
@@ -155,31 +219,43 @@ class _PublisherChannel:
                 Subscriber, das callable ist, d.s. Methode oder Objekte, die die
                 Methode __call__() implementieren!
 
+            weak:
+                Nur eine schwache Referenz auf den Subscriber halten.
+
         Raises:
             ValueError wenn der Subscriber bereits bekannt ist.
         """
+        key = self._SubscriberKey( subscriber)
         with self.__lock:
-            if self.__subscribers.count( subscriber):
-                raise ValueError( "Subscriber already registered!")
-
-            self.__subscribers.append( subscriber)
+            entry = self.__subscribers_by_key.get( key)
+            if entry is not None:
+                if not isinstance( entry, self._WeakSubscriber) or entry.is_alive():
+                    raise ValueError( "Subscriber already registered!")
+
+                self._subscribers = tuple( s for s in self._subscribers if s is not entry)
+                                        # Die id eines toten Subscribers ist
+                                        #   wiederverwendet worden.
+            entry = self._WeakSubscriber( self, key, subscriber) if weak else subscriber
+            self.__subscribers_by_key[ key] = entry
+            self._subscribers = self._subscribers + (entry,)
 
         return self
 
     def subscriber_is_registered( self, subscriber):
         """Subscriber schon registriert?
         """
-        with self.__lock:
-            return self.__subscribers.count( subscriber) > 0
+        return self._SubscriberKey( subscriber) in self.__subscribers_by_key
 
     def subscriber_un_register( self, subscriber):
         """Subscriber entfernen.
         """
+        key = self._SubscriberKey( subscriber)
         with self.__lock:
-            if not self.__subscribers.count( subscriber):
+            entry = self.__subscribers_by_key.pop( key, None)
+            if entry is None:
                 raise ValueError( "Subscriber not registered!")
 
-            self.__subscribers.remove( subscriber)
+            self._subscribers = tuple( s for s in self._subscribers if s is not entry)
 
         return self
 
@@ -187,18 +263,219 @@ class _PublisherChannel:
         """Alle Handler entfernen.
         """
         with self.__lock:
-            self.__subscribers[:] = []
+            self.__subscribers_by_key.clear()
+            self._subscribers = ()
 
         return self
 
     def subscribers( self, copy=True):
         """Liefert (Kopie der) Subscribers.
+
+        Ohne Kopie wird das Tuple selbst geliefert, das ja nicht verändert wird.
         """
         if copy:
-            with self.__lock:
-                return self.__subscribers[ :]
+            return list( self._subscribers)
+
+        return self._subscribers
+
+
+class AsyncDispatcher:
+
+    """Führt die Subscriber von PublisherChannel.Async-Instanzen in einem Pool von Worker-Threads aus.
 
-        return self.__subscribers
+    Parameters:
+        maxsize:
+            Maximale Anzahl Events in der Queue.
+
+        workers:
+            Anzahl Worker-Threads.
+
+        overflow:
+            Was passiert, wenn die Queue voll ist:
+            -   "drop_oldest": Das älteste Event wird verworfen.
+            -   "drop_newest": Das neue Event wird verworfen.
+            -   "block": Der Publisher wartet, bis wieder Platz ist.
+
+    Usage:
+        dispatcher = AsyncDispatcher( maxsize=100, workers=4, overflow="drop_oldest")
+        tau4pc = PublisherChannel.Async( self, dispatcher=dispatcher)
+
+        Ohne Angabe eines Dispatchers verwenden alle Async-Channels
+        AsyncDispatcher.Default().
+
+    Note:
+        Mit mehr als einem Worker ist die Reihenfolge, in der die Events eines
+        Channels ausgeliefert werden, nicht garantiert.
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    _Default = None
+    _DefaultLock = threading.Lock()
+
+    @classmethod
+    def Default( klass):
+        with klass._DefaultLock:
+            if klass._Default is None:
+                klass._Default = klass()
+
+            return klass._Default
+
+    def __init__( self, maxsize=1024, workers=1, overflow="drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError( "Overflow policy must be one of %s, not '%s'!" % (self.OVERFLOW_POLICIES, overflow))
+
+        self.__maxsize = maxsize
+        self.__overflow = overflow
+
+        self.__queue = collections.deque()
+        self.__lock = threading.Condition()
+        self.__num_busy = 0
+        self.__is_shutdown = False
+
+        self.__depth_max = 0
+        self.__dispatched = 0
+        self.__dropped = 0
+
+        self.__workers = []
+        for i in range( workers):
+            worker = threading.Thread( target=self._work_, name="AsyncDispatcher.%d" % i, daemon=True)
+            worker.start()
+            self.__workers.append( worker)
+
+        return
+
+    def _dispatch_( self, entry):
+        """Subscriber ausführen.
+
+        Returns:
+            Latenz, d.i. die Zeit, die das Event in der Queue verbracht hat.
+        """
+        channel, args, kwargs, t_enqueued = entry
+        latency = time.perf_counter() - t_enqueued
+        for subscriber in channel._subscribers:
+            try:
+                subscriber( channel, *args, **kwargs)
+
+            except Exception:
+                _Logger.exception( "AsyncDispatcher: Subscriber %s raised an exception!", subscriber)
+
+        return latency
+
+    def _enqueue_( self, channel, args, kwargs):
+        """Event in die Queue stellen bzw. mit dem noch wartenden Event des Channels zusammenfassen.
+        """
+        with self.__lock:
+            if self.__is_shutdown:
+                raise RuntimeError( "AsyncDispatcher has been shut down!")
+
+            entry = channel._pending
+            if entry is not None:
+                entry[ 1] = args
+                entry[ 2] = kwargs
+                channel._coalesced_()
+                return
+
+            queue = self.__queue
+            if len( queue) >= self.__maxsize:
+                if self.__overflow == "drop_newest":
+                    self.__dropped += 1
+                    channel._dropped_()
+                    return
+
+                if self.__overflow == "drop_oldest":
+                    entry = queue.popleft()
+                    if entry[ 0]._pending is entry:
+                        entry[ 0]._pending = None
+
+                    self.__dropped += 1
+                    entry[ 0]._dropped_()
+
+                else:
+                    while len( queue) >= self.__maxsize and not self.__is_shutdown:
+                        self.__lock.wait()
+
+                    if self.__is_shutdown:
+                        raise RuntimeError( "AsyncDispatcher has been shut down!")
+
+                    entry = channel._pending
+                    if entry is not None:
+                        entry[ 1] = args
+                        entry[ 2] = kwargs
+                        channel._coalesced_()
+                        return
+                                        # Ein anderer Publisher hat während
+                                        #   des Wartens eingereiht.
+
+            entry = [channel, args, kwargs, time.perf_counter()]
+            if channel.is_coalescing():
+                channel._pending = entry
+
+            queue.append( entry)
+            depth = len( queue)
+            if depth > self.__depth_max:
+                self.__depth_max = depth
+
+            channel._published_( depth)
+            self.__lock.notify_all()
+
+        return
+
+    def flush( self, timeout=None):
+        """Warten, bis alle Events ausgeliefert sind.
+
+        Returns:
+            False, wenn der Timeout abgelaufen ist.
+        """
+        with self.__lock:
+            return self.__lock.wait_for( lambda: not self.__queue and not self.__num_busy, timeout)
+
+    def shutdown( self, timeout=None):
+        """Worker beenden, nachdem sie die Queue abgearbeitet haben.
+        """
+        with self.__lock:
+            self.__is_shutdown = True
+            self.__lock.notify_all()
+
+        for worker in self.__workers:
+            worker.join( timeout)
+
+        return self
+
+    def stats( self):
+        with self.__lock:
+            return {"depth": len( self.__queue), "depth_max": self.__depth_max, "dispatched": self.__dispatched, "dropped": self.__dropped}
+
+    def _work_( self):
+        lock = self.__lock
+        queue = self.__queue
+        while True:
+            with lock:
+                while not queue and not self.__is_shutdown:
+                    lock.wait()
+
+                if not queue:
+                    return
+
+                entry = queue.popleft()
+                if entry[ 0]._pending is entry:
+                    entry[ 0]._pending = None
+                                        # Ab jetzt kommt ein neues Event
+                                        #   in die Queue.
+                self.__num_busy += 1
+                lock.notify_all()
+                                        # Blockierte Publisher.
+            latency = 0.0
+            try:
+                latency = self._dispatch_( entry)
+
+            finally:
+                with lock:
+                    self.__num_busy -= 1
+                    self.__dispatched += 1
+                    entry[ 0]._dispatched_( latency)
+                    lock.notify_all()
+                                        # flush()
 
 
 class PublisherChannel:
@@ -259,8 +536,7 @@ class PublisherChannel:
                             return
 
             """
-            ss = self.subscribers( copy=self.is_safe_mode())
-            for s in ss:
+            for s in self._subscribers:
                 s( self, *args, **kwargs)
 
             return self
@@ -286,6 +562,9 @@ class PublisherChannel:
 
         def is_safe_mode( self, arg=None):
             """Zugriff auf Subscribers über Zugriffsregelung per Lock?
+
+            Nur noch aus Kompatibilitätsgründen vorhanden: Publishen ist immer
+            sicher, weil das Tuple der Subscriber nie verändert wird.
             """
             if arg is None:
                 return self.__is_safe_mode
@@ -296,20 +575,49 @@ class PublisherChannel:
 
     class Async(_PublisherChannel):
 
-        """Siehe Base Class ``_Publisher``.
+        """Siehe Base Class ``_Publisher``, die Subscriber werden aber von einem AsyncDispatcher ausgeführt.
+
+        Parameters:
+            dispatcher:
+                AsyncDispatcher, default: AsyncDispatcher.Default().
+
+            coalesce:
+                Wenn True und das vorige Event dieses Channels noch in der Queue
+                wartet, ersetzt das neue Event dessen Argumente (latest value
+                wins), statt ein weiteres Event einzureihen.
 
         Note:
-            D214:
-                Work in progress: Kann noch nicht instanziert werden, weil die Implementierung
-                der __call__-Methode noch fehlt.
+            Der Aufruf kehrt sofort zurück. Die Subscriber bekommen wie bei Synch
+            den Channel und die Argumente des Aufrufs.
         """
 
-        def __init__( self, parent):
+        def __init__( self, parent, dispatcher=None, coalesce=True):
             _PublisherChannel.__init__( self, parent)
 
             self.__is_safe_mode = True
+            self.__dispatcher = dispatcher or AsyncDispatcher.Default()
+            self.__is_coalescing = coalesce
+
+            self._pending = None
+                                        # Event in der Queue, das noch mit
+                                        #   neuen Events zusammengefasst werden
+                                        #   kann, geschützt durch den Lock des
+                                        #   Dispatchers.
+            self.__published = 0
+            self.__coalesced = 0
+            self.__dropped = 0
+            self.__dispatched = 0
+            self.__depth_max = 0
+            self.__latency_sum = 0.0
+            self.__latency_max = 0.0
             return
 
+        def __call__( self, *args, **kwargs):
+            """Event an den Dispatcher übergeben.
+            """
+            self.__dispatcher._enqueue_( self, args, kwargs)
+            return self
+
         def __iadd__( self, subscriber):
             """'Syntactic sugar', führt einfach subscriber_register() aus.
             """
@@ -324,13 +632,55 @@ class PublisherChannel:
             self.subscriber_un_register( subscriber)
             return self
 
+        def _coalesced_( self):
+            self.__coalesced += 1
+
+        def _dispatched_( self, latency):
+            self.__dispatched += 1
+            self.__latency_sum += latency
+            if latency > self.__latency_max:
+                self.__latency_max = latency
+
+        def _dropped_( self):
+            self.__dropped += 1
+
+        def _published_( self, depth):
+            self.__published += 1
+            if depth > self.__depth_max:
+                self.__depth_max = depth
+
+        def dispatcher( self):
+            return self.__dispatcher
+
+        def is_coalescing( self):
+            return self.__is_coalescing
+
         def is_sync( self):
             """
             """
             return False
 
+        def stats( self):
+            """Metriken dieses Channels.
+
+            Die Latenz ist die Zeit vom Einreihen eines Events bis zum Beginn
+            seiner Auslieferung, depth_max die größte Queue-Tiefe beim Einreihen.
+            """
+            return {
+                "published": self.__published,
+                "coalesced": self.__coalesced,
+                "dropped": self.__dropped,
+                "dispatched": self.__dispatched,
+                "depth_max": self.__depth_max,
+                "latency_mean_us": self.__latency_sum/self.__dispatched*1e6 if self.__dispatched else 0.0,
+                "latency_max_us": self.__latency_max*1e6,
+            }
+
         def is_safe_mode( self, arg=None):
             """Zugriff auf Subscribers über Zugriffsregelung per Lock?
+
+            Nur noch aus Kompatibilitätsgründen vorhanden: Publishen ist immer
+            sicher, weil das Tuple der Subscriber nie verändert wird.
             """
             if arg is None:
                 return self.__is_safe_mode
@@ -352,6 +702,13 @@ class Singleton(type):
     The only(?) way to achieve this is metaclasses. In metaclass you can define
     what happens when you call its instances (which are also classes).
 
+    Once the instance exists, Klass() returns it without taking the lock
+    (double-checked locking): The lock is only needed for the construction.
+    The instance is also bound to the class attribute ``instance``, so hot
+    loops may use Klass.instance instead of Klass(), which doesn't even cost a
+    call. Klass.instance is None until Klass() has been called for the first
+    time. A class defining its own attribute ``instance`` keeps it.
+
     Usage:
         \
 
@@ -393,12 +750,17 @@ class Singleton(type):
                                         # Since we are already using __new__,
                                         #   we can also initialize the
                                         #   __instance__ attribute here.
+        namespace.setdefault( 'instance', None)
         return super( Singleton, klass).__new__( klass, name, bases, namespace)
 
     ### Define the __call__ method in metaclass where __new__() and __init__()
     #   are called manually and only once.
     #
     def __call__( klass, *args, **kwargs):
+        instance = klass.__instance__
+        if instance is not None:
+            return instance
+                                        # Fast path, no lock needed.
         klass.__lock__.acquire()
         try:
                                         # __instance__ is now always initialized,
@@ -407,6 +769,11 @@ class Singleton(type):
                 instance = klass.__new__( klass, *args, **kwargs)
                 instance.__init__( *args, **kwargs)
                 klass.__instance__ = instance
+                                        # Only now, i.e. fully initialized, the
+                                        #   instance is visible to the fast path.
+                if klass.__dict__.get( 'instance', False) is None:
+                    klass.instance = instance
+
         finally:
             klass.__lock__.release()
 
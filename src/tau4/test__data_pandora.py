@@ -20,6 +20,8 @@
 #   along with pandora. If not, see <http://www.gnu.org/licenses/>.
 
 
+import random
+import threading
 import time
 import unittest
 
@@ -27,6 +29,7 @@ from tau4.timing import Timer2
 
 from tau4.data import pandora
 from tau4.data import pandora as p
+from tau4.data.pandora import _pipelines
 
 
 class _TESTCASE__Box(unittest.TestCase):
@@ -310,6 +313,359 @@ class _TESTCASE__Plugin(unittest.TestCase):
 _Testsuite.addTest( unittest.makeSuite( _TESTCASE__Plugin))
 
 
+class _TESTCASE__BoxColumnar(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        p_f = p.BoxColumnar( value=0.0, id="columnar.f")
+        p_i = p.BoxColumnar( value=0, id="columnar.i")
+        p_b = p.BoxColumnar( value=False, id="columnar.b")
+
+        p_f.value( 42)
+        self.assertTrue( float is type( p_f.value()))
+        self.assertAlmostEqual( 42.0, p_f.value())
+
+        p_i.value( 42)
+        self.assertTrue( int is type( p_i.value()))
+        self.assertEqual( 42, p_i.value())
+
+        p_b.value( 1)
+        self.assertTrue( bool is type( p_b.value()))
+        self.assertTrue( p_b.value())
+
+        self.assertIs( p_f, p.Shelf().box( "columnar.f"))
+        self.assertRaises( TypeError, p.BoxColumnar, value="", id="columnar.s")
+        self.assertFalse( p.Shelf().box_exists( "columnar.s"))
+        self.assertRaises( NotImplementedError, p_f.plugin_append, p.plugins.Monitor( id="columnar.f.monitor"))
+
+        class _BoxColumnarRounding(p.BoxColumnar):
+
+            def _typecast_( self, arg):
+                return float( round( arg))
+
+        p_r = _BoxColumnarRounding( value=0.0, id="columnar.r")
+        self.assertEqual( 4.0, p_r.value( 4.2))
+        self.assertEqual( 4.0, p.Shelf().values_get( ("columnar.r",))[ 0])
+        self.assertRaises( ValueError, p_f.value, "fourtytwo")
+        self.assertAlmostEqual( 42.0, p_f.value())
+
+        for box in (p_f, p_i, p_b, p_r):
+            p.Shelf().box_remove( box)
+
+        return
+
+    def test__bulk( self):
+        """
+        """
+        print()
+
+        n = 3000
+        ids = tuple( "columnar.bulk.%d" % i for i in range( n))
+        boxes = [p.BoxColumnar( value=float( i), id=id) for i, id in enumerate( ids)]
+
+        values = p.Shelf().values_get( ids)
+        self.assertEqual( n, len( values))
+        self.assertAlmostEqual( n - 1, values[ -1])
+
+        p.Shelf().values_set( ids, values * 2)
+        for i, box in enumerate( boxes):
+            self.assertAlmostEqual( 2*i, box.value())
+
+        boxes[ 42].value( -1)
+        self.assertAlmostEqual( -1, p.Shelf().values_get( ids)[ 42])
+        self.assertAlmostEqual( 80, p.Shelf().values_get( list( ids[ 40:43]))[ 0])
+
+        p_i = p.BoxColumnar( value=0, id="columnar.bulk.int")
+        self.assertRaises( TypeError, p.Shelf().values_get, (ids[ 0], "columnar.bulk.int"))
+
+        ##  Freed slots are reused
+        #
+        slot = boxes[ 0].slot()
+        p.Shelf().box_remove( boxes[ 0])
+        p_new = p.BoxColumnar( value=4.2, id="columnar.bulk.new")
+        self.assertEqual( slot, p_new.slot())
+        self.assertAlmostEqual( 4.2, p_new.value())
+
+        ##  A removed box doesn't touch the slot, that now belongs to another box
+        #
+        self.assertIsNone( boxes[ 0].slot())
+        self.assertRaises( KeyError, boxes[ 0].value)
+        self.assertRaises( KeyError, boxes[ 0].value, 1.0)
+        self.assertAlmostEqual( 4.2, p_new.value())
+
+        for box in boxes[ 1:] + [p_i, p_new]:
+            p.Shelf().box_remove( box)
+
+        return
+
+    def test__performance( self):
+        """10k box reads and writes per cycle.
+        """
+        print()
+
+        n = 10000
+        ids = tuple( "columnar.perf.%d" % i for i in range( n))
+        boxes = [p.Box( value=0.0) for _ in range( n)]
+        boxesC = [p.BoxColumnar( value=0.0, id=id) for id in ids]
+
+        with Timer2( "Reading and writing %d Box'es" % n) as t:
+            for box in boxes:
+                box.value( box.value() + 1)
+
+        print( t.results())
+
+        with Timer2( "Reading and writing %d BoxColumnar's one by one" % n) as t:
+            for box in boxesC:
+                box.value( box.value() + 1)
+
+        print( t.results())
+
+        p.Shelf().values_get( ids)
+                                        # Slot indices are cached now.
+        with Timer2( "Reading and writing %d BoxColumnar's in bulk" % n) as t:
+            p.Shelf().values_set( ids, p.Shelf().values_get( ids) + 1)
+
+        print( t.results())
+
+        self.assertAlmostEqual( 2, boxesC[ -1].value())
+
+        for box in boxesC:
+            p.Shelf().box_remove( box)
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__BoxColumnar))
+
+
+class _TESTCASE__Pipeline(unittest.TestCase):
+
+    class _Recorder:
+
+        """Records the events published by the plugins.
+        """
+
+        def __init__( self):
+            self.events = []
+            return
+
+        def subscriber( self, name):
+            def _tau4s_on_event_( tau4pc):
+                self.events.append( (name, tau4pc.client().id(), tau4pc.client().value()))
+                return
+
+            return _tau4s_on_event_
+
+    def _plugins_( self, rng, recorder, prefix):
+        """Random chain of plugins, the same rng state creates the same chain.
+        """
+        plugins = []
+        for i in range( rng.randint( 0, 5)):
+            id = "%s.%d" % (prefix, i)
+            lo = rng.uniform( -50, 0)
+            hi = rng.uniform( 0, 50)
+            kind = rng.choice( ("mapper", "clipper", "guard", "monitor"))
+            if kind == "mapper":
+                plugin = p.plugins.Mapper4Numbers( id=id, x1=lo, y1=rng.uniform( -10, 10), x2=hi, y2=rng.uniform( -10, 10))
+
+            elif kind == "clipper":
+                plugin = p.plugins.Clipper4Numbers( id=id, bounds=(lo, hi))
+                plugin._on_data_clipped += recorder.subscriber( "clipped")
+                plugin._on_data_not_clipped += recorder.subscriber( "not clipped")
+
+            elif kind == "guard":
+                plugin = p.plugins.Guard4Numbers( id=id, bounds=(lo, hi))
+                plugin._on_data_out_of_bounds += recorder.subscriber( "out of bounds")
+                plugin._on_data_within_bounds += recorder.subscriber( "within bounds")
+
+            else:
+                plugin = p.plugins.Monitor( id=id)
+                plugin._on_data_changed += recorder.subscriber( "changed")
+
+            plugins.append( plugin)
+
+        return plugins
+
+    def test__compiled_equals_interpreted( self):
+        """Compiled and interpreted pipelines produce identical values and events.
+        """
+        print()
+
+        for seed in range( 200):
+            recorderC = self._Recorder()
+            recorderI = self._Recorder()
+            pluginsC = self._plugins_( random.Random( seed), recorderC, "pipeline")
+            pluginsI = self._plugins_( random.Random( seed), recorderI, "pipeline")
+
+            type_ = random.Random( seed).choice( (float, int))
+            box = p.Box( value=type_( 0), plugins=pluginsC)
+            pipelineI = _pipelines.interpreted( type_, pluginsI)
+
+            rng = random.Random( -seed)
+            for _ in range( 100):
+                value = rng.choice( (rng.uniform( -100, 100), rng.randint( -100, 100)))
+                valueC = box.value( value)
+                valueI = pipelineI( value)
+                self.assertEqual( type( valueI), type( valueC))
+                self.assertEqual( valueI, valueC)
+
+            self.assertEqual( recorderI.events, recorderC.events)
+
+        return
+
+    def test__recompiled( self):
+        """Appending and removing plugins recompiles the pipeline.
+        """
+        print()
+
+        box = p.Box( value=0.0)
+        self.assertAlmostEqual( 42, box.value( 42))
+
+        box.plugin_append( p.plugins.Clipper4Numbers( id="recompiled.clipper", bounds=(-1, 1)))
+        self.assertAlmostEqual( 1, box.value( 42))
+
+        box.plugin_remove( "recompiled.clipper")
+        self.assertAlmostEqual( 42, box.value( 42))
+        return
+
+    def test__id_not_injected( self):
+        """A plugin id containing a newline doesn't end up as code in the pipeline.
+        """
+        print()
+
+        box = p.Box( value=0.0)
+        box.plugin_append( p.plugins.Clipper4Numbers( id="injected.clipper\nvalue = 666.0", bounds=(-1, 1)))
+        self.assertAlmostEqual( 1, box.value( 42))
+        self.assertAlmostEqual( 0.5, box.value( 0.5))
+        box.plugin_remove( "injected.clipper\nvalue = 666.0")
+        return
+
+    def test__performance( self):
+        """ns/write for boxes carrying 0 to 5 plugins.
+        """
+        print()
+
+        def plugins( n):
+            plugins = [
+                p.plugins.Mapper4Numbers( id="perf.mapper", x1=0, y1=0, x2=1, y2=2),
+                p.plugins.Clipper4Numbers( id="perf.clipper", bounds=(-1, 1)),
+                p.plugins.Guard4Numbers( id="perf.guard", bounds=(-0.5, 0.5)),
+                p.plugins.Monitor( id="perf.monitor"),
+                p.plugins.Clipper4Numbers( id="perf.clipper2", bounds=(-0.75, 0.75)),
+            ]
+            return plugins[ :n]
+
+        n = 100000
+        values = [((i % 200) - 100)/100 for i in range( n)]
+        for count in range( 6):
+            pipelineI = _pipelines.interpreted( float, plugins( count))
+            pipelineC = _pipelines.compiled( float, plugins( count))
+
+            with Timer2() as tI:
+                for value in values:
+                    pipelineI( value)
+
+            with Timer2() as tC:
+                for value in values:
+                    pipelineC( value)
+
+            box = p.Box( value=0.0, plugins=plugins( count))
+            with Timer2() as tB:
+                for value in values:
+                    box.value( value)
+
+            print( "%d plugins: %4.0f ns/write interpreted, %4.0f ns/write compiled, %4.0f ns/write Box.value(). " % (count, 1000*tI.elapsed_us( n), 1000*tC.elapsed_us( n), 1000*tB.elapsed_us( n)))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__Pipeline))
+
+
+class _TESTCASE__PluginBinding(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        box = p.BoxClippingMonitored( value=0.0, bounds=(-1, 1), id="binding.simple")
+        clipper = box.clipper()
+        self.assertIs( clipper, p.Shelf().plugin( "binding.simple.Clipper4Numbers"))
+
+        stats = p.Shelf().stats()
+        self.assertIs( clipper, box.clipper())
+        self.assertEqual( stats[ "lookups"], p.Shelf().stats()[ "lookups"])
+        self.assertEqual( stats[ "hits"] + 1, p.Shelf().stats()[ "hits"])
+
+        ##  Replacing a plugin invalidates all bindings
+        #
+        clipper_new = p.plugins.Clipper4Numbers( id="binding.simple.Clipper4Numbers", bounds=(-2, 2))
+        generation = p.Shelf().stats()[ "generation"]
+        p.Shelf().plugin_replace( clipper_new)
+        self.assertEqual( generation + 1, p.Shelf().stats()[ "generation"])
+        self.assertIs( clipper_new, box.clipper())
+        self.assertEqual( 2, box.clipper().max())
+        self.assertEqual( 1.5, box.value( 1.5))
+                                        # Clipped by the new plugin.
+        self.assertEqual( 2, box.value( 5.0))
+        box.bounds( (-3, 3))
+        self.assertEqual( 2.5, box.value( 2.5))
+
+        self.assertRaises( KeyError, p.Shelf().plugin_replace, p.plugins.Monitor( id="binding.unknown"))
+
+        p.Shelf().box_remove( box)
+        return
+
+    def test__performance( self):
+        """8 threads hammering the same boxes, with and without plugin bindings.
+        """
+        print()
+
+        boxes = [p.BoxClippingMonitored( value=0.0, bounds=(-1, 1), id="binding.perf.%d" % i) for i in range( 10)]
+
+        def lookup():
+            for _ in range( n):
+                for box in boxes:
+                    p.Shelf().plugin( box.id() + ".Clipper4Numbers")
+                    p.Shelf().plugin( box.id() + ".Monitor")
+
+        def binding():
+            for _ in range( n):
+                for box in boxes:
+                    box.clipper()
+                    box.monitor()
+
+        n = 2000
+        for target in (lookup, binding):
+            threads = [threading.Thread( target=target) for _ in range( 8)]
+            stats = p.Shelf().stats()
+            with Timer2() as t:
+                for thread in threads:
+                    thread.start()
+
+                for thread in threads:
+                    thread.join()
+
+            accesses = 8*n*len( boxes)*2
+            print( "%-8s: %.3f us/access, lookups: %d, hits: %d. " % ( \
+                target.__name__, t.elapsed_us( accesses),
+                p.Shelf().stats()[ "lookups"] - stats[ "lookups"], p.Shelf().stats()[ "hits"] - stats[ "hits"]
+                )
+            )
+
+        for box in boxes:
+            p.Shelf().box_remove( box)
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__PluginBinding))
+
+
 class _TESTCASE__BoxServer(unittest.TestCase):
 
     def test( self):
@@ -21,6 +21,7 @@
 
 
 import tau4
+import threading
 import time
 import unittest
 
@@ -265,6 +266,106 @@ class _TESTCASE__Images(unittest.TestCase):
 _Testsuite = unittest.makeSuite( _TESTCASE__Images)
 
 
+class _TESTCASE__ImagesSeqlocked(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        images = Images( ("plc", "mmi", "rc", "any"), seqlock=True)
+
+        images[ "plc"].value_add( "value.1", 1.0)
+        images[ "plc"].value_add( "value.2", 2.0)
+        self.assertAlmostEqual( 1.0, images[ "plc"].value( "value.1"))
+        self.assertAlmostEqual( 1.0, images[ "plc"][ "mmi"].value( "value.1"))
+        self.assertAlmostEqual( 2.0, images[ "plc"][ "mmi"].value( "value.2"))
+
+        images[ "plc"].value( "value.1", 42.0)
+        self.assertAlmostEqual( 42.0, images[ "plc"].value( "value.1"))
+        self.assertAlmostEqual( 1.0, images[ "plc"][ "mmi"].value( "value.1"))
+
+        images[ "plc"].inboxes_to_outboxes()
+        self.assertAlmostEqual( 1.0, images[ "plc"][ "mmi"].value( "value.1"))
+        images[ "plc"][ "mmi"].inboxes_to_outboxes()
+        self.assertAlmostEqual( 42.0, images[ "plc"][ "mmi"].value( "value.1"))
+        self.assertAlmostEqual( 2.0, images[ "plc"][ "mmi"].value( "value.2"))
+        self.assertAlmostEqual( 1.0, images[ "plc"][ "rc"].value( "value.1"))
+
+        images[ "plc"].value( "value.1", 43.0)
+        images[ "plc"].inboxes_to_outboxes()
+        images[ "plc"].value( "value.1", 44.0)
+        images[ "plc"].inboxes_to_outboxes()
+        images[ "plc"][ "rc"].inboxes_to_outboxes()
+        self.assertAlmostEqual( 44.0, images[ "plc"][ "rc"].value( "value.1"))
+        self.assertEqual( 0, images[ "plc"][ "rc"].retries())
+        return
+
+    def test__performance( self):
+        """Publish and copy latency, reader retries; 1 writer, 1 to 8 readers.
+        """
+        print()
+
+        num_values = 100
+        duration = 0.5
+        for seqlock in (False, True):
+            for num_readers in (1, 2, 4, 8):
+                rids = ["cu.%d" % i for i in range( num_readers)]
+                images = Images( ["plc"] + rids, seqlock=seqlock)
+                for i in range( num_values):
+                    images[ "plc"].value_add( "value.%d" % i, 0.0)
+
+                is_running = True
+                results = {}
+
+                def writer():
+                    publishs = 0
+                    t0 = time.perf_counter()
+                    while is_running:
+                        publishs += 1
+                        for i in range( 0, num_values, 10):
+                            images[ "plc"].value( "value.%d" % i, float( publishs))
+
+                        images[ "plc"].value( "value.%d" % (num_values - 1), float( publishs))
+                        images[ "plc"].inboxes_to_outboxes()
+
+                    results[ "plc"] = (time.perf_counter() - t0, publishs)
+                    return
+
+                def reader( rid):
+                    image = images[ "plc"][ rid]
+                    reads = inconsistencies = 0
+                    t0 = time.perf_counter()
+                    while is_running:
+                        image.inboxes_to_outboxes()
+                        reads += 1
+                        inconsistencies += image.value( "value.0") != image.value( "value.%d" % (num_values - 1))
+
+                    results[ rid] = (time.perf_counter() - t0, reads, inconsistencies)
+                    return
+
+                threads = [threading.Thread( target=writer)] + [threading.Thread( target=reader, args=(rid,)) for rid in rids]
+                for thread in threads:
+                    thread.start()
+
+                time.sleep( duration)
+                is_running = False
+                for thread in threads:
+                    thread.join()
+
+                elapsed, publishs = results[ "plc"]
+                reads = sum( results[ rid][ 1] for rid in rids)
+                us_read = sum( results[ rid][ 0]*1e6/results[ rid][ 1] for rid in rids)/num_readers
+                retries = sum( images[ "plc"][ rid].retries() for rid in rids) if seqlock else 0
+                print( "%-7s, %d reader(s): %8.1f us/publish, %8.1f us/copy, %6.3f %% retries. " % ("seqlock" if seqlock else "rwlock", num_readers, elapsed*1e6/publishs, us_read, 100*retries/max( 1, reads)))
+                self.assertEqual( 0, sum( results[ rid][ 2] for rid in rids))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__ImagesSeqlocked))
+
+
 class _TESTCASE__(unittest.TestCase):
 
     def test( self):
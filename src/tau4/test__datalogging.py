@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+
+from tau4.datalogging import _EventLog, EventWriter, Journal, JournalReader
+
+
+class _EventLog4Test(_EventLog):
+
+    def __init__( self):
+        _EventLog.__init__( self, "log-for-test-events", EventWriter( io.StringIO()))
+        return
+
+
+class _EventLog4Benchmark(_EventLog):
+
+    def __init__( self):
+        _EventLog.__init__( self, "log-for-benchmark-events", EventWriter( io.StringIO()))
+        return
+
+
+class _TimedLock:
+
+    """RLock, das misst, wie lange es gehalten wird.
+    """
+
+    def __init__( self):
+        self.__lock = threading.RLock()
+        self.__local = threading.local()
+        self.holds = 0
+        self.hold_ns = 0
+        return
+
+    def __enter__( self):
+        self.__lock.acquire()
+        depth = getattr( self.__local, "depth", 0)
+        if not depth:
+            self.__local.t = time.perf_counter_ns()
+
+        self.__local.depth = depth + 1
+        return self
+
+    def __exit__( self, *args):
+        self.__local.depth -= 1
+        if not self.__local.depth:
+            self.hold_ns += time.perf_counter_ns() - self.__local.t
+            self.holds += 1
+
+        self.__lock.release()
+        return False
+
+
+class _TESTCASE__EventLog(unittest.TestCase):
+
+    def test__merged_view( self):
+        """
+        """
+        print()
+
+        log = _EventLog4Test().clear()
+        log.log_info( "i1").log_error( "e1").log_warning( "w1").log_info( "i2").log_error( "e2")
+
+        self.assertEqual( 5, log.num_events())
+        self.assertEqual( ["e2", "i2", "w1", "e1", "i1"], [log.event( i).reason_text() for i in range( 5)])
+        self.assertIsNone( log.event( 5))
+
+        seqs = [log.event( i).seq() for i in range( 5)]
+        self.assertEqual( sorted( seqs, reverse=True), seqs)
+
+        log.errors_off()
+        self.assertEqual( 3, log.num_events())
+        self.assertEqual( ["i2", "w1", "i1"], [log.event( i).reason_text() for i in range( 3)])
+
+        log.errors_on()
+        self.assertEqual( "e2", log.event( 0).reason_text())
+
+        log.clear()
+        for i in range( 200):
+            [log.log_error, log.log_info, log.log_warning][ i % 3]( str( i))
+
+        lazy = [log.event( i).reason_text() for i in range( 10)]
+        self.assertEqual( [str( i) for i in range( 199, 189, -1)], lazy)
+        self.assertEqual( "0", log.event( 199).reason_text())
+                                        # Baut die ganze Liste auf.
+        self.assertEqual( lazy, [log.event( i).reason_text() for i in range( 10)])
+
+        log.clear()
+        self.assertEqual( 0, log.num_events())
+        self.assertIsNone( log.event( 0))
+        return
+
+    def test__events_since( self):
+        """
+        """
+        print()
+
+        log = _EventLog4Test().clear()
+        log.log_info( "i1").log_warning( "w1")
+        seq = log.seq_last()
+        self.assertEqual( [], log.events_since( seq))
+
+        log.log_error( "e1").log_info( "i2").log_warning( "w2")
+        events = log.events_since( seq)
+        self.assertEqual( ["e1", "i2", "w2"], [event.reason_text() for event in events])
+        self.assertEqual( log.seq_last(), events[ -1].seq())
+
+        log.infos_off()
+        self.assertEqual( ["e1", "w2"], [event.reason_text() for event in log.events_since( seq)])
+        log.infos_on()
+        return
+
+    def test__writer( self):
+        """
+        """
+        print()
+
+        f = io.StringIO()
+        writer = EventWriter( f)
+        log = _EventLog4Test()
+        log.log_error( "Wasser in Laufwerk", "Laufwerk A:")
+        event = log.event( 0)
+        writer.write( event)
+        self.assertTrue( writer.flush( 5))
+        self.assertEqual( str( event) + "\n", f.getvalue())
+        return
+
+    def test__performance( self):
+        """4 Threads loggen 1e5 gemischte Events.
+        """
+        print()
+
+        log = _EventLog4Benchmark()
+        lock = _TimedLock()
+        log._EventLog__lock = lock
+
+        n = 100000
+        nthreads = 4
+        def work():
+            for i in range( n//nthreads):
+                if i % 3 == 0:
+                    log.log_error( "e")
+
+                elif i % 3 == 1:
+                    log.log_info( "i")
+
+                else:
+                    log.log_warning( "w")
+
+        threads = [threading.Thread( target=work) for _ in range( nthreads)]
+        t = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        dt = time.perf_counter() - t
+        holds, hold_ns = lock.holds, lock.hold_ns
+        print( "%d threads, %d events: %.3f us per event, lock held %.3f us per event. " % (nthreads, n, dt*1000000/n, hold_ns/1000/holds))
+
+        seq = log.seq_last()
+        self.assertEqual( n, seq)
+
+        t = time.perf_counter()
+        self.assertEqual( seq, log.event( 0).seq())
+        print( "%.3f ms for the first event( 0) after the burst (merge of %d events). " % ((time.perf_counter() - t)*1000, log.num_events()))
+
+        t = time.perf_counter()
+        log.log_info( "i")
+        self.assertEqual( 1, len( log.events_since( seq)))
+        print( "%.3f us for log_info() plus events_since(). " % ((time.perf_counter() - t)*1000000))
+
+        self.assertTrue( log.writer().flush( 30))
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__EventLog)
+
+
+_NRECORDS_SEEK = 10**6
+                                        # 10**7 für den vollen Benchmark,
+                                        #   braucht etwa 0.5 GB auf der Platte.
+
+class _TESTCASE__Journal(unittest.TestCase):
+
+    def setUp( self):
+        self.__tmpdir = tempfile.TemporaryDirectory()
+        self.dirpath = self.__tmpdir.name
+        return
+
+    def tearDown( self):
+        self.__tmpdir.cleanup()
+        return
+
+    def test__roundtrip_and_segments( self):
+        """
+        """
+        print()
+
+        with Journal( self.dirpath, segment_size=4096, index_every=8) as journal:
+            for i in range( 1000):
+                journal.append( 1000 + i, logging.ERROR, "Laufwerk A:", "Wässer %d" % i, reason_ident=i, source_ident=-1)
+
+            self.assertGreater( journal.stats()[ "segment"], 1)
+
+        with JournalReader( self.dirpath) as reader:
+            records = list( reader)
+            self.assertEqual( 1000, len( records))
+            self.assertEqual( (1999, logging.ERROR, 999, -1, "Laufwerk A:", "Wässer 999"), tuple( records[ -1]))
+
+            self.assertEqual( [1500 + i for i in range( 500)], [record.ts_ns for record in reader.seek( 1500)])
+            self.assertEqual( 1000, len( list( reader.seek( 0))))
+            self.assertEqual( [], list( reader.seek( 5000)))
+
+        with self.assertRaises( ValueError):
+            Journal( self.dirpath, segment_size=64).append( 0, 0, "", "x"*100)
+
+        return
+
+    def test__crash_mid_write( self):
+        """Ein halb geschriebener Record beendet das Segment, das Journal läuft im nächsten weiter.
+        """
+        print()
+
+        journal = Journal( self.dirpath, segment_size=65536)
+        for i in range( 100):
+            journal.append( i, logging.INFO, "src", "msg %d" % i)
+
+        journal.commit()
+        stats = journal.stats()
+        pathname = os.path.join( self.dirpath, "journal.%08d.seg" % stats[ "segment"])
+        with open( pathname, "r+b") as f:
+            f.seek( stats[ "offset"] - 5)
+            f.write( b"\xff")
+                                        # Letzten Record beschädigen.
+        journal.close()
+
+        with Journal( self.dirpath, segment_size=65536) as journal:
+            journal.append( 100, logging.INFO, "src", "after crash")
+
+        with JournalReader( self.dirpath) as reader:
+            messages = [record.message for record in reader]
+
+        self.assertEqual( ["msg %d" % i for i in range( 99)] + ["after crash"], messages)
+        return
+
+    def test__eventlog( self):
+        """
+        """
+        print()
+
+        log = _EventLog4Test().clear()
+        with Journal( self.dirpath) as journal:
+            log.journal_attach( journal)
+            log.log_info( "i1", "Quelle").log_error( "e1").log_warning( "w1")
+            log.journal_attach( None)
+
+        with JournalReader( self.dirpath) as reader:
+            records = list( reader)
+
+        self.assertEqual( [(logging.INFO, "Quelle", "i1"), (logging.ERROR, "n.a.", "e1"), (logging.WARNING, "n.a.", "w1")], [(r.level, r.source, r.message) for r in records])
+        self.assertEqual( int( log.event( 2).timestamp()*1000000000), records[ 0].ts_ns)
+
+        cwd = os.getcwd()
+        os.chdir( self.dirpath)
+        try:
+            log.store()
+            with open( log.id4usr() + ".txt", encoding="utf8") as f:
+                self.assertIn( "Reason: (0, 'e1')", f.read())
+
+        finally:
+            os.chdir( cwd)
+
+        return
+
+    def test__eventlog_order( self):
+        """Mehrere Threads loggen, das Journal hat die Events in seq-Reihenfolge.
+        """
+        print()
+
+        log = _EventLog4Test().clear()
+        def logging_( k):
+            for i in range( 500):
+                (log.log_info, log.log_warning, log.log_error)[ i % 3]( "%d.%d" % (k, i))
+
+        with Journal( self.dirpath) as journal:
+            log.journal_attach( journal)
+            threads = [threading.Thread( target=logging_, args=(k,)) for k in range( 4)]
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            log.journal_attach( None)
+
+        with JournalReader( self.dirpath) as reader:
+            messages = [record.message for record in reader]
+
+        self.assertEqual( [event.reason_text() for event in log.events_since( 0)], messages)
+        return
+
+    def test__performance( self):
+        """Anhängen im Dauerbetrieb, Seek über _NRECORDS_SEEK Records.
+        """
+        print()
+
+        n = _NRECORDS_SEEK
+        journal = Journal( self.dirpath, segment_size=64*1024*1024)
+        t = time.perf_counter()
+        for i in range( n):
+            journal.append( i*1000, logging.WARNING, "Laufwerk A:", "Wasser in Laufwerk")
+
+        journal.close()
+        dt = time.perf_counter() - t
+        stats = journal.stats()
+        print( "Journal: %d records, %.0f records/s, %d commits, %d fsyncs, %d segments. " % (n, n/dt, stats[ "commits"], stats[ "fsyncs"], stats[ "segment"] + 1))
+
+        with JournalReader( self.dirpath) as reader:
+            tss = [random.randrange( n)*1000 for _ in range( 1000)]
+            t = time.perf_counter()
+            for ts in tss:
+                record = next( reader.seek( ts))
+                self.assertEqual( ts, record.ts_ns)
+
+            dt = time.perf_counter() - t
+            print( "Seek over %d records: %.1f us per seek. " % (n, dt*1000000/len( tss)))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__Journal))
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
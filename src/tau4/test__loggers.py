@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import tempfile
+import time
+import unittest
+
+from tau4 import loggers
+
+
+class _TESTCASE__Pool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass( klass):
+        klass._cwd = os.getcwd()
+        klass._tmpdir = tempfile.TemporaryDirectory()
+        os.chdir( klass._tmpdir.name)
+                                        # Pool schreibt nach "./".
+        return
+
+    @classmethod
+    def tearDownClass( klass):
+        loggers.Pool().pipeline_off()
+        os.chdir( klass._cwd)
+        klass._tmpdir.cleanup()
+        return
+
+    def test__pipeline( self):
+        """
+        """
+        print()
+
+        pool = loggers.Pool()
+        logger = pool.logger( "test__pipeline")
+        pool.logginglevel_to_DEBUG( "test__pipeline")
+
+        pool.pipeline_on( batchsize=16)
+        self.assertTrue( pool.is_pipelining())
+        args = [1]
+        for i in range( 100):
+            logger.debug( "Zeile %d, %s. ", i, "Pipeline")
+
+        logger.info( "args: %s", args)
+        pool.pipeline_off()
+        self.assertFalse( pool.is_pipelining())
+        logger.debug( "Wieder synchron. ")
+
+        with open( "test__pipeline.log.csv", encoding="utf8") as f:
+            lines = f.read().splitlines()
+
+        self.assertIn( "Zeile 99, Pipeline. ", lines[ -3])
+        self.assertIn( "args: [1]", lines[ -2])
+        self.assertIn( "Wieder synchron. ", lines[ -1])
+        self.assertEqual( 103, len( lines))
+        return
+
+    def test__levelflags( self):
+        """
+        """
+        print()
+
+        pool = loggers.Pool()
+        pool.logger( "test__levelflags")
+        flags = pool.levelflags( "test__levelflags")
+        childflags = pool.levelflags( "test__levelflags.child")
+        self.assertIs( flags, pool.levelflags( "test__levelflags"))
+        self.assertFalse( flags.DEBUG)
+        self.assertTrue( flags.CRITICAL)
+
+        pool.logginglevel_to_DEBUG( "test__levelflags")
+        self.assertTrue( flags.DEBUG)
+        self.assertTrue( childflags.DEBUG)
+
+        pool.logginglevel_to_WARNING( "test__levelflags")
+        self.assertFalse( flags.INFO)
+        self.assertTrue( flags.WARNING)
+        return
+
+    def test__performance( self):
+        """1 kHz-Loop mit 10 debug()-Zeilen pro Zyklus, synchron und als Pipeline.
+        """
+        print()
+
+        pool = loggers.Pool()
+        logger = pool.logger( "test__performance")
+        flags = pool.levelflags( "test__performance")
+
+        def loop( guarded):
+            n = 500
+            t_busy = 0
+            t_next = time.perf_counter()
+            for cycle in range( n):
+                t = time.perf_counter()
+                for i in range( 10):
+                    if guarded:
+                        if flags.DEBUG:
+                            logger.debug( "Cycle %d, line %d: distance = %.3f m. ", cycle, i, 0.5)
+
+                    else:
+                        logger.debug( "Cycle %d, line %d: distance = %.3f m. ", cycle, i, 0.5)
+
+                t_busy += time.perf_counter() - t
+                t_next += 0.001
+                dt = t_next - time.perf_counter()
+                if dt > 0:
+                    time.sleep( dt)
+
+            return t_busy*1000000/n
+
+        for pipelining in (False, True):
+            if pipelining:
+                pool.pipeline_on()
+
+            for level in ("debug", "critical"):
+                pool.logginglevel_to( "test__performance", level)
+                us = loop( False)
+                us_guarded = loop( True)
+                print( "%s, level %s: %.1f us per cycle, %.1f us with level flags. " % ("Pipeline" if pipelining else "Synchronous", level.upper(), us, us_guarded))
+
+        pool.pipeline_off()
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__Pool)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
@@ -23,7 +23,11 @@
 from __future__ import division
 
 from math import *
-from tau4.mathe.linalg import V3D, T3D
+import numpy as np
+import random
+from tau4.mathe import linalg_py
+from tau4.mathe.linalg import V3D, T3D, T3Dnp, T3DBatch, V3DBatch
+from tau4.timing import Timer2
 import time
 import unittest
 
@@ -171,6 +175,238 @@ class _TESTCASE__T3D(unittest.TestCase):
 _Testsuite.addTest( unittest.makeSuite( _TESTCASE__T3D))
 
 
+class _TESTCASE__T3DBatch(unittest.TestCase):
+
+    def _Ts_( self, n):
+        random.seed( 42)
+        return [T3Dnp.FromEuler( *[random.uniform( -1000, 1000) for _ in range( 3)] + [random.uniform( -pi, pi) for _ in range( 3)]) for _ in range( n)]
+
+    def test__equivalence( self):
+        """Batch results equal those of T3Dnp.
+        """
+        print()
+
+        Ts = self._Ts_( 100)
+        Us = list( reversed( Ts))
+        TsB = T3DBatch.FromT3Ds( Ts)
+        UsB = T3DBatch.FromT3Ds( Us)
+        self.assertEqual( 100, len( TsB))
+
+        ### FromEuler
+        #
+        E = np.array( [T.euler() for T in Ts])
+        np.testing.assert_allclose( TsB.array(), T3DBatch.FromEuler( *E.T).array(), atol=1e-9)
+        np.testing.assert_allclose( E, TsB.euler(), atol=1e-9)
+        np.testing.assert_allclose( np.degrees( E[ :, 3:]), TsB.euler( deg=True)[ :, 3:], atol=1e-9)
+
+        ### Compose and invert
+        #
+        TUsB = TsB * UsB
+        for i, (T, U) in enumerate( zip( Ts, Us)):
+            np.testing.assert_allclose( (T*U).homogeneous(), TUsB[ i].homogeneous(), atol=1e-9)
+            np.testing.assert_allclose( T.inverted().homogeneous(), TsB.inverted()[ i].homogeneous(), atol=1e-9)
+
+        np.testing.assert_allclose( np.tile( np.eye( 4), (100, 1, 1)), (TsB*TsB.inverted()).array(), atol=1e-9)
+
+        ### Apply to points
+        #
+        Ps = [tuple( random.uniform( -100, 100) for _ in range( 3)) for _ in range( 100)]
+        PsB = V3DBatch.FromArray( Ps)
+        for T, P, Q in zip( Ts, Ps, (TsB*PsB).array()):
+            np.testing.assert_allclose( T*P, Q, atol=1e-9)
+
+        T = Ts[ 0]
+        for P, Q in zip( Ps, (T*PsB).array()):
+            np.testing.assert_allclose( T*P, Q, atol=1e-9)
+
+        np.testing.assert_allclose( (T*UsB).array(), (T3DBatch.FromT3Ds( [T]*100)*UsB).array(), atol=1e-9)
+        return
+
+    def test__T3D( self):
+        """Batches from T3D objects.
+        """
+        print()
+
+        T = T3D.FromEuler( 1000, 0, 0, radians( 90), 0, 0)
+        TB = T3DBatch.FromT3Ds( [T])
+        np.testing.assert_allclose( T.euler(), TB.euler()[ 0], atol=1e-9)
+
+        PB = TB * V3DBatch.FromV3Ds( [V3D( 1000, 0, 0)])
+        self.assertAlmostEqual( 1000, PB[ 0].x())
+        self.assertAlmostEqual( 1000, PB[ 0].y())
+        self.assertAlmostEqual( 1000*sqrt( 2), PB.mags()[ 0])
+        return
+
+    def test__performance( self):
+        """Transform 1e5 points with the per-object API and with the batch API.
+        """
+        print()
+
+        n = 100000
+        T = T3D.FromEuler( 100, 200, 300, 0.1, 0.2, 0.3)
+        Tnp = T3Dnp.FromEuler( 100, 200, 300, 0.1, 0.2, 0.3)
+        Ps = [V3D( i, 2*i, 3*i) for i in range( n)]
+        PsB = V3DBatch.FromV3Ds( Ps)
+
+        with Timer2() as t:
+            for P in Ps:
+                T*P
+
+        print( "T3D      * V3D     : %8.3f us/point. " % t.elapsed_us( n))
+
+        tuples = [P.xyz() for P in Ps]
+        with Timer2() as t:
+            for P in tuples:
+                Tnp*P
+
+        print( "T3Dnp    * tuple   : %8.3f us/point. " % t.elapsed_us( n))
+
+        with Timer2() as t:
+            QsB = Tnp*PsB
+
+        print( "T3Dnp    * V3DBatch: %8.3f us/point. " % t.elapsed_us( n))
+
+        TsB = T3DBatch.FromEuler( np.arange( n), 0, 0, np.linspace( -pi, pi, n))
+        with Timer2() as t:
+            TsB*PsB
+
+        print( "T3DBatch * V3DBatch: %8.3f us/point (one transform per point). " % t.elapsed_us( n))
+
+        np.testing.assert_allclose( (T*Ps[ -1]).xyz(), QsB.array()[ -1])
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__T3DBatch))
+
+
+class _TESTCASE__InPlace(unittest.TestCase):
+
+    """In-place arithmetic of linalg_py.Matrix3x3 and linalg_py.T3D.
+    """
+
+    def _eulers_( self, n):
+        random.seed( 42)
+        eulers = [(0, 0, 0, 0, 0, 0), (1, 2, 3, pi, 0, 0), (0, 0, 0, 0, pi/2, 0), (0, 0, 0, 0, -pi/2, 0)]
+        for _ in range( n - len( eulers)):
+            eulers.append( tuple( random.uniform( -1000, 1000) for _ in range( 3)) + tuple( random.uniform( -pi, pi) for _ in range( 3)))
+
+        return eulers
+
+    def _assertEqualT_( self, Tnp, T):
+        np.testing.assert_allclose( Tnp.homogeneous()[ :3, :3], np.reshape( T._R_().elems(), (3, 3)), atol=1e-9)
+        np.testing.assert_allclose( Tnp.homogeneous()[ :3, 3], T._P_().elems(), atol=1e-9)
+        return
+
+    def test__equivalence( self):
+        """Compose and invert against T3Dnp, with list and array backing, and all aliasings of out.
+        """
+        print()
+
+        eulers = self._eulers_( 200)
+        for typecode in (None, "d"):
+            for eA, eB in zip( eulers, reversed( eulers)):
+                TnpA, TnpB = T3Dnp.FromEuler( *eA), T3Dnp.FromEuler( *eB)
+                TnpAB = TnpA*TnpB
+                TnpAi = TnpA.inverted()
+
+                A, B = linalg_py.T3D.FromEuler( *eA, typecode=typecode), linalg_py.T3D.FromEuler( *eB, typecode=typecode)
+                self._assertEqualT_( TnpAB, A.mul_into( B, linalg_py.T3D.FromEuler( typecode=typecode)))
+                self._assertEqualT_( TnpAB, A.mul_into( B, A.clone()))
+                self._assertEqualT_( TnpAi, A.invert_into( linalg_py.T3D.FromEuler( typecode=typecode)))
+                self._assertEqualT_( TnpAi, A.inverted())
+                self._assertEqualT_( TnpA, A)
+                self._assertEqualT_( TnpB, B)
+                                        # Operands untouched.
+
+                A.mul_into( B, B)
+                self._assertEqualT_( TnpAB, B)
+                                        # out is other.
+                B = linalg_py.T3D.FromEuler( *eB, typecode=typecode)
+                A *= B
+                self._assertEqualT_( TnpAB, A)
+                                        # out is self.
+                A.invert_into( A)
+                self._assertEqualT_( TnpAB.inverted(), A)
+                self.assertAlmostEqual( TnpAB.inverted().a(), A.a())
+                                        # Euler cache must have been reset.
+
+                P = (eB[ 3], eB[ 4], eB[ 5])
+                PA = linalg_py.T3D.FromEuler( *eA, typecode=typecode).mul_into( linalg_py.p3D( *P, typecode=typecode), linalg_py.p3D())
+                np.testing.assert_allclose( TnpA*P, PA.elems(), atol=1e-9)
+
+        return
+
+    def test__Matrix3x3( self):
+        """Matrix3x3 in-place ops against numpy.
+        """
+        print()
+
+        random.seed( 42)
+        for typecode in (None, "d"):
+            for _ in range( 200):
+                a = [random.uniform( -10, 10) for _ in range( 9)]
+                b = [random.uniform( -10, 10) for _ in range( 9)]
+                A = linalg_py.Matrix3x3( a[ :3], a[ 3:6], a[ 6:], typecode=typecode)
+                B = linalg_py.Matrix3x3( b[ :3], b[ 3:6], b[ 6:], typecode=typecode)
+                nA, nB = np.reshape( a, (3, 3)), np.reshape( b, (3, 3))
+
+                np.testing.assert_allclose( nA @ nB, np.reshape( A.mul_into( B, linalg_py.Matrix3x3()).elems(), (3, 3)), atol=1e-9)
+                np.testing.assert_allclose( nA @ nB, np.reshape( (A*B).elems(), (3, 3)), atol=1e-9)
+                np.testing.assert_allclose( np.linalg.inv( nA), np.reshape( A.inverted().elems(), (3, 3)), rtol=1e-6, atol=1e-9)
+                self.assertAlmostEqual( np.linalg.det( nA), A.determinant(), places=6)
+                np.testing.assert_allclose( nA.T, np.reshape( A.transpose_into( linalg_py.Matrix3x3()).elems(), (3, 3)))
+
+                A *= B
+                np.testing.assert_allclose( nA @ nB, np.reshape( A.elems(), (3, 3)), atol=1e-9)
+                A.invert_into( A)
+                np.testing.assert_allclose( np.linalg.inv( nA @ nB), np.reshape( A.elems(), (3, 3)), rtol=1e-6, atol=1e-9)
+
+        self.assertRaises( ValueError, linalg_py.Matrix3x3().inverted)
+        self.assertIsInstance( linalg_py.R3D( typecode="d").elems(), linalg_py.array)
+        return
+
+    def test__performance( self):
+        """1e6 compose and invert operations, allocating vs. in place.
+        """
+        print()
+
+        n = 1000000
+        for typecode in (None, "d"):
+            A = linalg_py.T3D.FromEuler( 1, 2, 3, 0.1, 0.2, 0.3, typecode=typecode)
+            B = linalg_py.T3D.FromEuler( 3, 2, 1, 0.3, 0.2, 0.1, typecode=typecode)
+            C = linalg_py.T3D.FromEuler( typecode=typecode)
+
+            m = n//10
+            with Timer2() as t:
+                for _ in range( m):
+                    A*B
+
+            print( "typecode=%-4s: A*B              : %6.3f us. " % (typecode, t.elapsed_us( m)))
+
+            with Timer2() as t:
+                for _ in range( m):
+                    A.inverted()
+
+            print( "typecode=%-4s: A.inverted()     : %6.3f us. " % (typecode, t.elapsed_us( m)))
+
+            with Timer2() as t:
+                for _ in range( n):
+                    A.mul_into( B, C)
+
+            print( "typecode=%-4s: A.mul_into( B, C): %6.3f us. " % (typecode, t.elapsed_us( n)))
+
+            with Timer2() as t:
+                for _ in range( n):
+                    A.invert_into( C)
+
+            print( "typecode=%-4s: A.invert_into( C): %6.3f us. " % (typecode, t.elapsed_us( n)))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__InPlace))
+
+
 class _TESTCASE__(unittest.TestCase):
 
     def test( self):
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import math
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from tau4.multitasking import CycletimeMonitor, LatencyHistogram, SlackCollector, SnapshotWriter
+
+
+def _exact_percentile_( values, p):
+    values = sorted( values)
+    return values[ max( 1, math.ceil( p/100*len( values))) - 1]
+
+
+class _TESTCASE__LatencyHistogram(unittest.TestCase):
+
+    def test__accuracy( self):
+        """Perzentile auf 1 % genau, verglichen mit den exakten.
+        """
+        print()
+
+        random.seed( 42)
+        values = [int( random.lognormvariate( math.log( 1000000), 1.0)) for _ in range( 100000)]
+                                        # Um 1 ms, mit langem Schwanz.
+        values += [random.randrange( 200) for _ in range( 1000)]
+        h = LatencyHistogram()
+        for value in values:
+            h.record( value)
+
+        self.assertEqual( len( values), h.count())
+        self.assertEqual( max( values), h.max())
+        self.assertEqual( min( values), h.min())
+        for p in (1, 10, 50, 90, 99, 99.9, 99.99, 100):
+            exact = _exact_percentile_( values, p)
+            self.assertAlmostEqual( exact, h.percentile( p), delta=max( 1, exact/100), msg="p%s" % p)
+
+        self.assertEqual( len( [v for v in values if v > 100]), h.count_above( 100))
+        threshold = 2000000
+        exceeds = h.exceeds( threshold)[ threshold]
+        exact = len( [v for v in values if v > threshold])
+        self.assertGreaterEqual( exceeds, exact)
+        self.assertLess( exceeds - exact, len( values)/100)
+
+        h.record( 2**40)
+        self.assertEqual( 2**40, h.max())
+        self.assertEqual( 2**40, h.percentile( 100))
+        return
+
+    def test__merge_and_snapshot( self):
+        """
+        """
+        print()
+
+        random.seed( 1)
+        a, b, ab = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for _ in range( 10000):
+            value = random.randrange( 10**7)
+            (a if random.random() < 0.5 else b).record( value)
+            ab.record( value)
+
+        snapshot = a.snapshot()
+        self.assertEqual( a, snapshot)
+        a.record( 5)
+        self.assertNotEqual( a, snapshot)
+
+        self.assertEqual( ab, snapshot.merge( b).merge( LatencyHistogram()))
+        self.assertEqual( ab, LatencyHistogram().merge( ab))
+
+        with self.assertRaises( ValueError):
+            ab.merge( LatencyHistogram( subbits=7))
+
+        ab.reset()
+        self.assertEqual( LatencyHistogram(), ab)
+        self.assertEqual( 0, ab.percentile( 50))
+        return
+
+    def test__export( self):
+        """
+        """
+        print()
+
+        h = LatencyHistogram()
+        for value in range( 0, 10**6, 1000):
+            h.record( value)
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            pathname = os.path.join( dirpath, "snapshots.bin")
+            writer = SnapshotWriter( pathname, "binary")
+            writer.write( h.snapshot(), "lateness")
+            writer.write( LatencyHistogram(), "empty")
+            writer.close()
+            snapshots = list( SnapshotWriter.Read( pathname))
+            self.assertEqual( ["lateness", "empty"], [id for _, id, _ in snapshots])
+            self.assertEqual( h, snapshots[ 0][ 2])
+            self.assertEqual( LatencyHistogram(), snapshots[ 1][ 2])
+
+            pathname = os.path.join( dirpath, "snapshots.csv")
+            writer = SnapshotWriter( pathname)
+            writer.write( h.snapshot(), "lateness")
+            writer.close()
+            with open( pathname) as f:
+                fields = f.read().split( "\t")
+
+            self.assertEqual( "lateness", fields[ 1])
+            self.assertEqual( h.count(), int( fields[ 2]))
+            self.assertEqual( h.max(), int( fields[ 6]))
+
+        with self.assertRaises( ValueError):
+            SnapshotWriter( "x", "xml")
+
+        return
+
+    def test__monitor( self):
+        """
+        """
+        print()
+
+        reports = []
+        monitor = CycletimeMonitor( "test__monitor", 0.001, cycletime_for_reporting=0.05, reporter=reports.append)
+        for _ in range( 100):
+            monitor.execute()
+            monitor.lateness_record( 1000)
+            time.sleep( 0.001)
+
+        self.assertEqual( 99, monitor.cycletimes().count())
+        self.assertEqual( 100, monitor.lateness().count())
+        self.assertGreaterEqual( monitor.cycletimes().percentile( 50), 1000000)
+        self.assertTrue( any( "p99.9" in report for report in reports))
+        return
+
+    def test__performance( self):
+        """record() muss unter 1 us kosten.
+        """
+        print()
+
+        h = LatencyHistogram()
+        random.seed( 2)
+        values = [int( random.lognormvariate( math.log( 100000), 2.0)) for _ in range( 100000)]
+        record = h.record
+        t = time.perf_counter()
+        for value in values:
+            record( value)
+
+        dt = time.perf_counter() - t
+        t = time.perf_counter()
+        for value in values:
+            pass
+
+        dt -= time.perf_counter() - t
+        us = dt*1000000/len( values)
+        print( "LatencyHistogram.record(): %.3f us. " % us)
+        self.assertLess( us, 1.0)
+
+        t = time.perf_counter()
+        p = h.percentiles()
+        print( "LatencyHistogram.percentiles(): %.3f ms. " % ((time.perf_counter() - t)*1000))
+        t = time.perf_counter()
+        h.snapshot()
+        print( "LatencyHistogram.snapshot(): %.3f us. " % ((time.perf_counter() - t)*1000000))
+        return
+
+
+class _TESTCASE__SlackCollector(unittest.TestCase):
+
+    def test__enable_disable( self):
+        """Die automatische GC ist aus, solange ein SlackCollector enabled ist.
+        """
+        print()
+
+        self.assertTrue( gc.isenabled())
+        a = SlackCollector().enable()
+        b = SlackCollector().enable()
+        self.assertFalse( gc.isenabled())
+        a.disable()
+        self.assertFalse( gc.isenabled())
+        b.disable().disable()
+        self.assertTrue( gc.isenabled())
+        return
+
+    def test__collect( self):
+        """
+        """
+        print()
+
+        monitor = CycletimeMonitor( "test__collect", 0.001, reporter=lambda s: None)
+        collector = SlackCollector( monitor, force_factor=4).enable()
+        try:
+            gc.collect()
+            self.assertEqual( -1, collector.generation_due())
+            self.assertEqual( -1, collector.collect( 10**9))
+
+            garbage = [[] for _ in range( gc.get_threshold()[ 0] + 1)]
+            self.assertEqual( 0, collector.generation_due())
+            self.assertEqual( 0, collector.collect( 10**9))
+            self.assertEqual( 1, monitor.gcpauses().count())
+            self.assertGreater( collector.estimates()[ 0], 0)
+
+            garbage += [[] for _ in range( gc.get_threshold()[ 0] + 1)]
+            for _ in range( 3):
+                self.assertEqual( -1, collector.collect( 0))
+                                        # Passt nicht in den Leerlauf.
+            self.assertEqual( 0, collector.collect( 0))
+                                        # Erzwungen.
+            self.assertEqual( (2, 0, 0), collector.num_collections())
+
+        finally:
+            collector.disable()
+
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__LatencyHistogram)
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__SlackCollector))
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import queue
+import time
+import unittest
+
+from tau4 import ipc
+from tau4.multitasking.processes import ControlBlock, CyclingProcess
+
+
+_Ids = itertools.count()
+
+
+class _EchoProcess(CyclingProcess):
+
+    def __init__( self, cycletime, **kwargs):
+        super().__init__( id="test__multitasking_processes._EchoProcess.%d" % next( _Ids), cycletime=cycletime, **kwargs)
+        return
+
+    def _run_( self, ipm):
+        if ipm is not None and ipm.is_instance_of( ipc.InterProcessMessage):
+            self._message_to_app_( ipm)
+
+        for i in range( 100):
+            node = { "i": i}
+            node[ "self"] = node
+
+        return
+
+
+class _CrashingProcess(_EchoProcess):
+
+    def _run_( self, ipm):
+        raise RuntimeError( "Crash!")
+
+
+def _cputime_( pid):
+    """CPU-Zeit eines Prozesses in s, nur unter Linux.
+    """
+    with open( "/proc/%d/stat" % pid) as f:
+        fields = f.read().rsplit( ")", 1)[ 1].split()
+
+    return (int( fields[ 11]) + int( fields[ 12]))/os.sysconf( "SC_CLK_TCK")
+
+
+class _TESTCASE__CyclingProcess(unittest.TestCase):
+
+    def test__controlblock( self):
+        """
+        """
+        print()
+
+        p = _EchoProcess( 0.002)
+        p.start( syncly=True)
+        time.sleep( 0.3)
+        cycles = p.cycles()
+        self.assertGreater( cycles, 50)
+        self.assertAlmostEqual( 0.002, p.cycletime_effective(), delta=0.002)
+        _, _, heartbeat_ns = p.controlblock().telemetry()
+        self.assertLess( time.monotonic_ns() - heartbeat_ns, 100000000)
+
+        p.message( ipc.InterProcessMessage( "echo"))
+        self.assertEqual( "echo", p.message().command())
+
+        p.message( ipc.StandardInterProcessMessages.EffectiveCycletimeRequest())
+        self.assertGreater( p.message().value(), 0)
+
+        cycletimes, lateness = p.controlblock().histograms()
+        self.assertGreater( cycletimes.count(), 0)
+        self.assertAlmostEqual( 2000000, cycletimes.percentile( 50), delta=1000000)
+        self.assertGreater( lateness.count(), 0)
+
+        p.shutdown( syncly=True)
+        self.assertEqual( 0, p.exitcode)
+        return
+
+    def test__controlblock_released( self):
+        """
+        """
+        print()
+
+        ### Default shutdown: join() releases the ControlBlock
+        #
+        p = _EchoProcess( 0.002)
+        p.start( syncly=True)
+        name = p.controlblock().name()
+        p.shutdown()
+        shared_memory.SharedMemory( name).close()
+                                        # Still there, the child may still read it.
+        p.join()
+        self.assertRaises( FileNotFoundError, shared_memory.SharedMemory, name)
+
+        ### Crashed child
+        #
+        p = _CrashingProcess( 0.002)
+        p.start()
+        name = p.controlblock().name()
+        p.join()
+        self.assertNotEqual( 0, p.exitcode)
+        self.assertRaises( FileNotFoundError, shared_memory.SharedMemory, name)
+
+        ### Never joined: The finalizer releases it
+        #
+        controlblock = ControlBlock()
+        name = controlblock.name()
+        del controlblock
+        gc.collect()
+        self.assertRaises( FileNotFoundError, shared_memory.SharedMemory, name)
+        return
+
+    def test__controlblock_child_died_while_writing( self):
+        """
+        """
+        print()
+
+        controlblock = ControlBlock()
+        controlblock.publish( 7, 0.001, 42)
+        self.assertEqual( (7, 0.001, 42), controlblock.telemetry())
+        shm = shared_memory.SharedMemory( controlblock.name())
+        ControlBlock._SEQ.pack_into( shm.buf, ControlBlock._OFFSET_SEQ, 3)
+        ControlBlock._SEQ.pack_into( shm.buf, ControlBlock._OFFSET_HSEQ, 1)
+                                        # Odd: Child is writing, forever.
+        self.assertEqual( (7, 0.001, 42), controlblock.telemetry())
+        cycletimes, lateness = controlblock.histograms()
+        self.assertEqual( 0, cycletimes.count())
+        shm.close()
+
+        controlblock.close().unlink()
+        return
+
+    def test__gc_in_slack( self):
+        """
+        """
+        print()
+
+        p = _EchoProcess( 0.002, gc_in_slack=True)
+        p.start( syncly=True)
+        time.sleep( 0.5)
+        gcpauses = p.controlblock().gcpauses()
+        p.shutdown( syncly=True)
+        self.assertGreater( gcpauses.count(), 0)
+        self.assertLess( gcpauses.percentile( 50), 2000000)
+        return
+
+    def test__performance_control_plane( self):
+        """Overhead pro Zyklus: Polling einer mp.Queue gegen Lesen des ControlBlock.
+        """
+        print()
+
+        n = 100000
+        q = mp.Queue()
+        t = time.perf_counter()
+        for _ in range( n):
+            try:
+                q.get( block=False)
+
+            except queue.Empty:
+                pass
+
+        dt_queue = time.perf_counter() - t
+
+        controlblock = ControlBlock()
+        t = time.perf_counter()
+        for i in range( n):
+            controlblock.command()
+            controlblock.messages_sent()
+            controlblock.publish( i, 0.001, i)
+
+        dt_controlblock = time.perf_counter() - t
+        controlblock.close().unlink()
+        print( "Per cycle: mp.Queue poll %.2f us, ControlBlock poll and publish %.2f us. " % (dt_queue*1000000/n, dt_controlblock*1000000/n))
+
+        if os.path.exists( "/proc/self/stat"):
+            p = _EchoProcess( 0.001)
+            p.start( syncly=True)
+            time.sleep( 0.2)
+            cpu, cycles = _cputime_( p.pid), p.cycles()
+            time.sleep( 2.0)
+            cpu, cycles = _cputime_( p.pid) - cpu, p.cycles() - cycles
+            p.shutdown( syncly=True)
+            print( "1 kHz process: %d cycles, %.1f us CPU per cycle. " % (cycles, cpu*1000000/cycles))
+
+        return
+
+    def test__performance_monitoring( self):
+        """App überwacht 16 Prozesse: ControlBlock gegen EffectiveCycletimeRequest.
+        """
+        print()
+
+        ps = [_EchoProcess( 0.010) for _ in range( 16)]
+        for p in ps:
+            p.start( syncly=True)
+
+        time.sleep( 0.2)
+
+        n = 1000
+        t = time.perf_counter()
+        for _ in range( n):
+            for p in ps:
+                p.cycletime_effective()
+
+        dt_controlblock = (time.perf_counter() - t)/n
+
+        t = time.perf_counter()
+        for p in ps:
+            p.controlblock().histograms()
+
+        dt_histograms = time.perf_counter() - t
+
+        n = 10
+        t = time.perf_counter()
+        for _ in range( n):
+            for p in ps:
+                p.message( ipc.StandardInterProcessMessages.EffectiveCycletimeRequest())
+                p.message()
+
+        dt_queue = (time.perf_counter() - t)/n
+
+        for p in ps:
+            p.shutdown( syncly=True)
+
+        print( "16 processes: %.1f us per sweep over ControlBlocks (%.1f ms incl. histograms), %.1f ms per sweep with EffectiveCycletimeRequest. " % (dt_controlblock*1000000, dt_histograms*1000, dt_queue*1000))
+        self.assertLess( dt_controlblock, dt_queue)
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__CyclingProcess)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import sys
+import threading
+import time
+import unittest
+
+from tau4.multitasking import LatencyHistogram, RWLock, RWLockPhaseFair, RWLockWritePreferring
+
+
+class _SharedRegion:
+
+    """Zählt, wer sich in der SR aufhält, und merkt sich Verletzungen des gegenseitigen Ausschlusses.
+    """
+
+    def __init__( self):
+        self.__lock = threading.Lock()
+        self.readers = 0
+        self.writers = 0
+        self.violations = []
+        return
+
+    def enter( self, is_writer):
+        with self.__lock:
+            if is_writer:
+                self.writers += 1
+                if self.writers != 1 or self.readers:
+                    self.violations.append( ("writer", self.readers, self.writers))
+
+            else:
+                self.readers += 1
+                if self.writers:
+                    self.violations.append( ("reader", self.readers, self.writers))
+
+        return
+
+    def leave( self, is_writer):
+        with self.__lock:
+            if is_writer:
+                self.writers -= 1
+
+            else:
+                self.readers -= 1
+
+        return
+
+
+def _workers_( lock, num_readers, num_writers, seconds, sr=None, writerwaits=None):
+    """Reader und Writer auf \c lock loslassen, Anzahl der Zugriffe liefern.
+    """
+    stop = threading.Event()
+    counts = [ 0]*(num_readers + num_writers)
+
+    def reader( i):
+        while not stop.is_set():
+            lock.acquire_readaccess()
+            if sr: sr.enter( False)
+            sum( range( 50))
+            if sr: sr.leave( False)
+            lock.release_readaccess()
+            counts[ i] += 1
+
+        return
+
+    def writer( i):
+        while not stop.is_set():
+            t = time.perf_counter_ns()
+            lock.acquire_writeaccess()
+            if writerwaits is not None:
+                writerwaits.record( time.perf_counter_ns() - t)
+
+            if sr: sr.enter( True)
+            sum( range( 50))
+            if sr: sr.leave( True)
+            lock.release_writeaccess()
+            counts[ i] += 1
+            time.sleep( 0)
+
+        return
+
+    threads = [ threading.Thread( target=reader, args=(i,)) for i in range( num_readers)]
+    threads += [ threading.Thread( target=writer, args=(num_readers + i,)) for i in range( num_writers)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep( seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return counts[ :num_readers], counts[ num_readers:]
+
+
+class _TESTCASE__RWLockPhaseFair(unittest.TestCase):
+
+    def setUp( self):
+        self.__switchinterval = sys.getswitchinterval()
+        sys.setswitchinterval( 0.00001)
+                                        # Möglichst viele Thread-Wechsel.
+        return
+
+    def tearDown( self):
+        sys.setswitchinterval( self.__switchinterval)
+        return
+
+    def test__mutual_exclusion( self):
+        """Stresstest, auch mit Timeouts.
+        """
+        print()
+
+        for lock in (RWLockPhaseFair(), RWLockPhaseFair( stats=True), RWLockWritePreferring(), RWLock()):
+            sr = _SharedRegion()
+            readercounts, writercounts = _workers_( lock, 8, 3, 0.5, sr)
+            self.assertEqual( [], sr.violations, lock.__class__.__name__)
+            self.assertGreater( min( readercounts), 0)
+            self.assertGreater( min( writercounts), 0)
+
+        lock = RWLockPhaseFair()
+        sr = _SharedRegion()
+        stop = threading.Event()
+
+        def impatient( is_writer):
+            random.seed()
+            while not stop.is_set():
+                access = lock.writeaccess if is_writer else lock.readaccess
+                try:
+                    with access( timeout=random.choice( ( 0, 0.00001, 0.0001))):
+                        sr.enter( is_writer)
+                        sum( range( 50))
+                        sr.leave( is_writer)
+
+                except TimeoutError:
+                    pass
+
+            return
+
+        threads = [ threading.Thread( target=impatient, args=(i % 3 == 0,)) for i in range( 9)]
+        for thread in threads:
+            thread.start()
+
+        time.sleep( 0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual( [], sr.violations)
+        self.assertTrue( lock.acquire_writeaccess( timeout=0))
+                                        # Nichts ist hängen geblieben.
+        lock.release_writeaccess()
+        return
+
+    def test__phase_fair( self):
+        """Reader, die auf einen Writer warten, kommen vor dem nächsten Writer dran.
+        """
+        print()
+
+        lock = RWLockPhaseFair()
+        order = []
+
+        def reader():
+            with lock.readaccess():
+                order.append( "r")
+                time.sleep( 0.05)
+
+            return
+
+        def writer():
+            with lock.writeaccess():
+                order.append( "w")
+
+            return
+
+        lock.acquire_writeaccess()
+        r = threading.Thread( target=reader)
+        r.start()
+        time.sleep( 0.02)
+        w = threading.Thread( target=writer)
+        w.start()
+        time.sleep( 0.02)
+        lock.release_writeaccess()
+        r.join()
+        w.join()
+        self.assertEqual( [ "r", "w"], order)
+
+        lock.acquire_readaccess()
+        w = threading.Thread( target=writer)
+        w.start()
+        time.sleep( 0.02)
+        r = threading.Thread( target=reader)
+        r.start()
+        time.sleep( 0.02)
+        self.assertEqual( [ "r", "w"], order)
+                                        # Der neue Reader wartet auf den Writer.
+        lock.release_readaccess()
+        w.join()
+        r.join()
+        self.assertEqual( [ "r", "w", "w", "r"], order)
+        return
+
+    def test__timeout_and_reentrancy( self):
+        """
+        """
+        print()
+
+        lock = RWLockPhaseFair()
+        with lock.writeaccess():
+            with self.assertRaises( RuntimeError):
+                lock.acquire_readaccess()
+
+            with self.assertRaises( RuntimeError):
+                lock.acquire_writeaccess()
+
+            t = threading.Thread( target=lambda: self.assertFalse( lock.acquire_readaccess( timeout=0.01)))
+            t.start()
+            t.join()
+
+        with lock.readaccess():
+            with self.assertRaises( RuntimeError):
+                lock.acquire_writeaccess()
+
+            errors = []
+
+            def writer():
+                try:
+                    with lock.writeaccess( timeout=0.01):
+                        pass
+
+                except TimeoutError as e:
+                    errors.append( e)
+
+                return
+
+            t = threading.Thread( target=writer)
+            t.start()
+            t.join()
+            self.assertEqual( 1, len( errors))
+
+        with self.assertRaises( RuntimeError):
+            lock.release_readaccess()
+
+        with self.assertRaises( RuntimeError):
+            lock.release_writeaccess()
+
+        self.assertTrue( lock.acquire_writeaccess( timeout=0))
+        lock.release_writeaccess()
+        return
+
+    def test__stats( self):
+        """
+        """
+        print()
+
+        self.assertIsNone( RWLockPhaseFair().stats())
+
+        lock = RWLockPhaseFair( stats=True)
+        with lock.readaccess():
+            pass
+
+        with lock.writeaccess():
+            t = threading.Thread( target=lambda: lock.acquire_readaccess( timeout=0.01))
+            t.start()
+            t.join()
+
+        stats = lock.stats()
+        self.assertEqual( 1, stats[ "reads"])
+        self.assertEqual( 1, stats[ "writes"])
+        self.assertEqual( 1, stats[ "timeouts"])
+        self.assertEqual( 1, stats[ "reads_contended"])
+        self.assertGreaterEqual( stats[ "reads_wait_ns"], 10000000)
+        self.assertEqual( 0, lock.stats_reset().stats()[ "reads"])
+        return
+
+    def test__write_preferring( self):
+        """Nach einem Writer kommen Reader wieder hinein.
+        """
+        print()
+
+        lock = RWLockWritePreferring()
+        lock.acquire_writeaccess()
+        lock.release_writeaccess()
+        t = threading.Thread( target=lambda: (lock.acquire_readaccess(), lock.release_readaccess()), daemon=True)
+        t.start()
+        t.join( 1)
+        self.assertFalse( t.is_alive())
+        return
+
+    def test__performance( self):
+        """Durchsatz und Wartezeit der Writer bei 1 - 16 Readern und 1 - 4 Writern.
+        """
+        print()
+
+        sys.setswitchinterval( self.__switchinterval)
+        for num_readers in (1, 4, 16):
+            for num_writers in (1, 4):
+                for Lock in (RWLock, RWLockWritePreferring, RWLockPhaseFair):
+                    writerwaits = LatencyHistogram()
+                    seconds = 0.5
+                    readercounts, writercounts = _workers_( Lock(), num_readers, num_writers, seconds, writerwaits=writerwaits)
+                    print( "%2d readers, %d writers, %-21s: %7d reads/s, %6d writes/s, writer wait p99 %8.1f us, max %8.1f us. " \
+                        % (num_readers, num_writers, Lock.__name__, sum( readercounts)/seconds, sum( writercounts)/seconds, writerwaits.percentile( 99)/1000, writerwaits.max()/1000))
+
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__RWLockPhaseFair)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
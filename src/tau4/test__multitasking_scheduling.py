@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import multiprocessing as mp
+import os
+import time
+import unittest
+
+from tau4.automation.controlunits import ControlCP
+from tau4.multitasking import SchedulingProfile
+
+
+class _ControlCP(ControlCP):
+
+    """Control ohne IO-Channels, die ein wenig rechnet.
+    """
+
+    def _run_( self, ipm):
+        sum( range( 200))
+        return
+
+
+class _LoadGenerator:
+
+    """Synthetische CPU-Last: Je CPU ein Process, der rechnet und Objekte erzeugt.
+    """
+
+    def __init__( self, nprocs=None):
+        self.__nprocs = nprocs or os.cpu_count()
+        self.__stop = mp.Event()
+        self.__procs = []
+        return
+
+    def __enter__( self):
+        for _ in range( self.__nprocs):
+            p = mp.Process( target=self._burn_, args=(self.__stop,), daemon=True)
+            p.start()
+            self.__procs.append( p)
+
+        return self
+
+    def __exit__( self, *args):
+        self.__stop.set()
+        for p in self.__procs:
+            p.join()
+
+        return False
+
+    @staticmethod
+    def _burn_( stop):
+        while not stop.is_set():
+            [ {} for _ in range( 1000)]
+
+        return
+
+
+def _jitter_( schedprofile, seconds, cycletime=0.001):
+    """Lateness-Histogramm einer 1-kHz-ControlCP mit diesem Profil.
+    """
+    control = _ControlCP( cycletime, schedprofile=schedprofile)
+    control.start( syncly=True)
+    time.sleep( seconds)
+    _, lateness = control.controlblock().histograms()
+    cycles = control.cycles()
+    control.shutdown( syncly=True)
+    return cycles, lateness
+
+
+class _TESTCASE__SchedulingProfile(unittest.TestCase):
+
+    def test__apply_revert( self):
+        """
+        """
+        print()
+
+        threshold = gc.get_threshold()
+        profile = SchedulingProfile( gc_freeze=True, gc_full=False)
+        results = profile.apply()
+        self.assertEqual( { "gc_full": "ok", "gc_freeze": "ok"}, results)
+        self.assertGreater( gc.get_freeze_count(), 0)
+        self.assertEqual( SchedulingProfile._GC_THRESHOLD_NEVER, gc.get_threshold()[ 2])
+
+        profile.revert()
+        self.assertEqual( 0, gc.get_freeze_count())
+        self.assertEqual( threshold, gc.get_threshold())
+
+        self.assertEqual( {}, SchedulingProfile.Default().apply())
+        return
+
+    def test__fallback( self):
+        """Was das OS nicht erlaubt, wird übersprungen.
+        """
+        print()
+
+        with self.assertRaises( ValueError):
+            SchedulingProfile( policy="idle")
+
+        with self.assertRaises( ValueError):
+            SchedulingProfile( policy="fifo", rtprio=0)
+
+        if not hasattr( os, "sched_setaffinity"):
+            return
+
+        profile = SchedulingProfile( cpus={ 100000})
+        results = profile.apply()
+        self.assertNotEqual( "ok", results[ "affinity"])
+        profile.revert()
+        return
+
+    def test__controlcp( self):
+        """
+        """
+        print()
+
+        profile = SchedulingProfile.Isolated( cpus={ 0})
+        cycles, lateness = _jitter_( profile, 0.3)
+        self.assertGreater( cycles, 100)
+        self.assertGreater( lateness.count(), 0)
+        return
+
+    def test__performance_jitter( self):
+        """1-kHz-ControlCP unter CPU-Last mit verschiedenen Profilen.
+        """
+        print()
+
+        cpu = min( os.sched_getaffinity( 0)) if hasattr( os, "sched_getaffinity") else 0
+        profiles = (
+            ( "Default", SchedulingProfile.Default()),
+            ( "Isolated", SchedulingProfile.Isolated( cpus={ cpu})),
+            ( "Realtime", SchedulingProfile.Realtime( cpus={ cpu})),
+        )
+        for name, profile in profiles:
+            with _LoadGenerator():
+                cycles, lateness = _jitter_( profile, 2.0)
+
+            ps = lateness.percentiles()
+            print( "%-8s: %5d cycles, lateness p50 %7.1f us, p99 %8.1f us, p99.9 %8.1f us, max %8.1f us. "
+                   % (name, cycles, ps[ "p50"]/1000, ps[ "p99"]/1000, ps[ "p99.9"]/1000, ps[ "max"]/1000)
+            )
+
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__SchedulingProfile)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import collections
+import gc
+import itertools
+import time
+import unittest
+
+from tau4.mathe.linalg import T3D
+from tau4.multitasking import LatencyHistogram, SchedulingProfile
+from tau4.multitasking.threads import CyclingThread
+
+
+_Ids = itertools.count()
+
+
+class _Cycler(CyclingThread):
+
+    """Merkt sich, wann _run_() aufgerufen wird.
+    """
+
+    def __init__( self, cycletime, runtimes={}, **kwargs):
+        super().__init__( id="test__multitasking_threads._Cycler.%d" % next( _Ids), cycletime=cycletime, udata=None, **kwargs)
+        self.starts = []
+        self.__runtimes = runtimes
+                                        # Zyklus -> Laufzeit von _run_() in s.
+        return
+
+    def _run_( self, *, udata):
+        self.starts.append( time.monotonic_ns())
+        runtime = self.__runtimes.get( len( self.starts))
+        if runtime:
+            time.sleep( runtime)
+
+        return
+
+
+class _Allocator(CyclingThread):
+
+    """Allokationslastige Nutzlast: T3D-Produkte und zyklischer Müll auf einem großen Heap.
+
+    Die zuletzt erzeugten Knoten bleiben eine Weile am Leben, wandern also in
+    ältere Generationen. Die Laufzeit jedes _run_() landet in runtimes.
+    """
+
+    def __init__( self, cycletime, **kwargs):
+        super().__init__( id="test__multitasking_threads._Allocator.%d" % next( _Ids), cycletime=cycletime, udata=None, **kwargs)
+        self.runtimes = LatencyHistogram()
+        self.__heap = [ { "i": i, "l": [ i]} for i in range( 200000)]
+                                        # Lebende Objekte, die eine Collection
+                                        #   der Generation 2 teuer machen.
+        self.__t = T3D.FromEuler( 1, 2, 3, 0.1, 0.2, 0.3)
+        self.__recent = collections.deque( maxlen=5000)
+        return
+
+    def _run_( self, *, udata):
+        t = time.monotonic_ns()
+        pose = self.__t
+        for _ in range( 20):
+            pose = pose*self.__t
+
+        for i in range( 200):
+            node = { "i": i}
+            node[ "self"] = node
+                                        # Zyklus, nur die GC räumt ihn weg.
+            self.__recent.append( node)
+
+        self.runtimes.record( time.monotonic_ns() - t)
+        return
+
+
+class _TESTCASE__CyclingThread(unittest.TestCase):
+
+    def _run_for_( self, cycler, seconds):
+        cycler.start( syncly=True)
+        time.sleep( seconds)
+        cycler.shutdown( syncly=True)
+        cycler.join( 1)
+        return cycler
+
+    def test__start_stop_shutdown( self):
+        """
+        """
+        print()
+
+        c = _Cycler( 0.010)
+        c.start( syncly=True)
+        time.sleep( 0.2)
+        c.stop( syncly=True)
+        n = len( c.starts)
+        self.assertGreater( n, 10)
+
+        time.sleep( 0.1)
+        self.assertEqual( n, len( c.starts))
+
+        c.start( syncly=True)
+        time.sleep( 0.1)
+        c.shutdown( syncly=True)
+        c.join( 1)
+        self.assertFalse( c.is_alive())
+        self.assertGreater( len( c.starts), n)
+
+        with self.assertRaises( ValueError):
+            _Cycler( 0.010, overrun="never")
+
+        return
+
+    def test__requests( self):
+        """Requests werden auch bei langer Zykluszeit sofort bearbeitet, der letzte gewinnt.
+        """
+        print()
+
+        c = _Cycler( 1.0)
+        t = time.perf_counter()
+        c.start( syncly=True)
+        c.stop( syncly=True)
+        self.assertLess( time.perf_counter() - t, 0.1)
+
+        c.start()
+        c.stop()
+        c.start()
+        time.sleep( 0.1)
+        c.stop( syncly=True)
+        c.shutdown( syncly=True)
+        c.join( 1)
+        self.assertFalse( c.is_alive())
+
+        c = _Cycler( 0.0005)
+        c.start( syncly=True)
+        time.sleep( 0.05)
+        c.stop( syncly=True)
+        n = len( c.starts)
+        time.sleep( 0.02)
+        self.assertEqual( n, len( c.starts))
+        c.shutdown( syncly=True)
+        c.join( 1)
+        self.assertFalse( c.is_alive())
+        return
+
+    def test__no_drift( self):
+        """Die Zyklen beginnen im Raster, auch wenn _run_() Zeit braucht.
+        """
+        print()
+
+        period = 10000000
+        c = self._run_for_( _Cycler( 0.010, {i: 0.004 for i in range( 1000)}), 1.0)
+        phases = [(t - c.starts[ 0]) % period for t in c.starts]
+        phases = [min( phase, period - phase) for phase in phases]
+        self.assertLess( sorted( phases)[ len( phases)*9//10], 2000000)
+                                        # 90 % der Zyklen weniger als 2 ms
+                                        #   neben dem Raster.
+        self.assertEqual( len( c.starts), c.cycletimemonitor().lateness().count())
+        return
+
+    def test__overrun_policies( self):
+        """Deadline nach einer Überschreitung, synthetisch: Deadline 100, jetzt 175, Zykluszeit 20.
+        """
+        print()
+
+        period = 20
+        expected = { "skip": 180, "catchup": 100, "stretch": 175}
+                                        # skip: Nächster Rasterpunkt nach jetzt,
+                                        #   catchup: Die versäumte Deadline,
+                                        #   stretch: Neues Raster ab jetzt.
+        for overrun in CyclingThread.OVERRUN_POLICIES:
+            c = _Cycler( 0.020, overrun=overrun)
+            self.assertEqual( expected[ overrun], c._deadline_on_overrun_( 100, 175, period))
+
+        self.assertEqual( 160, _Cycler( 0.020, overrun="skip")._deadline_on_overrun_( 100, 140, period))
+                                        # Genau auf einem Rasterpunkt: Der
+                                        #   nächste.
+        return
+
+    def test__overrun_policies_threaded( self):
+        """_run_() des 5. Zyklus dauert 3.5 Zykluszeiten; nur Reihenfolge, keine Phasen, die unter Last schwanken.
+        """
+        print()
+
+        runtime = 70000000
+        for overrun in CyclingThread.OVERRUN_POLICIES:
+            c = self._run_for_( _Cycler( 0.020, {5: runtime/1000000000}, overrun=overrun), 0.3)
+            self.assertGreater( len( c.starts), 6)
+            self.assertEqual( sorted( c.starts), c.starts)
+            self.assertGreaterEqual( c.starts[ 5] - c.starts[ 4], runtime)
+                                        # Der Zyklus nach der Überschreitung
+                                        #   beginnt erst danach.
+        return
+
+    def test__gc_in_slack( self):
+        """
+        """
+        print()
+
+        c = _Allocator( 0.005, gc_in_slack=True)
+        c.start( syncly=True)
+        time.sleep( 0.3)
+        self.assertFalse( gc.isenabled())
+        c.shutdown( syncly=True)
+        c.join( 1)
+        self.assertTrue( gc.isenabled())
+        self.assertGreater( c.cycletimemonitor().gcpauses().count(), 0)
+        return
+
+    def test__schedprofile_reverted( self):
+        """GC-Einstellungen eines Profils gelten nur, solange der Thread läuft.
+        """
+        print()
+
+        threshold = gc.get_threshold()
+        freezecount = gc.get_freeze_count()
+        c = _Cycler( 0.005, schedprofile=SchedulingProfile( gc_freeze=True, gc_full=False))
+        c.start( syncly=True)
+        time.sleep( 0.1)
+        self.assertEqual( SchedulingProfile._GC_THRESHOLD_NEVER, gc.get_threshold()[ 2])
+        c.shutdown( syncly=True)
+        c.join( 1)
+        self.assertEqual( threshold, gc.get_threshold())
+        self.assertEqual( freezecount, gc.get_freeze_count())
+        return
+
+    def test__performance( self):
+        """Jitter der Zyklusbeginne bei 100 Hz, 1 kHz und 5 kHz.
+        """
+        print()
+
+        for hz in (100, 1000, 5000):
+            for spin_us in (0, 200):
+                c = self._run_for_( _Cycler( 1/hz, spin_us=spin_us), 0.5)
+                lateness = c.cycletimemonitor().lateness()
+                print( "%5d Hz, spin %3d us: %4d cycles, lateness p50 %6.1f us, p99 %7.1f us, p99.9 %7.1f us, max %7.1f us. " \
+                    % (hz, spin_us, lateness.count(), lateness.percentile( 50)/1000, lateness.percentile( 99)/1000, lateness.percentile( 99.9)/1000, lateness.max()/1000))
+
+        return
+
+
+    def test__performance_control_plane( self):
+        """Overhead pro Zyklus mit leerem _run_() bei 10 kHz.
+        """
+        print()
+
+        c = _Cycler( 0.0001)
+        c.start( syncly=True)
+        time.sleep( 0.1)
+        n = len( c.starts)
+        t = time.process_time()
+        time.sleep( 1.0)
+        dt = time.process_time() - t
+        n = len( c.starts) - n
+        c.shutdown( syncly=True)
+        c.join( 1)
+        print( "10 kHz: %d cycles/s, %.1f us CPU per cycle. " % (n, dt*1000000/n))
+        return
+
+    def test__performance_gc( self):
+        """Laufzeit von _run_() bei allokationslastiger Nutzlast mit und ohne gc_in_slack.
+        """
+        print()
+
+        for gc_in_slack in (False, True):
+            profile = SchedulingProfile( gc_freeze=True)
+                                        # Der Heap aus dem Konstruktor ist
+                                        #   für die GC danach unsichtbar.
+            c = self._run_for_( _Allocator( 0.002, gc_in_slack=gc_in_slack, schedprofile=profile), 5.0)
+            profile.revert()
+            gc.collect()
+            runtimes = c.runtimes
+            gcpauses = c.cycletimemonitor().gcpauses()
+            print( "gc_in_slack=%-5s: %4d cycles, _run_() p50 %6.1f us, p99 %6.1f us, p99.9 %7.1f us, max %7.1f us; %4d GC pauses in slack, max %6.1f us. " \
+                % (gc_in_slack, runtimes.count(), runtimes.percentile( 50)/1000, runtimes.percentile( 99)/1000, runtimes.percentile( 99.9)/1000, runtimes.max()/1000, gcpauses.count(), gcpauses.max()/1000))
+
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__CyclingThread)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
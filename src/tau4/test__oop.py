@@ -20,10 +20,15 @@
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
 
+import gc
+import statistics
+import threading
 import time
 import unittest
 
 from tau4 import oop
+from tau4.multitasking import threads as mtt
+from tau4.timing import Timer2
 
 
 class _TESTCASE__EXECUTE_CYCLICALLY(unittest.TestCase):
@@ -51,6 +56,503 @@ class _TESTCASE__EXECUTE_CYCLICALLY(unittest.TestCase):
 _Testsuite = unittest.makeSuite( _TESTCASE__EXECUTE_CYCLICALLY)
 
 
+class _TESTCASE__PublisherChannelAsync(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        dispatcher = oop.AsyncDispatcher( workers=2)
+        received = []
+        tau4pc = oop.PublisherChannel.Async( self, dispatcher=dispatcher, coalesce=False)
+        tau4pc += lambda tau4pc, value, key=None: received.append( (tau4pc, value, key))
+        tau4pc += lambda tau4pc, value, key=None: 1/0
+                                        # Must not kill the worker.
+        self.assertFalse( tau4pc.is_sync())
+        for i in range( 100):
+            tau4pc( i, key="k")
+
+        self.assertTrue( dispatcher.flush( timeout=5))
+        self.assertEqual( list( range( 100)), sorted( value for _, value, _ in received))
+        self.assertTrue( all( pc is tau4pc and key == "k" for pc, _, key in received))
+        stats = tau4pc.stats()
+        self.assertEqual( 100, stats[ "published"])
+        self.assertEqual( 100, stats[ "dispatched"])
+        self.assertEqual( 100, dispatcher.stats()[ "dispatched"])
+
+        self.assertIs( oop.AsyncDispatcher.Default(), oop.PublisherChannel.Async( self).dispatcher())
+        dispatcher.shutdown()
+        self.assertRaises( RuntimeError, tau4pc, 42)
+        self.assertRaises( ValueError, oop.AsyncDispatcher, overflow="any")
+        return
+
+    def test__coalescing_and_overflow( self):
+        """
+        """
+        print()
+
+        for overflow in oop.AsyncDispatcher.OVERFLOW_POLICIES:
+            gate = threading.Event()
+            dispatcher = oop.AsyncDispatcher( maxsize=3, overflow=overflow)
+            received = []
+            def subscriber( tau4pc, value):
+                gate.wait()
+                received.append( (tau4pc.publisher(), value))
+
+            channels = [oop.PublisherChannel.Async( i, dispatcher=dispatcher) for i in range( 6)]
+            for tau4pc in channels:
+                tau4pc += subscriber
+
+            channels[ 0]( -1)
+            time.sleep( 0.1)
+                                        # Worker now blocks in the subscriber.
+            for value in range( 10):
+                channels[ 1]( value)
+                                        # Latest value wins.
+            channels[ 2]( 2)
+            channels[ 3]( 3)
+            if overflow == "block":
+                threading.Timer( 0.2, gate.set).start()
+
+            channels[ 4]( 4)
+                                        # Queue full.
+            gate.set()
+            self.assertTrue( dispatcher.flush( timeout=5))
+            print( "%-11s: %s. " % (overflow, received))
+
+            self.assertEqual( 9, channels[ 1].stats()[ "coalesced"])
+            self.assertEqual( 3, dispatcher.stats()[ "depth_max"])
+            if overflow == "drop_oldest":
+                self.assertEqual( [(0, -1), (2, 2), (3, 3), (4, 4)], received)
+                self.assertEqual( 1, channels[ 1].stats()[ "dropped"])
+
+            elif overflow == "drop_newest":
+                self.assertEqual( [(0, -1), (1, 9), (2, 2), (3, 3)], received)
+                self.assertEqual( 1, channels[ 4].stats()[ "dropped"])
+
+            else:
+                self.assertEqual( [(0, -1), (1, 9), (2, 2), (3, 3), (4, 4)], received)
+                self.assertEqual( 0, dispatcher.stats()[ "dropped"])
+
+            dispatcher.shutdown()
+
+        return
+
+    def test__block_recheck_after_wait( self):
+        """Publishers blocked by a full queue coalesce resp. fail after waking up.
+        """
+        print()
+
+        sem = threading.Semaphore( 0)
+        received = []
+        def subscriber( tau4pc, value):
+            sem.acquire()
+            received.append( (tau4pc.publisher(), value))
+
+        ##  Coalescing: Another publisher has enqueued during the wait
+        #
+        dispatcher = oop.AsyncDispatcher( maxsize=2, overflow="block")
+        channels = {name: oop.PublisherChannel.Async( name, dispatcher=dispatcher) for name in "ABXC"}
+        for tau4pc in channels.values():
+            tau4pc += subscriber
+
+        channels[ "A"]( 0)
+        time.sleep( 0.1)
+                                        # Worker now blocks in the subscriber.
+        channels[ "B"]( 1)
+        channels[ "X"]( 2)
+                                        # Queue full.
+        publishers = [threading.Thread( target=channels[ "C"], args=(value,)) for value in (10, 11)]
+        for publisher in publishers:
+            publisher.start()
+
+        time.sleep( 0.1)
+        for _ in range( 2):
+            sem.release()
+            time.sleep( 0.1)
+                                        # Worker took B, then X: One publisher
+                                        #   has enqueued C, the other one must
+                                        #   coalesce into it.
+        for publisher in publishers:
+            publisher.join( 5)
+
+        for _ in range( 10):
+            sem.release()
+
+        self.assertTrue( dispatcher.flush( timeout=5))
+        print( "block: %s. " % received)
+        self.assertEqual( 1, len( [value for name, value in received if name == "C"]))
+        self.assertEqual( 1, channels[ "C"].stats()[ "coalesced"])
+        dispatcher.shutdown()
+
+        ##  Shutdown during the wait
+        #
+        received.clear()
+        sem = threading.Semaphore( 0)
+        dispatcher = oop.AsyncDispatcher( maxsize=1, overflow="block")
+        channels = {name: oop.PublisherChannel.Async( name, dispatcher=dispatcher) for name in "ABC"}
+        for tau4pc in channels.values():
+            tau4pc += subscriber
+
+        channels[ "A"]( 0)
+        time.sleep( 0.1)
+        channels[ "B"]( 1)
+                                        # Queue full.
+        errors = []
+        def publish():
+            try:
+                channels[ "C"]( 2)
+
+            except RuntimeError as e:
+                errors.append( e)
+
+        publisher = threading.Thread( target=publish)
+        publisher.start()
+        time.sleep( 0.1)
+        dispatcher.shutdown( timeout=0.1)
+        publisher.join( 5)
+        for _ in range( 10):
+            sem.release()
+
+        dispatcher.shutdown( timeout=5)
+        self.assertEqual( 1, len( errors))
+        self.assertEqual( [("A", 0), ("B", 1)], received)
+        return
+
+    def test__jitter( self):
+        """1 kHz CyclingThread publishing to 50 slow subscribers: Synch vs. Async.
+        """
+        print()
+
+        def subscriber( tau4pc, value):
+            time.sleep( 0.0002)
+                                        # Slow, e.g. I/O.
+        class Publisher(mtt.CyclingThread):
+
+            def __init__( self, id, tau4pc):
+                super().__init__( id=id, cycletime=0.001, udata=None)
+                self.tau4pc = tau4pc
+                self.times = []
+                return
+
+            def _run_( self, udata):
+                self.times.append( time.perf_counter())
+                self.tau4pc( len( self.times))
+                return
+
+        dispatcher = oop.AsyncDispatcher( workers=4)
+        for i, tau4pc in enumerate( (oop.PublisherChannel.Synch( None), oop.PublisherChannel.Async( None, dispatcher=dispatcher))):
+            for _ in range( 50):
+                tau4pc += lambda tau4pc, value: subscriber( tau4pc, value)
+
+            publisher = Publisher( "publisher.%d" % i, tau4pc)
+            publisher.start( syncly=True)
+            time.sleep( 1)
+            publisher.shutdown( syncly=True)
+
+            dts = [(t1 - t0)*1000 for t0, t1 in zip( publisher.times, publisher.times[ 1:])]
+            print( "%-5s: %5d cycles, cycletime %6.3f ms (stdev %6.3f ms, max %7.3f ms). " % (tau4pc.__class__.__name__, len( publisher.times), statistics.mean( dts), statistics.stdev( dts), max( dts)))
+
+        dispatcher.flush( timeout=5)
+        print( "Async: %s. " % tau4pc.stats())
+        dispatcher.shutdown()
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__PublisherChannelAsync))
+
+
+class _TESTCASE__PublisherChannelSubscribers(unittest.TestCase):
+
+    class Subscriber:
+
+        def __init__( self):
+            self.values = []
+
+        def __call__( self, tau4pc, value):
+            self.values.append( value)
+
+        def on_value( self, tau4pc, value):
+            self.values.append( value)
+
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        tau4pc = oop.PublisherChannel.Synch( None)
+        subscriber = self.Subscriber()
+        tau4pc += subscriber.on_value
+        self.assertRaises( ValueError, tau4pc.subscriber_register, subscriber.on_value)
+                                        # Bound methods are created anew on
+                                        #   each access.
+        tau4pc += subscriber
+        self.assertTrue( tau4pc.subscriber_is_registered( subscriber.on_value))
+        self.assertEqual( 2, len( tau4pc))
+
+        tau4pc( 1)
+        self.assertEqual( [1, 1], subscriber.values)
+
+        tau4pc -= subscriber.on_value
+        self.assertRaises( ValueError, tau4pc.subscriber_un_register, subscriber.on_value)
+        tau4pc( 2)
+        self.assertEqual( [1, 1, 2], subscriber.values)
+        self.assertEqual( [subscriber], tau4pc.subscribers())
+        self.assertIsInstance( tau4pc.subscribers( copy=False), tuple)
+
+        tau4pc.subscriber_un_register_all()
+        self.assertTrue( tau4pc.is_empty())
+        return
+
+    def test__weak( self):
+        """
+        """
+        print()
+
+        tau4pc = oop.PublisherChannel.Synch( None)
+        subscribers = [self.Subscriber() for _ in range( 3)]
+        tau4pc.subscriber_register( subscribers[ 0].on_value, weak=True)
+        tau4pc.subscriber_register( subscribers[ 1], weak=True)
+        tau4pc += subscribers[ 2].on_value
+        self.assertRaises( ValueError, tau4pc.subscriber_register, subscribers[ 0].on_value)
+
+        tau4pc( 1)
+        self.assertEqual( [[1], [1], [1]], [s.values for s in subscribers])
+
+        del subscribers[ :2]
+        gc.collect()
+        self.assertEqual( 3, len( tau4pc))
+        tau4pc( 2)
+                                        # Prunes the dead ones.
+        self.assertEqual( 1, len( tau4pc))
+        self.assertEqual( [1, 2], subscribers[ 0].values)
+
+        subscriber = self.Subscriber()
+        tau4pc.subscriber_register( subscriber.on_value, weak=True)
+        tau4pc -= subscriber.on_value
+        self.assertEqual( 1, len( tau4pc))
+        return
+
+    def test__performance( self):
+        """Publish cost for 1 to 1000 subscribers; copying the list under a lock is what safe mode did before.
+        """
+        print()
+
+        for num_subscribers in (1, 10, 100, 1000):
+            tau4pc = oop.PublisherChannel.Synch( None)
+            for _ in range( num_subscribers):
+                tau4pc += lambda tau4pc, value: None
+
+            n = max( 100, 100000//num_subscribers)
+            with Timer2() as t:
+                for i in range( n):
+                    tau4pc( i)
+
+            subscribers = list( tau4pc.subscribers())
+            lock = threading.Lock()
+            def publish( *args, **kwargs):
+                with lock:
+                    ss = subscribers[ :]
+
+                for s in ss:
+                    s( tau4pc, *args, **kwargs)
+
+            with Timer2() as t_list:
+                for i in range( n):
+                    publish( i)
+
+            with Timer2() as t_register:
+                for _ in range( 100):
+                    subscriber = lambda tau4pc, value: None
+                    tau4pc += subscriber
+                    tau4pc -= subscriber
+
+            print( "%4d subscribers: publish %8.2f us (list copy under lock: %8.2f us), register + unregister %7.2f us. "
+                  % (num_subscribers, t.elapsed_us( n), t_list.elapsed_us( n), t_register.elapsed_us( 100)))
+
+        return
+
+    def test__stress( self):
+        """Subscribe and unsubscribe concurrently while publishing.
+        """
+        print()
+
+        tau4pc = oop.PublisherChannel.Synch( None)
+        permanent = self.Subscriber()
+        tau4pc += permanent
+        is_running = True
+        errors = []
+
+        def subscribing():
+            try:
+                while is_running:
+                    subscribers = [self.Subscriber() for _ in range( 10)]
+                    for i, subscriber in enumerate( subscribers):
+                        tau4pc.subscriber_register( subscriber.on_value, weak=bool( i % 2))
+
+                    for subscriber in subscribers[ ::2]:
+                        tau4pc.subscriber_un_register( subscriber.on_value)
+
+            except Exception as e:
+                errors.append( e)
+
+        threads = [threading.Thread( target=subscribing) for _ in range( 4)]
+        for thread in threads:
+            thread.start()
+
+        n = 0
+        t0 = time.time()
+        while time.time() - t0 <= 1:
+            n += 1
+            tau4pc( n)
+
+        is_running = False
+        for thread in threads:
+            thread.join()
+
+        gc.collect()
+        tau4pc( n + 1)
+        print( "%d publishs, %d subscribers left. " % (n, len( tau4pc)))
+        self.assertEqual( [], errors)
+        self.assertEqual( list( range( 1, n + 2)), permanent.values)
+        self.assertEqual( 1, len( tau4pc))
+                                        # Only the permanent one, the weak ones
+                                        #   have been pruned.
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__PublisherChannelSubscribers))
+
+
+class _TESTCASE__Singleton(unittest.TestCase):
+
+    class LockingSingleton(type):
+
+        """Singleton taking the lock on every call, i.e. without fast path, for comparison.
+        """
+
+        def __new__( klass, name, bases, namespace):
+            namespace.setdefault( '__lock__', threading.RLock())
+            namespace.setdefault( '__instance__', None)
+            return super().__new__( klass, name, bases, namespace)
+
+        def __call__( klass, *args, **kwargs):
+            with klass.__lock__:
+                if klass.__instance__ is None:
+                    instance = klass.__new__( klass, *args, **kwargs)
+                    instance.__init__( *args, **kwargs)
+                    klass.__instance__ = instance
+
+            return klass.__instance__
+
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        class MySingleton(metaclass=oop.Singleton):
+
+            def __init__( self, a):
+                self.a = a
+
+        class MySubSingleton(MySingleton):
+            pass
+
+        self.assertIsNone( MySingleton.instance)
+        s1 = MySingleton( 1)
+        s2 = MySingleton( 2)
+        self.assertIs( s1, s2)
+        self.assertEqual( 1, s2.a)
+        self.assertIs( s1, MySingleton.instance)
+
+        self.assertIsNone( MySubSingleton.instance)
+        s3 = MySubSingleton( 3)
+        self.assertIsNot( s1, s3)
+        self.assertIs( s3, MySubSingleton.instance)
+        self.assertIs( s1, MySingleton.instance)
+
+        class MyOwnInstance(metaclass=oop.Singleton):
+
+            def instance( self):
+                return 42
+
+        self.assertEqual( 42, MyOwnInstance().instance())
+        return
+
+    def test__concurrent_construction( self):
+        """Many threads calling Klass() for the first time at once get exactly one instance.
+        """
+        print()
+
+        for _ in range( 10):
+            constructions = []
+
+            class SlowSingleton(metaclass=oop.Singleton):
+
+                def __init__( self):
+                    constructions.append( self)
+                    time.sleep( 0.01)
+
+            barrier = threading.Barrier( 16)
+            instances = []
+            def construct():
+                barrier.wait()
+                instances.append( SlowSingleton())
+
+            threads = [threading.Thread( target=construct) for _ in range( 16)]
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual( 1, len( constructions))
+            self.assertEqual( 16, len( instances))
+            self.assertTrue( all( instance is constructions[ 0] for instance in instances))
+
+        return
+
+    def test__performance( self):
+        """1e6 accesses from 1 to 8 threads.
+        """
+        print()
+
+        class FastSingleton(metaclass=oop.Singleton):
+            pass
+
+        class LockingSingleton(metaclass=self.LockingSingleton):
+            pass
+
+        n = 1000000
+        for num_threads in (1, 2, 4, 8):
+            results = []
+            for access in (LockingSingleton, FastSingleton, lambda: FastSingleton.instance):
+                access()
+                def work():
+                    for _ in range( n//num_threads):
+                        access()
+
+                threads = [threading.Thread( target=work) for _ in range( num_threads)]
+                with Timer2() as t:
+                    for thread in threads:
+                        thread.start()
+
+                    for thread in threads:
+                        thread.join()
+
+                results.append( t.elapsed_ms())
+
+            print( "%d thread(s): locking %7.1f ms, fast path %7.1f ms, Klass.instance %7.1f ms per 1e6 accesses. " % (num_threads, *results))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__Singleton))
+
+
 class _TESTCASE__(unittest.TestCase):
 
     def test( self):
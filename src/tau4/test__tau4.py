@@ -22,6 +22,7 @@
 
 from __future__ import division
 
+import threading
 import tau4
 import time
 import unittest
@@ -98,6 +99,134 @@ class _TESTCASE__Objects(unittest.TestCase):
 _Testsuite = unittest.makeSuite( _TESTCASE__Objects)
 
 
+class _TESTCASE__ShardedRegistry(unittest.TestCase):
+
+    def test__add_many_remove_many( self):
+        """
+        """
+        print()
+
+        objects = tau4._Objects( stripes=4)
+        objects.add_many( (i, str( i)) for i in range( 100))
+        self.assertEqual( 100, len( objects))
+        self.assertEqual( "42", objects( 42))
+
+        with self.assertRaises( KeyError):
+            objects.add_many( [(100, "100"), (42, "42")])
+
+        self.assertNotIn( 100, objects)
+
+        with self.assertRaises( KeyError):
+            objects.add_many( [(100, "100"), (101, "101"), (100, "100b")])
+                                        # Duplicate within the batch.
+        self.assertNotIn( 100, objects)
+        self.assertNotIn( 101, objects)
+
+        with self.assertRaises( ValueError):
+            objects.add_many( [(1.5, "1.5")])
+
+        with self.assertRaises( KeyError):
+            objects.remove_many( [0, 1, 1000])
+
+        self.assertIn( 0, objects)
+
+        with self.assertRaises( KeyError):
+            objects.remove_many( [0, 1, 0])
+                                        # Duplicate within the batch.
+        self.assertEqual( 100, len( objects))
+        self.assertIn( 0, objects)
+        self.assertIn( 1, objects)
+
+        objects.remove_many( range( 50))
+        self.assertEqual( 50, len( objects))
+        self.assertNotIn( 0, objects)
+        self.assertEqual( 100, sum( stripe[ "len"] for stripe in objects.stats()) + 50)
+        return
+
+    def test__Id_is_unique_across_threads( self):
+        """
+        """
+        print()
+
+        taken = []
+        def create():
+            try:
+                tau4.Id( "test__Id_is_unique_across_threads")
+
+            except KeyError:
+                taken.append( 1)
+
+        threads = [threading.Thread( target=create) for _ in range( 8)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual( 7, len( taken))
+        return
+
+    def test__performance( self):
+        """Mehrere Threads erzeugen und lesen je n Objekte: Shards vs. ein Lock.
+        """
+        print()
+
+        class _SingleLock:
+
+            def __init__( self):
+                self.__instances = {}
+                self.__lock = threading.RLock()
+
+            def __call__( self, ident):
+                with self.__lock:
+                    return self.__instances[ ident]
+
+            def add( self, ident, instance):
+                with self.__lock:
+                    if not isinstance( ident, (str, bytes, int)):
+                        raise ValueError( ident)
+
+                    if ident in self.__instances:
+                        raise KeyError( ident)
+
+                    self.__instances[ ident] = instance
+
+        n = 100000
+        nthreads = 4
+        def run( objects):
+            def work( k):
+                idents = range( k, n, nthreads)
+                for ident in idents:
+                    objects.add( ident, ident)
+
+                for ident in idents:
+                    objects( ident)
+
+            threads = [threading.Thread( target=work, args=(k,)) for k in range( nthreads)]
+            t = time.perf_counter()
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            return time.perf_counter() - t
+
+        dt_single = run( _SingleLock())
+        objects = tau4._Objects( stripes=16)
+        dt_sharded = run( objects)
+        for ident in range( n):
+            self.assertEqual( ident, objects( ident))
+
+        stats = objects.stats()
+        print( "%d threads, %d objects: single lock %.3f s, 16 stripes %.3f s. " % (nthreads, n, dt_single, dt_sharded))
+        print( "Stripe waits: %d, %.0f us total. " % (sum( s[ "waits"] for s in stats), sum( s[ "wait_us"] for s in stats)))
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__ShardedRegistry))
+
+
 class _TESTCASE__(unittest.TestCase):
 
     def test( self):
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import pickle
+import time
+import unittest
+
+from tau4.automation import controlunits as cu
+from tau4.timing import Timer2
+
+
+def _iodefs_( channelid, n):
+    """n IOs, every other one analog.
+    """
+    iodefs = []
+    for i in range( n):
+        if i % 2:
+            iodefs.append( cu.SwIoDefs.AO( usrid="a.%d" % i, channelid=channelid, value=0.0, iotype="a"))
+
+        else:
+            iodefs.append( cu.SwIoDefs.DO( usrid="d.%d" % i, channelid=channelid, value=0, iotype="d"))
+
+    return iodefs
+
+
+def _values_( ioimage):
+    return [il._value for il in ioimage._iodefs_by_usrid.values()]
+
+
+def _ioimage_modify_( ioimage, k):
+    for usrid, il in ioimage._iodefs_by_usrid.items():
+        il._value = il._typecaster( k)
+
+    return ioimage
+
+
+def _reader_( mailbox, results):
+    """Reads the mailbox in another process, counts images with mixed values.
+
+    At module level, so that it can be pickled for the spawn start method.
+    """
+    inconsistencies = 0
+    t0 = time.time()
+    while time.time() - t0 < 1:
+        image = mailbox.get_nowait()
+        if image is None:
+            continue
+
+        values = set( il._value for il in image._iodefs_by_usrid.values())
+        inconsistencies += len( values) != 1
+        if values == {-1}:
+            break
+
+    results.put( (inconsistencies, mailbox.retries()))
+    mailbox.close()
+    return
+
+
+class _TESTCASE__MailboxBasedOnSharedMemory(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        iochannel = cu.IoChannelBuilder( _iodefs_( "a -> b", 10), cu.MailboxBasedOnSharedMemory).iochannel( "a -> b")
+        mailbox = iochannel.mailbox()
+        self.assertIsInstance( mailbox, cu.MailboxBasedOnSharedMemory)
+
+        self.assertIsNone( mailbox.get_nowait())
+
+        iochannel.dout_value( "d.0", 42)
+        iochannel.aout_value( "a.1", 4.2)
+        iochannel.put_sndimage()
+        iochannel.get_rcvimage()
+        self.assertEqual( 42, iochannel.dinp_value( "d.0"))
+        self.assertAlmostEqual( 4.2, iochannel.ainp_value( "a.1"))
+        self.assertIs( int, type( iochannel.dinp_value( "d.0")))
+        self.assertIs( float, type( iochannel.ainp_value( "a.1")))
+
+        self.assertIsNone( mailbox.get_nowait())
+                                        # Nothing new.
+        mailbox.close()
+        mailbox.unlink()
+        return
+
+    def test__lifecycle( self):
+        """
+        """
+        print()
+
+        builder = cu.IoChannelBuilder( _iodefs_( "a -> b", 10), cu.MailboxBasedOnSharedMemory)
+        mailbox = builder.iochannel( "a -> b").mailbox()
+        name = mailbox.name()
+        shared_memory.SharedMemory( name).close()
+                                        # Segment exists.
+        builder.close()
+        self.assertRaises( FileNotFoundError, shared_memory.SharedMemory, name)
+        mailbox.unlink()
+                                        # Idempotent.
+
+        ### Owner forgot to unlink: The finalizer does it
+        #
+        mailbox = cu.MailboxBasedOnSharedMemory( "a -> b", cu.SwIoImage2( _iodefs_( "a -> b", 10)))
+        name = mailbox.name()
+        del mailbox
+        gc.collect()
+        self.assertRaises( FileNotFoundError, shared_memory.SharedMemory, name)
+        return
+
+    def test__sender_died_while_writing( self):
+        """
+        """
+        print()
+
+        ioimage = cu.SwIoImage2( _iodefs_( "a -> b", 10))
+        mailbox = cu.MailboxBasedOnSharedMemory( "a -> b", ioimage)
+        shm = shared_memory.SharedMemory( mailbox.name())
+        cu.MailboxBasedOnSharedMemory._SEQ.pack_into( shm.buf, 0, 1)
+                                        # Odd: Sender is writing, forever.
+        self.assertIsNone( mailbox.get_nowait())
+        self.assertEqual( cu.MailboxBasedOnSharedMemory._READ_RETRIES_MAX, mailbox.retries())
+
+        cu.MailboxBasedOnSharedMemory._SEQ.pack_into( shm.buf, 0, 2)
+        self.assertIsNotNone( mailbox.get_nowait())
+        shm.close()
+
+        mailbox.close()
+        mailbox.unlink()
+        return
+
+    def test__interprocess( self):
+        """
+        """
+        print()
+
+        ioimage = cu.SwIoImage2( _iodefs_( "a -> b", 100))
+        mailbox = cu.MailboxBasedOnSharedMemory( "a -> b", ioimage)
+        results = mp.Queue()
+        process = mp.Process( target=_reader_, args=(mailbox, results))
+        process.start()
+        for k in range( 20000):
+            mailbox.put_nowait( _ioimage_modify_( ioimage, k))
+
+        mailbox.put_nowait( _ioimage_modify_( ioimage, -1))
+        inconsistencies, retries = results.get( timeout=5)
+        process.join()
+
+        print( "Reader retried %d times. " % retries)
+        self.assertEqual( 0, inconsistencies)
+
+        mailbox.close()
+        mailbox.unlink()
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__MailboxBasedOnSharedMemory)
+
+
+class _TESTCASE__IoImageCodec(unittest.TestCase):
+
+    def test__simple( self):
+        """
+        """
+        print()
+
+        ioimageS = cu.SwIoImage2( _iodefs_( "a -> b", 10))
+        ioimageR = ioimageS.clone()
+        for is_delta in (False, True):
+            codec = cu.IoImageCodec( ioimageS, is_delta)
+            codec.decode( codec.encode( _ioimage_modify_( ioimageS, 42)), ioimageR)
+            self.assertEqual( _values_( ioimageS), _values_( ioimageR))
+            self.assertIs( int, type( ioimageR.dout_value( "d.0")))
+            self.assertIs( float, type( ioimageR.aout_value( "a.1")))
+
+            ioimageS.dout_value( "d.4", 7)
+            data = codec.encode( ioimageS)
+            if is_delta:
+                self.assertEqual( cu.IoImageCodec._HEADER.size + cu.IoImageCodec._INDEX.size + 8, len( data))
+                                        # Only the changed line.
+            self.assertIs( ioimageR, codec.decode( data, ioimageR))
+            self.assertEqual( 7, ioimageR.dout_value( "d.4"))
+            self.assertEqual( _values_( ioimageS), _values_( ioimageR))
+
+            self.assertIs( codec.ioimage(), codec.decode( data))
+
+        return
+
+    def test__builder( self):
+        """
+        """
+        print()
+
+        iodefs = _iodefs_( "a -> b", 4) + _iodefs_( "b -> a", 6)
+        codecs = cu.IoImageCodec.FromIoImageBuilder( cu.IoImageBuilder( iodefs), is_delta=True)
+        self.assertEqual( {"a -> b", "b -> a"}, set( codecs))
+
+        for mailboxclass, codec in ((cu.MailboxBasedOnMpQueue, "delta"), (cu.MailboxBasedOnMpValue, "full"), (cu.MailboxBasedOnMpPipe, "delta")):
+            builder = cu.IoChannelBuilder( iodefs, mailboxclass, codec=codec)
+            iochannel = builder.iochannel( "b -> a")
+            iochannel.dout_value( "d.2", 42)
+            iochannel.put_sndimage()
+            while iochannel.rcvimage().dinp_value( "d.2") != 42:
+                iochannel.get_rcvimage()
+
+            iochannel.aout_value( "a.5", 4.2)
+            iochannel.put_sndimage()
+            while iochannel.rcvimage().ainp_value( "a.5") != 4.2:
+                iochannel.get_rcvimage()
+
+            self.assertEqual( 42, iochannel.rcvimage().dinp_value( "d.2"))
+
+        self.assertRaises( ValueError, cu.IoChannelBuilder( iodefs, cu.MailboxBasedOnMpValue, codec="delta").iochannels)
+        return
+
+    def test__performance( self):
+        """Encode and decode of images with 10, 100, and 1000 lines.
+        """
+        print()
+
+        for lines in (10, 100, 1000):
+            ioimageS = cu.SwIoImage2( _iodefs_( "a -> b", lines))
+            ioimageR = ioimageS.clone()
+            n = 1000
+
+            with Timer2() as tE:
+                for _ in range( n):
+                    data = pickle.dumps( ioimageS)
+
+            with Timer2() as tD:
+                for _ in range( n):
+                    pickle.loads( data)
+
+            print( "%4d lines, pickle      : encode %7.1f us, decode %7.1f us. " % (lines, tE.elapsed_us( n), tD.elapsed_us( n)))
+
+            for is_delta in (False, True):
+                codec = cu.IoImageCodec( ioimageS, is_delta)
+                with Timer2() as tE:
+                    for k in range( n):
+                        ioimageS.dout_value( "d.0", k)
+                        data = codec.encode( ioimageS)
+
+                with Timer2() as tD:
+                    for _ in range( n):
+                        codec.decode( data, ioimageR)
+
+                print( "%4d lines, codec %-6s: encode %7.1f us, decode %7.1f us. " % (lines, "delta" if is_delta else "full", tE.elapsed_us( n), tD.elapsed_us( n)))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__IoImageCodec))
+
+
+class _TESTCASE__Mailboxes(unittest.TestCase):
+
+    def test__performance( self):
+        """Round trip (put and get) of images with 10, 100, and 1000 lines.
+        """
+        print()
+
+        for lines in (10, 100, 1000):
+            print( "%d lines:" % lines)
+            ioimage = cu.SwIoImage2( _iodefs_( "a -> b", lines))
+            mailboxes = (
+                cu.MailboxBasedOnMpQueue( "a -> b"),
+                cu.MailboxBasedOnMpValue( "a -> b", size=256*lines + 4096),
+                cu.MailboxBasedOnMpPipe( "a -> b"),
+                cu.MailboxBasedOnMpPipe( "a -> b", codec=cu.IoImageCodec( ioimage)),
+                cu.MailboxBasedOnSharedMemory( "a -> b", ioimage),
+            )
+            for mailbox in mailboxes:
+                n = 200
+                with Timer2() as t:
+                    for k in range( n):
+                        mailbox.put_nowait( _ioimage_modify_( ioimage, k))
+                        image = None
+                        while image is None:
+                            image = mailbox.get_nowait()
+
+                self.assertEqual( n - 1, image.dout_value( "d.0"))
+                name = mailbox.__class__.__name__ + (" + codec" if mailbox._codec else "")
+                print( "    %-36s: %8.1f us/round trip, %8.0f images/s. " % (name, t.elapsed_us( n), n/t.elapsed_s()))
+
+            mailboxes[ -1].close()
+            mailboxes[ -1].unlink()
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__Mailboxes))
+
+
+class _TESTCASE__(unittest.TestCase):
+
+    def test( self):
+        """
+        """
+        print()
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__))
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+#   -*- coding: utf8 -*- #
+#
+#
+#   Copyright (C) by p.oseidon@datec.at, 1998 - 2017
+#
+#   This file is part of tau4.
+#
+#   tau4 is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   tau4 is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with tau4. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import time
+import unittest
+
+from tau4.automation.plc import Job, PLC
+
+
+class _PLC(PLC):
+
+    """PLC ohne I/Os, deren Zyklen der Test selbst ausführt.
+    """
+
+    def __init__( self, cycletime):
+        super().__init__( cycletime_plc=cycletime, cycletime_ios=cycletime, is_daemon=True)
+        self.log = []
+        return
+
+    def _inps_execute_( self):
+        return
+
+    def _outs_execute_( self):
+        return
+
+    def _iinps_execute_( self):
+        return
+
+    def _iouts_execute_( self):
+        return
+
+
+class _PLC4Reference(_PLC):
+
+    """Die bisherige Planung: Restzeit jedes Jobs in jedem Zyklus herunterzählen.
+    """
+
+    def __init__( self, cycletime):
+        super().__init__( cycletime)
+        self.rtimes = {}
+        return
+
+    def _run_( self, udata):
+        jobs2exec = []
+        for job in self.jobs():
+            rtime = self.rtimes.get( job, job.cycletime()) - self.cycletime()
+            if rtime <= 0:
+                jobs2exec.append( job)
+                rtime = job.cycletime()
+
+            self.rtimes[ job] = rtime
+
+        for job in jobs2exec:
+            job.execute()
+
+        return
+
+
+class _Job(Job):
+
+    def __init__( self, plc, id, cycletime, runtime=0):
+        super().__init__( plc, id, cycletime)
+        self.__runtime = runtime
+        return
+
+    def execute( self):
+        self.plc().log.append( self.id())
+        if self.__runtime:
+            time.sleep( self.__runtime)
+
+        return
+
+
+def _cycles_( plc, n):
+    """\c n Zyklen ausführen, je Zyklus die Ids der ausgeführten Jobs liefern.
+    """
+    cycles = []
+    for _ in range( n):
+        del plc.log[ :]
+        plc._run_( None)
+        cycles.append( tuple( plc.log))
+
+    return cycles
+
+
+class _TESTCASE__PLCJobs(unittest.TestCase):
+
+    def test__decrement_semantics( self):
+        """Dieselben Jobs in denselben Zyklen in derselben Reihenfolge wie beim Herunterzählen.
+        """
+        print()
+
+        random.seed( 42)
+        cycletimes = [ 0.001, 0.0015, 0.0025, 0.003, 0.007, 0.01, 0.05, 0.1, 0.3]
+        for plc_cycletime in (0.001, 0.01):
+            plc = _PLC( plc_cycletime)
+            reference = _PLC4Reference( plc_cycletime)
+            for i in range( 100):
+                cycletime = random.choice( cycletimes)*plc_cycletime/0.001
+                plc.job_add( _Job( plc, "job.%d" % i, cycletime))
+                reference.job_add( _Job( reference, "job.%d" % i, cycletime))
+
+            self.assertEqual( _cycles_( reference, 1000), _cycles_( plc, 1000))
+
+        return
+
+    def test__reset_cancel( self):
+        """
+        """
+        print()
+
+        plc = _PLC( 0.001)
+        a = _Job( plc, "a", 0.003)
+        b = _Job( plc, "b", 0.003)
+        plc.job_add( a).job_add( b)
+        self.assertEqual( [ (), (), ( "a", "b")], _cycles_( plc, 3))
+
+        plc._run_( None)
+        a.rtime_reset()
+        self.assertAlmostEqual( 0.003, a.rtime())
+        self.assertAlmostEqual( 0.002, b.rtime())
+        self.assertEqual( [ (), ( "b",), ( "a",)], _cycles_( plc, 3))
+
+        plc.job_cancel( b)
+        self.assertEqual( [ a], plc.jobs())
+        self.assertIsNone( plc.job_rtime( b))
+        self.assertEqual( [ (), (), ( "a",)] * 2, _cycles_( plc, 6))
+
+        c = _Job( plc, "c", 0.003)
+        plc.job_add( c).job_add( b)
+        self.assertIs( b, plc.jobs( "b"))
+        self.assertEqual( [ (), (), ( "a", "c", "b")], _cycles_( plc, 3))
+                                        # Nach dem erneuten Hinzufügen hinter c.
+        return
+
+    def test__reset_in_same_cycle( self):
+        """Ein Job, der sich in execute() selbst zurücksetzt, und mehrfaches Zurücksetzen in einem Zyklus.
+        """
+        print()
+
+        class _SelfResetting(_Job):
+
+            def execute( self):
+                super().execute()
+                self.rtime_reset()
+                return
+
+        plc = _PLC( 0.001)
+        a = _SelfResetting( plc, "a", 0.002)
+        b = _Job( plc, "b", 0.002)
+        plc.job_add( a).job_add( b)
+        self.assertEqual( [ (), ( "a", "b")] * 3, _cycles_( plc, 6))
+
+        plc.job_reset( b)
+        plc.job_reset( b)
+        plc.job_reset( a)
+        plc.job_cancel( a)
+        self.assertEqual( [ (), ( "b",)] * 2, _cycles_( plc, 4))
+        return
+
+    def test__overruns( self):
+        """
+        """
+        print()
+
+        plc = _PLC( 0.001)
+        slow = _Job( plc, "slow", 0.001, runtime=0.002)
+        fast = _Job( plc, "fast", 0.001)
+        plc.job_add( slow).job_add( fast)
+        _cycles_( plc, 3)
+        self.assertEqual( 3, slow.overruns())
+        self.assertEqual( 0, fast.overruns())
+        return
+
+    def test__performance( self):
+        """Kosten der Job-Planung pro Zyklus bei 1 ms, Heap gegen Herunterzählen.
+        """
+        print()
+
+        random.seed( 42)
+        cycletimes = [ 0.1, 0.5, 1.0, 5.0]
+        for num_jobs, n in ((10, 2000), (1000, 2000), (50000, 200)):
+            results = []
+            for PLC_ in (_PLC4Reference, _PLC):
+                plc = PLC_( 0.001)
+                for i in range( num_jobs):
+                    plc.job_add( _Job( plc, "job.%d" % i, random.choice( cycletimes)))
+
+                t = time.perf_counter()
+                for _ in range( n):
+                    plc._run_( None)
+
+                results.append( (time.perf_counter() - t)/n)
+                plc.log = []
+
+            print( "%5d jobs: %8.1f us per cycle decrementing, %6.1f us per cycle with heap. " % (num_jobs, results[ 0]*1000000, results[ 1]*1000000))
+
+        return
+
+
+_Testsuite = unittest.makeSuite( _TESTCASE__PLCJobs)
+
+
+def _lab_():
+    return
+
+
+def _Test_():
+    unittest.TextTestRunner( verbosity=2).run( _Testsuite)
+
+
+if __name__ == '__main__':
+    _Test_()
+    _lab_()
+    input( u"Press any key to exit...")
+
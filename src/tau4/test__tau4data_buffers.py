@@ -25,10 +25,14 @@ from __future__ import division
 import logging; _Logger = logging.getLogger()
 
 import tau4
+import random
+import statistics
+import sys
 import time
 import unittest
 
 from tau4.data import buffers
+from tau4.timing import Timer2
 
 
 class _TESTCASE__Ringbuffer(unittest.TestCase):
@@ -146,6 +150,103 @@ class _TESTCASE__RingbufferStatistix(unittest.TestCase):
         
         return
 
+    def test_incremental( self):
+        """Incremental statistics equal those computed by the statistics module.
+        """
+        print()
+
+        random.seed( 42)
+        for elemcount_max in (1, 2, 3, 10, 101):
+            rb = buffers.RingbufferStatistix( elemcount_max, elems=[random.randint( -5, 5) for _ in range( elemcount_max//2)])
+            for i in range( 20*elemcount_max):
+                if random.random() < 0.2:
+                    rb.elem()
+
+                else:
+                    rb.elem( random.choice( (random.randint( -5, 5), random.gauss( 100, 10))))
+
+                elems = list( rb.elems())
+                if not elems:
+                    self.assertRaises( statistics.StatisticsError, rb.mean)
+                    self.assertRaises( statistics.StatisticsError, rb.median)
+                    continue
+
+                self.assertAlmostEqual( statistics.mean( elems), rb.mean(), places=6)
+                self.assertEqual( statistics.median( elems), rb.median())
+                self.assertEqual( min( elems), rb.min())
+                self.assertEqual( max( elems), rb.max())
+                if len( elems) > 1:
+                    self.assertAlmostEqual( statistics.stdev( elems), rb.stdev(), delta=1e-6*max( 1, statistics.stdev( elems)))
+
+                else:
+                    self.assertEqual( sys.float_info.max, rb.stdev())
+
+        self.assertLess( 0, rb.recomputes())
+        return
+
+    def test_invalid_elem( self):
+        """An elem that can't be typecast leaves buffer and statistics untouched.
+        """
+        print()
+
+        rb = buffers.RingbufferStatistix( 3, elems=[1, 2, 3])
+        self.assertRaises( ValueError, rb.elem, "nan?")
+        self.assertEqual( [1.0, 2.0, 3.0], list( rb.elems()))
+        self.assertAlmostEqual( 2, rb.mean())
+        self.assertEqual( 1, rb.min())
+
+        rb.elem( "4")
+        self.assertEqual( [2.0, 3.0, 4.0], list( rb.elems()))
+        self.assertAlmostEqual( 3, rb.mean())
+        self.assertEqual( 2, rb.min())
+        self.assertEqual( 3, rb.median())
+        return
+
+    def test_drift( self):
+        """Recomputes keep the error bounded for an offset signal.
+        """
+        print()
+
+        random.seed( 42)
+        for recompute_every in (10**9, None):
+            rb = buffers.RingbufferStatistix( 100, recompute_every=recompute_every)
+            for _ in range( 100000):
+                rb.elem( random.gauss( 1e6, 1))
+
+            error = abs( rb.stdev() - statistics.stdev( rb.elems()))/statistics.stdev( rb.elems())
+            print( "recompute_every=%s: relative error of stdev = %g. " % (recompute_every, error))
+
+        self.assertLess( error, 1e-9)
+        return
+
+    def test_performance( self):
+        """Append and query at window sizes 10 to 1e5; CPU load at 1 kHz.
+        """
+        print()
+
+        random.seed( 42)
+        for elemcount_max in (10, 100, 1000, 10000, 100000):
+            rb = buffers.RingbufferStatistix( elemcount_max, elems=[random.random() for _ in range( elemcount_max)])
+            n = 10000
+            with Timer2() as t:
+                for _ in range( n):
+                    rb.elem( random.random())
+                    rb.mean(); rb.median(); rb.stdev(); rb.min(); rb.max()
+
+            us_incremental = t.elapsed_us( n)
+
+            n = max( 3, 100000//elemcount_max)
+            with Timer2() as t:
+                for _ in range( n):
+                    rb.elem( random.random())
+                    elems = rb.elems()
+                    statistics.mean( elems); statistics.median( elems); statistics.stdev( elems); min( elems); max( elems)
+
+            us_statistics = t.elapsed_us( n)
+            print( "%6d elems: incremental %8.1f us (%5.2f %% @ 1 kHz), statistics %10.1f us (%7.2f %% @ 1 kHz). " % (elemcount_max, us_incremental, us_incremental/10, us_statistics, us_statistics/10))
+
+        return
+
 
 _Testsuite.addTest( unittest.makeSuite( _TESTCASE__RingbufferStatistix))
 
@@ -22,12 +22,13 @@
 
 from __future__ import division
 
+import random
 import statistics
 import tau4
 import time
 import unittest
 
-from tau4.time import Scheduler
+from tau4.time import Scheduler, SchedulerThread, Timer2, TimerWheelScheduler
 
 
 class _TESTCASE__Scheduler(unittest.TestCase):
@@ -100,6 +101,156 @@ class _TESTCASE__Scheduler(unittest.TestCase):
 _Testsuite = unittest.makeSuite( _TESTCASE__Scheduler)
 
 
+class _TESTCASE__TimerWheelScheduler(unittest.TestCase):
+
+    def _run_( self, sch, duration, sleep=0.0002):
+        sch.start()
+        t0 = time.time()
+        while time.time() - t0 <= duration:
+            sch.execute()
+            time.sleep( sleep)
+
+        sch.stop()
+        return sch
+
+    def test__wheel( self):
+        """Each job fires exactly once per interval, also across several levels and beyond the top level.
+        """
+        print()
+
+        counts = {}
+        def fun( interval):
+            counts[ interval] += 1
+
+        sch = TimerWheelScheduler( id=-1, resolution_ms=1, slots=4, levels=2)
+                                        # Range of the wheel is 16 ticks only.
+        for interval in range( 1, 41):
+            counts[ interval] = 0
+            sch.job_add( fun, interval, data4callable=interval)
+
+        self.assertEqual( 40, sch.jobs())
+        self._run_( sch, 0.4)
+        for interval, count in counts.items():
+            self.assertEqual( sch.ticks()//interval, count)
+
+        return
+
+    def test__cancel( self):
+        """
+        """
+        print()
+
+        calls = []
+        sch = TimerWheelScheduler( id=-1, resolution_ms=1)
+        job1 = sch.job_add( lambda: calls.append( 1), 5)
+        job2 = sch.job_add( lambda: (calls.append( 2), sch.job_cancel( job2)), 5)
+        job3 = sch.job_add( lambda: calls.append( 3), 5)
+        sch.job_cancel( job3).job_cancel( job3)
+        self._run_( sch, 0.1)
+
+        self.assertEqual( 1, calls.count( 2))
+        self.assertEqual( 0, calls.count( 3))
+        self.assertEqual( sch.ticks()//5, calls.count( 1))
+        self.assertEqual( 1, sch.jobs())
+        self.assertEqual( calls.count( 1), job1.stats()[ "count"])
+        return
+
+    def test__policies( self):
+        """Late execute() calls: catchup executes all missed due times, skip only one.
+        """
+        print()
+
+        for policy in TimerWheelScheduler.POLICIES:
+            calls = []
+            sch = TimerWheelScheduler( id=-1, resolution_ms=1, policy=policy)
+            job = sch.job_add( lambda: calls.append( 1), 2)
+            self._run_( sch, 0.2, sleep=0.050)
+            stats = job.stats()
+            print( "%-7s: %d calls, %d skipped, lateness %.0f us (max. %.0f us). " % (policy, len( calls), stats[ "skipped"], stats[ "lateness_mean_us"], stats[ "lateness_max_us"]))
+            if policy == "catchup":
+                self.assertEqual( sch.ticks()//2, len( calls))
+                self.assertEqual( 0, stats[ "skipped"])
+
+            else:
+                self.assertLess( len( calls), sch.ticks()//4)
+                self.assertLess( 0, stats[ "skipped"])
+
+        self.assertRaises( ValueError, TimerWheelScheduler, id=-1, resolution_ms=1, policy="any")
+        self.assertRaises( ValueError, TimerWheelScheduler, id=-1, resolution_ms=1, slots=100)
+        return
+
+    def test__thread( self):
+        """
+        """
+        print()
+
+        calls = []
+        thread = SchedulerThread( id=-1, looptime=0.001, schedulerclass=TimerWheelScheduler)
+        thread.scheduler().job_add( lambda: calls.append( 1), 10)
+        thread.start()
+        time.sleep( 0.2)
+        thread.shutdown()
+        thread.join()
+        self.assertIsInstance( thread.scheduler(), TimerWheelScheduler)
+        self.assertLess( 10, len( calls))
+        return
+
+    def test__performance( self):
+        """Tick cost and jitter with 10, 1k, and 100k jobs.
+
+        Both schedulers are executed every 0.5 ms for 1 s. Scheduler drops
+        due times it's too late for, TimerWheelScheduler catches up, so the
+        number of jobs fired differs.
+        """
+        print()
+
+        fired = [0]
+        def fun():
+            fired[ 0] += 1
+
+        def run( sch):
+            fired[ 0] = 0
+            us_execute = 0
+            executes = 0
+            sch.start()
+            t0 = time.time()
+            while time.time() - t0 <= 1:
+                t = time.perf_counter()
+                sch.execute()
+                us_execute += (time.perf_counter() - t)*1e6
+                executes += 1
+                time.sleep( 0.0005)
+
+            sch.stop()
+            print( "%6d jobs, %-19s: %8.1f us/execute, %7d jobs fired, %5.2f us/job fired. " % (len( intervals), sch.__class__.__name__, us_execute/executes, fired[ 0], us_execute/max( 1, fired[ 0])))
+            return
+
+        random.seed( 42)
+        for num_jobs in (10, 1000, 100000):
+            intervals = [random.randint( 1, 1000) for _ in range( num_jobs)]
+
+            sch = Scheduler( id=-1, resolution_ms=1)
+            for interval in intervals:
+                sch.job_add( fun, interval)
+
+            run( sch)
+
+            sch = TimerWheelScheduler( id=-1, resolution_ms=1)
+            with Timer2() as t:
+                jobs = [sch.job_add( fun, interval) for interval in intervals]
+
+            run( sch)
+            counts = sum( job.stats()[ "count"] for job in jobs)
+            lateness_mean_us = sum( job.stats()[ "lateness_mean_us"]*job.stats()[ "count"] for job in jobs)/max( 1, counts)
+            lateness_max_us = max( job.stats()[ "lateness_max_us"] for job in jobs)
+            print( "%6d jobs, %-19s: %5.2f us/job_add, lateness %6.0f us (max. %6.0f us). " % (num_jobs, "", t.elapsed_us( num_jobs), lateness_mean_us, lateness_max_us))
+
+        return
+
+
+_Testsuite.addTest( unittest.makeSuite( _TESTCASE__TimerWheelScheduler))
+
+
 class _TESTCASE__(unittest.TestCase):
 
     def test( self):
@@ -19,6 +19,7 @@
 #   along with tau4. If not, see <http://www.gnu.org/licenses/>.
 
 
+import math
 import time
 from timeit import default_timer
 
@@ -131,13 +132,249 @@ class Scheduler:
         return self
 
 
+class TimerWheelScheduler:
+
+    """Wie Scheduler, verwaltet die Jobs aber in einem hierarchischen Timing Wheel.
+
+    Scheduler.execute() prüft bei jedem Aufruf alle Jobs und misst die Zeit mit
+    time.time(). Der TimerWheelScheduler teilt die Zeit seit start() in Ticks
+    der Länge resolution_ms, gemessen mit time.monotonic_ns(). Jeder Job hängt
+    im Slot des Ticks, in dem er fällig ist:
+
+    -   Level 0 hat \c slots Slots zu je einem Tick,
+    -   Level 1 hat \c slots Slots zu je \c slots Ticks usw.
+
+    Erreicht die Zeit einen Slot eines höheren Levels, werden dessen Jobs auf
+    die tieferen Levels verteilt. Einfügen und Löschen eines Jobs sind damit
+    O(1), ein Tick kostet nur so viel, wie in ihm Jobs fällig sind. Jobs, die
+    weiter in der Zukunft liegen, als das oberste Level reicht, wandern beim
+    Verteilen wieder ins oberste Level.
+
+    Die Fälligkeit eines Jobs ergibt sich immer aus der vorigen Fälligkeit plus
+    Intervall, es gibt also keine Drift.
+
+    \param  policy  Was passiert, wenn execute() so spät aufgerufen wird, dass
+                    ein Job mehrmals fällig geworden ist:
+                    -   "catchup": Der Job wird für jede Fälligkeit ausgeführt.
+                    -   "skip": Der Job wird nur einmal ausgeführt, die
+                        versäumten Fälligkeiten werden übersprungen.
+
+    **Applikation**::
+
+        sch = TimerWheelScheduler( id="main", resolution_ms=1)
+        job = sch.job_add( callable=fun, interval_ms=10)
+        sch.start()
+        ...
+        sch.execute()
+        ...
+        sch.job_cancel( job)
+        print( job.stats())
+    """
+
+    POLICIES = ("catchup", "skip")
+
+    class _Job:
+
+        def __init__( self, *, interval_ticks, callable, data4callable=None):
+            self.__callable = callable
+            self.__data4callable = data4callable
+            self._interval_ticks = interval_ticks
+
+            self._tick_due = 0
+            self._slot = None
+
+            self._count = 0
+            self._lateness_mean_ns = 0.0
+            self._lateness_m2 = 0.0
+            self._lateness_max_ns = 0
+            self._skipped = 0
+            return
+
+        def execute( self):
+            if self.__data4callable:
+                return self.__callable( self.__data4callable)
+
+            return self.__callable()
+
+        def _lateness_add_( self, ns):
+            """Welford.
+            """
+            self._count += 1
+            delta = ns - self._lateness_mean_ns
+            self._lateness_mean_ns += delta/self._count
+            self._lateness_m2 += delta*(ns - self._lateness_mean_ns)
+            if ns > self._lateness_max_ns:
+                self._lateness_max_ns = ns
+
+            return self
+
+        def stats( self):
+            """Jitter-Statistik: Verspätung der Ausführungen gegenüber ihrer Fälligkeit.
+            """
+            return {
+                "count": self._count,
+                "lateness_mean_us": self._lateness_mean_ns/1000,
+                "lateness_stdev_us": math.sqrt( self._lateness_m2/(self._count - 1))/1000 if self._count > 1 else 0.0,
+                "lateness_max_us": self._lateness_max_ns/1000,
+                "skipped": self._skipped,
+            }
+
+
+    def __init__( self, *, id, resolution_ms, slots=256, levels=4, policy="catchup"):
+        if policy not in self.POLICIES:
+            raise ValueError( "Policy must be one of %s, not '%s'!" % (self.POLICIES, policy))
+
+        if slots & (slots - 1):
+            raise ValueError( "Number of slots must be a power of 2, not %d!" % slots)
+
+        self.__id = id
+        self.__resolution_ns = int( resolution_ms*1000000)
+        self.__bits = slots.bit_length() - 1
+        self.__mask = slots - 1
+        self.__levels = levels
+        self.__policy = policy
+
+        self.__wheels = [[{} for _ in range( slots)] for _ in range( levels)]
+        self.__jobs = 0
+        self.__tick = 0
+        self.__time_start_ns = 0
+        self.__is_inhibited = True
+        return
+
+    def _insert_( self, job):
+        tick_due = job._tick_due
+        delta = tick_due - self.__tick
+        bits = self.__bits
+        level = 0
+        while level < self.__levels - 1 and delta >> (bits*(level + 1)):
+            level += 1
+
+        slot = self.__wheels[ level][ (tick_due >> (bits*level)) & self.__mask]
+        slot[ job] = None
+        job._slot = slot
+        return
+
+    def _tick_( self, tick, now_ns):
+        """Tick \c tick abarbeiten: Höhere Levels verteilen, dann fällige Jobs ausführen.
+        """
+        bits = self.__bits
+        mask = self.__mask
+        for level in range( self.__levels - 1, 0, -1):
+            if tick & ((1 << (bits*level)) - 1) == 0:
+                index = (tick >> (bits*level)) & mask
+                jobs = self.__wheels[ level][ index]
+                if jobs:
+                    self.__wheels[ level][ index] = {}
+                    for job in jobs:
+                        self._insert_( job)
+
+        index = tick & mask
+        jobs = self.__wheels[ 0][ index]
+        if not jobs:
+            return
+
+        self.__wheels[ 0][ index] = {}
+        tick_target = (now_ns - self.__time_start_ns)//self.__resolution_ns
+        for job in list( jobs):
+            if job._slot is not jobs:
+                continue
+                                        # Job ist von einem vorhergehenden
+                                        #   Callable gelöscht worden.
+            del jobs[ job]
+            job._lateness_add_( now_ns - self.__time_start_ns - tick*self.__resolution_ns)
+            job._tick_due = tick + job._interval_ticks
+            if self.__policy == "skip" and job._tick_due <= tick_target:
+                skipped = (tick_target - job._tick_due)//job._interval_ticks + 1
+                job._skipped += skipped
+                job._tick_due += skipped*job._interval_ticks
+
+            self._insert_( job)
+            job.execute()
+
+        return
+
+    def execute( self):
+        """Diese Methode ist periodisch auszuführen, am besten alle resolution_ms() Millisekunden oder schneller.
+
+        Arbeitet alle Ticks ab, die seit dem letzten Aufruf vergangen sind.
+
+        .. note::
+            Die Ausführung von start() ist Voraussetzung!
+        """
+        if not self.__is_inhibited:
+            now_ns = time.monotonic_ns()
+            tick_target = (now_ns - self.__time_start_ns)//self.__resolution_ns
+            while self.__tick < tick_target:
+                self.__tick += 1
+                self._tick_( self.__tick, now_ns)
+
+        return self
+
+    def job_add( self, callable, interval_ms, data4callable=None):
+        """Job hinzufügen, erstmals fällig nach \c interval_ms.
+
+        \returns    Job, z.B. für job_cancel().
+        """
+        job = self._Job( interval_ticks=max( 1, round( interval_ms*1000000/self.__resolution_ns)), callable=callable, data4callable=data4callable)
+        job._tick_due = self.__tick + job._interval_ticks
+        self._insert_( job)
+        self.__jobs += 1
+        return job
+
+    def job_cancel( self, job):
+        if job._slot is not None:
+            del job._slot[ job]
+            job._slot = None
+            self.__jobs -= 1
+
+        return self
+
+    def jobs( self):
+        """Anzahl Jobs.
+        """
+        return self.__jobs
+
+    def reset( self):
+        """Alle Jobs sind wieder nach einem ganzen Intervall fällig.
+        """
+        jobs = [job for wheel in self.__wheels for slot in wheel for job in slot]
+        for job in jobs:
+            del job._slot[ job]
+            job._tick_due = self.__tick + job._interval_ticks
+            self._insert_( job)
+
+        return self
+
+    def resolution_ms( self):
+        return self.__resolution_ns/1000000
+
+    def ticks( self):
+        """Anzahl der seit start() abgearbeiteten Ticks.
+        """
+        return self.__tick
+
+    def start( self):
+        self.__is_inhibited = False
+        self.__time_start_ns = time.monotonic_ns() - self.__tick*self.__resolution_ns
+        return self
+
+    def stop( self):
+        self.__is_inhibited = True
+        return self
+
+
 class SchedulerThread(Thread):
 
-    def __init__( self, *, id, looptime):
-        super().__init__()
+    """Thread, der einen Scheduler zyklisch ausführt.
+
+    \param  schedulerclass  Scheduler oder TimerWheelScheduler.
+    """
+
+    def __init__( self, *, id, looptime, schedulerclass=Scheduler):
+        super().__init__( looptime=looptime)
 
         self.__is_stop_request = False
-        self.__scheduler = Scheduler( id=id, resolution_ms=looptime*1000)
+        self.__scheduler = schedulerclass( id=id, resolution_ms=looptime*1000)
         return
 
     def run( self):